@@ -0,0 +1,48 @@
+"""Общая подготовка замеров: импорт модулей бота из src/ и данные во временном каталоге.
+
+Замеры запускаются из корня репозитория: python benchmarks/<скрипт>.py. Чтобы сравнить
+с версией до изменения, тот же скрипт запускается на нужном коммите (git worktree).
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import config  # noqa: E402
+
+
+def use_temp_data_dir(**settings) -> str:
+    """Перенаправление файлов данных во временный каталог и подмена настроек config до импорта хранилища"""
+    data_dir = tempfile.mkdtemp(prefix='mkplace-bench-')
+    config.DATA_DIR = data_dir
+    config.PHOTOS_DIR = os.path.join(data_dir, 'photos')
+    for name in ('USERS', 'REQUESTS', 'SERVICE_CENTERS', 'DELIVERY_TASKS', 'SEQUENCES', 'OUTBOX', 'SENT_MESSAGES'):
+        setattr(config, f'{name}_JSON', os.path.join(data_dir, f'{name.lower()}.json'))
+    config.TRANSACTIONS_DIR = os.path.join(data_dir, 'transactions')
+    config.ARCHIVE_DIR = os.path.join(data_dir, 'archive')
+    config.SQLITE_DB_PATH = os.path.join(data_dir, 'mkplace.db')
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return data_dir
+
+
+def remove_data_dir(data_dir: str) -> None:
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def request_record(number: int) -> dict:
+    """Запись заявки типичного размера, как её сохраняет RequestService"""
+    return {
+        'user_id': str(1000000 + number % 5000),
+        'description': f'Не включается после падения, трещина на экране, заявка {number}. ' * 3,
+        'status': 'Новая' if number % 3 else 'Назначена в СЦ',
+        'user_name': f'Клиент {number % 5000}',
+        'photos': [{'path': f'photos/{number}_{i}.jpg', 'file_id': f'AgACAgIAAxkBAAI{number:08d}{i}'} for i in range(2)],
+        'location': {'latitude': 55.75 + number % 100 / 1000, 'longitude': 37.61 + number % 77 / 1000},
+        'location_link': f'https://yandex.ru/maps?whatshere%5Bpoint%5D=37.61%2C55.75&{number}',
+        'assigned_sc': str(number % 40) if number % 3 == 0 else None,
+        'assigned_delivery': None,
+        'created_at': '2026-01-01T10:00:00',
+    }
@@ -0,0 +1,52 @@
+"""Память под объекты Request (user-007).
+
+100 000 заявок разбираются из JSON, как при загрузке хранилища, и превращаются в Request.
+Печатается прирост памяти только на объекты (исходные словари ещё живы) и память,
+которая остаётся за объектами, когда словари освобождены (строки, общие с ними, учитываются).
+
+    python benchmarks/model_memory.py [--records 100000]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from common import use_temp_data_dir, remove_data_dir, request_record
+
+
+def measure(records: int) -> None:
+    from models import Request
+
+    # ID и в самой записи: так её принимает и Request.from_dict до user-007
+    text = json.dumps(
+        {str(number): {**request_record(number), 'id': str(number)} for number in range(1, records + 1)},
+        ensure_ascii=False
+    )
+    gc.collect()
+    tracemalloc.start()
+    data = json.loads(text)
+    parsed = tracemalloc.get_traced_memory()[0]
+    objects = [Request.from_dict(value) for value in data.values()]
+    with_dicts = tracemalloc.get_traced_memory()[0]
+    del data
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"заявок: {len(objects)}")
+    print(f"объекты Request при живых словарях: {(with_dicts - parsed) / 2 ** 20:.1f} MiB")
+    print(f"за объектами после освобождения словарей: {retained / 2 ** 20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+    data_dir = use_temp_data_dir()
+    try:
+        measure(args.records)
+    finally:
+        remove_data_dir(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Пропускная способность записи при шардировании JSON-хранилища (user-015).
+
+3000 заявок создаются через RequestService.create_request при заданном числе одновременных
+вызовов; каждая настройка запускается в отдельном процессе на пустом каталоге данных
+(fsync включён, как в работе бота). Без аргументов печатается таблица по окну групповой
+фиксации, числу одновременных вызовов и числу шардов.
+
+    python benchmarks/sharded_writes.py
+    python benchmarks/sharded_writes.py --shards 16 --window 0 --concurrency 500
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+from common import use_temp_data_dir, remove_data_dir
+
+WINDOWS = [0.005, 0.0]
+CONCURRENCY = [50, 500]
+SHARDS = [1, 16]
+
+
+async def measure(count: int, concurrency: int) -> float:
+    from services.request import RequestService
+    from storage import flush_all
+
+    service = RequestService()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(number: int) -> None:
+        async with semaphore:
+            await service.create_request(str(1000000 + number), f'Заявка {number}', [], 'ул. Мира, 1', 'Клиент')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create(number) for number in range(count)))
+    elapsed = time.perf_counter() - started
+    await flush_all()
+    return count / elapsed
+
+
+def run_one(args) -> None:
+    data_dir = use_temp_data_dir(STORAGE_SHARDS=args.shards, STORAGE_GROUP_COMMIT_WINDOW=args.window)
+    try:
+        print(f"{asyncio.run(measure(args.count, args.concurrency)):.0f}")
+    finally:
+        remove_data_dir(data_dir)
+
+
+def run_table(count: int) -> None:
+    print("окно, мс  одновременно  " + "  ".join(f"K={shards} ops/s" for shards in SHARDS))
+    for window in WINDOWS:
+        for concurrency in CONCURRENCY:
+            results = [
+                subprocess.run(
+                    [sys.executable, __file__, '--shards', str(shards), '--window', str(window),
+                     '--concurrency', str(concurrency), '--count', str(count)],
+                    check=True, capture_output=True, text=True
+                ).stdout.strip()
+                for shards in SHARDS
+            ]
+            print(f"{window * 1000:8g}  {concurrency:12d}  " + "  ".join(f"{result:>11}" for result in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int)
+    parser.add_argument('--window', type=float, default=0.005, help="окно групповой фиксации, сек")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--count', type=int, default=3000)
+    args = parser.parse_args()
+    if args.shards is None:
+        run_table(args.count)
+    else:
+        run_one(args)
+
+
+if __name__ == '__main__':
+    main()
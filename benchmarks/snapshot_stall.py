@@ -0,0 +1,56 @@
+"""Задержка цикла событий, пока JsonStorage перезаписывает снимок (user-003).
+
+Тикер каждую 1 мс замеряет, насколько позже срока он проснулся; в это время снимок
+из 50 000 заявок сохраняется 10 раз. Печатаются наибольшая задержка, 99-й перцентиль
+и размер файла.
+
+    python benchmarks/snapshot_stall.py [--records 50000] [--rounds 10]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from common import use_temp_data_dir, remove_data_dir, request_record
+
+
+async def measure(data_dir: str, records: int, rounds: int) -> None:
+    from storage import JsonStorage
+
+    storage = JsonStorage.get_instance(os.path.join(data_dir, 'requests.json'))
+    data = {str(number): request_record(number) for number in range(1, records + 1)}
+    delays = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            delays.append(max(0.0, time.perf_counter() - expected))
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    for _ in range(rounds):
+        await storage.save(data)
+    stop.set()
+    await task
+    delays.sort()
+    print(f"записей: {records}, перезаписей: {rounds}")
+    print(f"задержка цикла: max {delays[-1] * 1000:.0f} мс, p99 {delays[int(len(delays) * 0.99)] * 1000:.0f} мс")
+    print(f"размер файла: {os.path.getsize(storage.file_path) / 2 ** 20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+    data_dir = use_temp_data_dir()
+    try:
+        asyncio.run(measure(data_dir, args.records, args.rounds))
+    finally:
+        remove_data_dir(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,39 @@
+"""Запуск бота.
+
+Один процесс: python bot.py — обновления получает сам процесс (long polling).
+
+Несколько процессов на одном DATA_DIR: python bot.py --workers N. Родительский процесс один
+получает обновления у Telegram и раздаёт их N рабочим процессам по chat_id, поэтому диалоги
+(ConversationHandler, user_data) каждого чата живут в одном процессе. Рабочие процессы запускаются
+с BOT_WORKERS=N: хранилище берёт flock на файлах данных и подхватывает записи других процессов.
+Незавершённые транзакции доигрывает родитель до запуска рабочих.
+"""
+import argparse
+import asyncio
+import json
 import logging
+import multiprocessing
 import os
+import signal
+from telegram import Bot, Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, filters, ConversationHandler,
-    CallbackQueryHandler
+    CallbackQueryHandler, InlineQueryHandler
 )
 from config import (
     ASSIGN_REQUEST, CREATE_REQUEST_DESC, CREATE_REQUEST_LOCATION,
     CREATE_REQUEST_PHOTOS, ENTER_NAME, ENTER_PHONE, TELEGRAM_API_TOKEN,
-    ADMIN_IDS, DELIVERY_IDS, PHOTOS_DIR
+    ADMIN_IDS, DELIVERY_IDS, PHOTOS_DIR, ARCHIVE_INTERVAL, SET_SC_LOCATION
 )
 from handlers.user_handler import UserHandler
 from handlers.client_handler import ClientHandler
 from handlers.admin_handler import AdminHandler
 from handlers.delivery_handler import DeliveryHandler
+from services.request import RequestService
+from services.delivery import DeliveryService
+from services.broadcast import Broadcaster
+from services.notification_service import NotificationService
+from storage import flush_all, recover_transactions
 
 # Настройка логирования
 logging.basicConfig(
@@ -22,7 +43,49 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main():
+async def archive_periodically() -> None:
+    """Периодический перенос завершённых заявок и доставленных заданий в архив"""
+    request_service = RequestService()
+    delivery_service = DeliveryService()
+    while True:
+        try:
+            await request_service.archive_completed()
+            await delivery_service.archive_delivered()
+        except Exception as e:
+            logger.error(f"Ошибка при переносе в архив: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def start_background_tasks(application: Application) -> None:
+    """Запуск фоновых задач бота; останавливаются в post_shutdown"""
+    application.bot_data['archiver'] = asyncio.create_task(archive_periodically())
+    application.bot_data['outbox'] = asyncio.create_task(NotificationService().run_outbox(application.bot))
+    # Индексы заявок строятся в фоне, чтобы первый поиск и просмотр заявок администратором не ждали
+    request_service = RequestService()
+    application.bot_data['search_warm_up'] = asyncio.create_task(request_service.search_index.warm_up())
+    application.bot_data['browse_warm_up'] = asyncio.create_task(request_service.created_index.warm_up())
+
+
+async def post_init(application: Application) -> None:
+    """Доигрывание транзакций хранилища, прерванных сбоем, до приёма обновлений"""
+    await recover_transactions()
+    start_background_tasks(application)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Остановка фоновых задач и запись отложенных изменений хранилища при остановке бота"""
+    tasks = [application.bot_data.pop(name, None) for name in ('archiver', 'outbox', 'search_warm_up', 'browse_warm_up')]
+    for task in tasks:
+        if task:
+            task.cancel()
+    # Недоставленные уведомления остаются в очереди и будут отправлены после запуска
+    await asyncio.gather(*(task for task in tasks if task), return_exceptions=True)
+    await flush_all()
+    logger.info(f"Рассылка: {Broadcaster.get_instance().stats()}")
+
+
+def build_application(polling: bool = True) -> Application:
+    """Приложение со всеми обработчиками; без polling обновления подаются в update_queue извне"""
     # Создание экземпляров обработчиков
     user_handler = UserHandler()
     client_handler = ClientHandler()
@@ -30,7 +93,10 @@ def main():
     delivery_handler = DeliveryHandler()
 
     # Создание приложения
-    application = Application.builder().token(TELEGRAM_API_TOKEN).build()
+    builder = Application.builder().token(TELEGRAM_API_TOKEN).post_init(post_init).post_shutdown(post_shutdown)
+    if not polling:
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Обработчики команд
     application.add_handler(CommandHandler("start", user_handler.start))
@@ -63,6 +129,17 @@ def main():
     # Обработчик просмотра всех заявок (для админа)
     application.add_handler(MessageHandler(filters.Regex("^Просмотр заявок$"), admin_handler.show_all_requests))
 
+    # Список СЦ и ввод их координат (для подбора ближайшего к клиенту СЦ)
+    application.add_handler(MessageHandler(filters.Regex("^Список СЦ$"), admin_handler.show_service_centers))
+    sc_location_conv_handler = ConversationHandler(
+        entry_points=[CallbackQueryHandler(admin_handler.handle_sc_location_request, pattern=r"^sc_location_\d+$")],
+        states={
+            SET_SC_LOCATION: [MessageHandler(filters.LOCATION, admin_handler.handle_sc_location)]
+        },
+        fallbacks=[CommandHandler("cancel", lambda u, c: ConversationHandler.END)]
+    )
+    application.add_handler(sc_location_conv_handler)
+
     # Обработчик профиля доставщика
     delivery_profile_conv_handler = ConversationHandler(
         entry_points=[MessageHandler(filters.Regex("^Профиль доставщика$"), delivery_handler.show_delivery_profile)],
@@ -78,15 +155,104 @@ def main():
     application.add_handler(MessageHandler(filters.Regex("^Мои задания$"), delivery_handler.show_delivery_tasks))
 
     # Обработчики callback-запросов
-    application.add_handler(CallbackQueryHandler(admin_handler.handle_assign_sc, pattern="^assign_sc_"))
+    application.add_handler(CallbackQueryHandler(admin_handler.handle_assign_sc, pattern=r"^assign_sc_\d+$"))
     application.add_handler(CallbackQueryHandler(admin_handler.handle_assign_sc_confirm, pattern="^assign_sc_confirm_"))
+    application.add_handler(CallbackQueryHandler(admin_handler.handle_assign_sc_auto, pattern="^assign_sc_auto_"))
     application.add_handler(CallbackQueryHandler(admin_handler.handle_create_delivery, pattern="^create_delivery_"))
+    application.add_handler(CallbackQueryHandler(admin_handler.handle_browse_requests, pattern="^browse_"))
+    application.add_handler(CallbackQueryHandler(admin_handler.handle_noop, pattern="^noop$"))
+    application.add_handler(InlineQueryHandler(admin_handler.handle_inline_search))
     application.add_handler(CallbackQueryHandler(delivery_handler.handle_accept_delivery, pattern="^accept_delivery_"))
     application.add_handler(CallbackQueryHandler(delivery_handler.handle_delivered_to_client, pattern="^delivered_to_client_"))
     application.add_handler(CallbackQueryHandler(delivery_handler.handle_delivered_to_sc, pattern="^delivered_to_sc_"))
+    application.add_handler(CallbackQueryHandler(delivery_handler.handle_delivery_tasks_page, pattern="^mytasks_"))
+    application.add_handler(CallbackQueryHandler(delivery_handler.handle_available_tasks_page, pattern="^avail_"))
+    application.add_handler(CallbackQueryHandler(client_handler.handle_user_requests_page, pattern="^myreqs_"))
+    application.add_handler(CallbackQueryHandler(client_handler.handle_user_request_details, pattern=r"^myreq_\d+_\d+$"))
+
+    return application
+
+
+def update_route(update: Update) -> int:
+    """Ключ распределения обновления: все обновления одного чата попадают в один процесс"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+async def dispatch_updates(queues: list, processes: list) -> None:
+    """Получение обновлений родительским процессом и раздача их рабочим"""
+    async with Bot(TELEGRAM_API_TOKEN) as bot:
+        # Одновременно long polling и вебхук не работают: вебхук, если был, снимается
+        await bot.delete_webhook()
+        offset = None
+        try:
+            while all(process.is_alive() for process in processes):
+                updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=Update.ALL_TYPES)
+                for update in updates:
+                    offset = update.update_id + 1
+                    queues[update_route(update) % len(queues)].put(update.to_json())
+            logger.error("Рабочий процесс завершился, бот останавливается")
+        finally:
+            if offset is not None:
+                # Подтверждаем уже розданные обновления, чтобы после перезапуска они не пришли снова
+                await bot.get_updates(offset=offset, timeout=0)
+
 
+async def serve_worker(queue) -> None:
+    """Обработка обновлений, которые раздаёт родительский процесс, до сигнала остановки (None)"""
+    application = build_application(polling=False)
+    loop = asyncio.get_running_loop()
+    async with application:
+        start_background_tasks(application)
+        await application.start()
+        try:
+            while (data := await loop.run_in_executor(None, queue.get)) is not None:
+                await application.update_queue.put(Update.de_json(json.loads(data), application.bot))
+        finally:
+            await application.stop()
+            await post_shutdown(application)
+
+
+def run_worker(queue) -> None:
+    """Точка входа рабочего процесса"""
+    # Ctrl+C получает вся группа процессов; рабочие останавливаются по сигналу родителя, дописав очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve_worker(queue))
+
+
+def run_workers(workers: int) -> None:
+    """Запуск нескольких рабочих процессов на одном каталоге данных"""
+    asyncio.run(recover_transactions())
+    # Рабочие процессы читают число процессов из окружения при импорте config
+    os.environ['BOT_WORKERS'] = str(workers)
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue() for _ in range(workers)]
+    processes = [context.Process(target=run_worker, args=(queue,), name=f"worker-{i}") for i, queue in enumerate(queues)]
+    for process in processes:
+        process.start()
+    try:
+        asyncio.run(dispatch_updates(queues, processes))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram-бот сервиса ремонта")
+    parser.add_argument('--workers', type=int, default=1, help="число рабочих процессов на одном DATA_DIR")
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_workers(args.workers)
+        return
     # Запуск бота
-    application.run_polling()
+    build_application().run_polling()
 
 
 if __name__ == "__main__":
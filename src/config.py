@@ -18,9 +18,14 @@ USERS_JSON = os.path.join(DATA_DIR, "users.json")
 REQUESTS_JSON = os.path.join(DATA_DIR, "requests.json")
 SERVICE_CENTERS_JSON = os.path.join(DATA_DIR, "service_centers.json")
 DELIVERY_TASKS_JSON = os.path.join(DATA_DIR, "delivery_tasks.json")
+SEQUENCES_JSON = os.path.join(DATA_DIR, "sequences.json")
+OUTBOX_JSON = os.path.join(DATA_DIR, "outbox.json")  # Очередь исходящих уведомлений
+SENT_MESSAGES_JSON = os.path.join(DATA_DIR, "sent_messages.json")  # ID сообщений, которые правятся на месте
+TRANSACTIONS_DIR = os.path.join(DATA_DIR, "transactions")  # Журналы незавершённых транзакций
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")  # Сжатые сегменты завершённых заявок и заданий
 
 # Состояния для ConversationHandler
-CREATE_REQUEST_LOCATION, ADMIN_PANEL, REGISTER, CREATE_REQUEST_DESC, CREATE_REQUEST_PHOTOS, ASSIGN_REQUEST, CREATE_DELIVERY_TASK, ENTER_NAME, ENTER_PHONE = range(9)
+CREATE_REQUEST_LOCATION, ADMIN_PANEL, REGISTER, CREATE_REQUEST_DESC, CREATE_REQUEST_PHOTOS, ASSIGN_REQUEST, CREATE_DELIVERY_TASK, ENTER_NAME, ENTER_PHONE, SET_SC_LOCATION = range(10)
 
 # Статусы заказов
 ORDER_STATUS_NEW = 'Новая'
@@ -30,3 +35,49 @@ ORDER_STATUS_DELIVERY_TO_SC = 'Доставщик в пути. К СЦ'
 ORDER_STATUS_IN_SC = 'В СЦ'
 ORDER_STATUS_READY = 'Готов к выдаче'
 ORDER_STATUS_COMPLETED = 'Завершен'
+
+# Статусы задач доставки (после принятия задача проходит статусы доставки заказа)
+DELIVERY_STATUS_PENDING = 'Ожидает'
+DELIVERY_STATUS_ACCEPTED = 'Принято'
+
+# Хранилище
+STORAGE_BACKEND = "json"  # "json" — файлы data/*.json, "sqlite" — база SQLITE_DB_PATH
+SQLITE_DB_PATH = os.path.join(DATA_DIR, "mkplace.db")
+SEQUENCE_BLOCK_SIZE = 100  # Сколько ID резервируется одной записью в SEQUENCES_JSON
+STORAGE_CODEC = "json"  # "json" — стандартный модуль, "orjson" — быстрый кодек (pip install orjson)
+STORAGE_WAL_ENABLED = True  # Мутации дописываются в журнал <файл>.wal вместо перезаписи всего файла
+STORAGE_WAL_COMPACT_BYTES = 1024 * 1024  # Порог размера журнала для свёртки в новый снимок
+STORAGE_GROUP_COMMIT_WINDOW = 0.005  # Окно (сек) слияния мутаций в одну запись; 0 — писать сразу
+STORAGE_SHARDS = 1  # Число файлов-шардов на файл данных (json); менять через python -m storage.sharding K
+STORAGE_REVALIDATE_INTERVAL = 1.0  # Как часто (сек) кэш сверяется с файлами по stat, чтобы подхватить ручные правки
+ARCHIVE_INTERVAL = 3600  # Как часто (сек) завершённые заявки и выполненные задания переносятся в архив
+ARCHIVE_SEGMENT_CACHE = 4  # Сколько распакованных сегментов архива держать в памяти
+
+# Рассылка сообщений (ограничения Telegram: ~30 сообщений в секунду на бота, ~1 в секунду в чат)
+BROADCAST_CONCURRENCY = 8  # Сколько запросов к Telegram выполняется одновременно
+BROADCAST_GLOBAL_RATE = 30  # Сообщений в секунду на всего бота
+BROADCAST_CHAT_RATE = 1  # Сообщений в секунду в один чат
+BROADCAST_CHAT_BURST = 3  # Сколько сообщений в чат можно отправить подряд без ожидания
+BROADCAST_MAX_RETRIES = 3  # Повторы после RetryAfter и сетевых ошибок
+BROADCAST_STATS_WINDOW = 60  # Окно (сек), за которое считается скорость отправки
+
+# Списки в одном сообщении с листанием
+ADMIN_REQUESTS_PAGE_SIZE = 5  # Заявок на странице просмотра заявок администратором
+USER_REQUESTS_PAGE_SIZE = 5  # Заявок на странице «Мои заявки»
+DELIVERY_TASKS_PAGE_SIZE = 5  # Задач на странице «Мои задания» и доступных задач
+AVAILABLE_TASKS_LIMIT = 20  # Сколько самых подходящих доступных задач показывать доставщику
+SC_SUGGESTIONS = 5  # Сколько ближайших к клиенту СЦ предлагать при привязке заявки
+ADMIN_SEARCH_RESULTS = 20  # Результатов поиска заявок в одном ответе на inline-запрос (Telegram принимает до 50)
+
+# Очередь уведомлений: обработчики ставят уведомления в очередь, фоновый цикл их доставляет
+OUTBOX_POLL_INTERVAL = 1.0  # Как часто (сек) очередь проверяется без сигнала о новой записи
+OUTBOX_BATCH_SIZE = 100  # Сколько уведомлений доставляется параллельно за один проход
+OUTBOX_LEASE = 120  # На сколько секунд процесс захватывает уведомление на время доставки
+OUTBOX_DELIVERY_TIMEOUT = 60  # Сколько секунд ждать доставки одного уведомления (меньше OUTBOX_LEASE)
+OUTBOX_RETRY_BASE = 5  # Пауза (сек) перед первым повтором, дальше удваивается
+OUTBOX_RETRY_MAX = 3600  # Наибольшая пауза (сек) между повторами
+OUTBOX_MAX_ATTEMPTS = 8  # После стольких неудачных попыток уведомление считается мёртвым
+
+# Процессы бота (python bot.py --workers N задаёт BOT_WORKERS для рабочих процессов)
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', '1'))
+STORAGE_MULTIPROCESS = BOT_WORKERS > 1  # flock на файлах данных и подхват записей других процессов
@@ -1,5 +1,10 @@
 import logging
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update, ReplyKeyboardMarkup
+from datetime import datetime, timedelta
+from typing import List, Optional
+from telegram import (
+    Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update, ReplyKeyboardMarkup, InlineQueryResultArticle,
+    InputTextMessageContent
+)
 from telegram.ext import CallbackContext, ConversationHandler
 from handlers.base_handler import BaseHandler
 from services.user import UserService
@@ -7,7 +12,11 @@ from services.request import RequestService
 from services.service_center import ServiceCenterService
 from services.delivery import DeliveryService
 from services.notification_service import NotificationService
-from config import ASSIGN_REQUEST, CREATE_DELIVERY_TASK
+from models import OrderStatus, Location, ServiceCenter
+from config import (
+    ASSIGN_REQUEST, CREATE_DELIVERY_TASK, ADMIN_REQUESTS_PAGE_SIZE, ADMIN_SEARCH_RESULTS, ADMIN_IDS, SC_SUGGESTIONS,
+    SET_SC_LOCATION
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,15 +41,25 @@ class AdminHandler(BaseHandler):
             return
         request_id = parts[2]
         request = await self.request_service.get_request(request_id)
-        service_centers = await self.service_center_service.get_all_service_centers()
         if not request:
             logger.error(f"Заявка {request_id} не найдена")
             await query.edit_message_text(f"Заявка #{request_id} не найдена")
             return
-        # Создаем клавиатуру с доступными сервисными центрами
         keyboard = []
-        for sc_id, sc in service_centers.items():
-            keyboard.append([InlineKeyboardButton(sc.name, callback_data=f"assign_sc_confirm_{request_id}_{sc_id}")])
+        if isinstance(request.location, Location):
+            # Ближайшие к клиенту СЦ с расстоянием, ближний первым
+            nearest = await self.service_center_service.get_nearest_service_centers(request.location, SC_SUGGESTIONS)
+            for sc, distance in nearest:
+                keyboard.append([InlineKeyboardButton(
+                    f"{sc.name} · {distance:.1f} км", callback_data=f"assign_sc_confirm_{request_id}_{sc.id}"
+                )])
+            if nearest:
+                keyboard.append([InlineKeyboardButton("Привязать к ближайшему", callback_data=f"assign_sc_auto_{request_id}")])
+        if not keyboard:
+            # Координат нет у заявки или у СЦ: выбор из всех
+            service_centers = await self.service_center_service.get_all_service_centers()
+            for sc_id, sc in service_centers.items():
+                keyboard.append([InlineKeyboardButton(sc.name, callback_data=f"assign_sc_confirm_{request_id}_{sc_id}")])
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text("Выберите сервисный центр:", reply_markup=reply_markup)
 
@@ -58,6 +77,34 @@ class AdminHandler(BaseHandler):
         if not service_center:
             await query.edit_message_text("Сервисный центр не найден")
             return
+        await self.assign_request_to_sc(update, request_id, service_center)
+
+    async def handle_assign_sc_auto(self, update: Update, context: CallbackContext):
+        """Привязка заявки к ближайшему к клиенту сервисному центру"""
+        query = update.callback_query
+        await query.answer()
+        parts = query.data.split('_')
+        if len(parts) < 4:
+            await query.edit_message_text("Неверный формат данных")
+            return
+        request_id = parts[3]
+        request = await self.request_service.get_request(request_id)
+        if not request:
+            await query.edit_message_text(f"Заявка #{request_id} не найдена")
+            return
+        if not isinstance(request.location, Location):
+            await query.edit_message_text(f"У заявки #{request_id} нет координат клиента")
+            return
+        nearest = await self.service_center_service.get_nearest_service_centers(request.location, 1)
+        if not nearest:
+            await query.edit_message_text("Нет сервисных центров с координатами")
+            return
+        await self.assign_request_to_sc(update, request_id, nearest[0][0])
+
+    async def assign_request_to_sc(self, update: Update, request_id: str, service_center: ServiceCenter):
+        """Привязка заявки к выбранному СЦ, уведомление клиента и предложение создать задачу доставки"""
+        query = update.callback_query
+        sc_id = service_center.id
         # Привязываем заявку к сервисному центру
         request = await self.request_service.assign_to_service_center(request_id, sc_id, service_center.name)
         if not request:
@@ -104,19 +151,164 @@ class AdminHandler(BaseHandler):
             f"Доставщики уведомлены."
         )
 
+    async def show_service_centers(self, update: Update, context: CallbackContext):
+        """Список СЦ с координатами; кнопка у каждого — задать координаты для подбора ближайшего СЦ"""
+        service_centers = await self.service_center_service.get_all_service_centers()
+        if not service_centers:
+            await update.message.reply_text("Сервисных центров нет.")
+            return
+        lines = ["Сервисные центры:", ""]
+        keyboard = []
+        for sc_id, sc in service_centers.items():
+            lines.append(f"#{sc_id} · {sc.name} · {sc.address}")
+            if sc.location:
+                lines.append(f"Координаты: {sc.location.latitude:.6f}, {sc.location.longitude:.6f}")
+            else:
+                lines.append("Координаты не заданы: СЦ не предлагается как ближайший")
+            lines.append("")
+            keyboard.append([InlineKeyboardButton(f"Координаты {sc.name}", callback_data=f"sc_location_{sc_id}")])
+        await update.message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+
+    async def handle_sc_location_request(self, update: Update, context: CallbackContext):
+        """Запрос геопозиции СЦ после нажатия кнопки в списке СЦ"""
+        query = update.callback_query
+        await query.answer()
+        sc_id = query.data.split('_')[2]
+        service_center = await self.service_center_service.get_service_center(sc_id)
+        if not service_center:
+            await query.edit_message_text("Сервисный центр не найден")
+            return ConversationHandler.END
+        context.user_data["sc_location_id"] = sc_id
+        await query.edit_message_text(
+            f"Отправьте геопозицию СЦ {service_center.name} (скрепка → Геопозиция, можно выбрать точку на карте).\n"
+            f"Отмена — /cancel"
+        )
+        return SET_SC_LOCATION
+
+    async def handle_sc_location(self, update: Update, context: CallbackContext):
+        """Сохранение координат СЦ из присланной геопозиции"""
+        sc_id = context.user_data.pop("sc_location_id", None)
+        location = Location(latitude=update.message.location.latitude, longitude=update.message.location.longitude)
+        service_center = await self.service_center_service.update_service_center(sc_id, location=location)
+        if not service_center:
+            await update.message.reply_text("Сервисный центр не найден")
+            return ConversationHandler.END
+        await update.message.reply_text(
+            f"Координаты СЦ {service_center.name} сохранены: {location.latitude:.6f}, {location.longitude:.6f}"
+        )
+        return ConversationHandler.END
+
     async def show_all_requests(self, update: Update, context: CallbackContext):
-        """Отображение всех заявок"""
-        requests = await self.request_service.get_all_requests()
+        """Отображение всех заявок: одно сообщение с фильтрами и листанием"""
+        await self.show_requests_page(update, None, None, 'all', 0)
+
+    async def handle_browse_requests(self, update: Update, context: CallbackContext):
+        """Листание и смена фильтров в просмотре заявок (сообщение правится на месте)"""
+        # browse_<статус>_<СЦ>_<период>_<страница>, «-» — фильтр не задан
+        parts = update.callback_query.data.split('_')
+        if len(parts) != 5 or not parts[4].isdigit():
+            await update.callback_query.answer("Неверный формат данных")
+            return
+        status = None if parts[1] == '-' else parts[1]
+        sc_id = None if parts[2] == '-' else parts[2]
+        period = parts[3] if parts[3] in REQUEST_PERIODS else 'all'
+        await self.show_requests_page(update, status, sc_id, period, int(parts[4]))
+
+    async def show_requests_page(self, update: Update, status: Optional[str], sc_id: Optional[str],
+                                 period: str, page: int):
+        """Страница заявок по фильтрам; status — номер статуса в OrderStatus"""
+        statuses = list(OrderStatus)
+        if status is not None and not (status.isdigit() and int(status) < len(statuses)):
+            status = None
+        status_value = statuses[int(status)] if status is not None else None
+        title, days = REQUEST_PERIODS[period]
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds') if days else None
+        service_centers = await self.service_center_service.get_all_service_centers()
+        requests, total = await self.request_service.browse_requests(
+            status=status_value, sc_id=sc_id, since=since,
+            offset=page * ADMIN_REQUESTS_PAGE_SIZE, limit=ADMIN_REQUESTS_PAGE_SIZE
+        )
+        pages = (total + ADMIN_REQUESTS_PAGE_SIZE - 1) // ADMIN_REQUESTS_PAGE_SIZE
+        if not requests and page > 0 and pages:
+            # Заявок стало меньше, пока сообщение висело: показываем последнюю страницу
+            return await self.show_requests_page(update, status, sc_id, period, pages - 1)
+        sc_name = service_centers[sc_id].name if sc_id in service_centers else 'все'
+        lines = [
+            f"Заявки: {total}",
+            f"Статус: {status_value or 'все'} · СЦ: {sc_name} · Период: {title}",
+            ""
+        ]
+        for request in requests:
+            lines.append(f"#{request.id} · {request.status} · {request.user_name or 'Неизвестный'}")
+            lines.append(request.description[:100])
+            lines.append("")
         if not requests:
-            await update.message.reply_text("Заявок пока нет.")
+            lines.append("Заявок по этим фильтрам нет.")
+        # Фильтры переключаются по кругу; при смене фильтра листание начинается с первой страницы
+        next_status = _next_in_cycle([str(i) for i in range(len(statuses))], status)
+        next_sc = _next_in_cycle(list(service_centers), sc_id)
+        next_period = _next_in_cycle(list(REQUEST_PERIODS), period, allow_none=False)
+        keyboard = [
+            [InlineKeyboardButton(f"Привязать #{request.id} к СЦ", callback_data=f"assign_sc_{request.id}")]
+            for request in requests
+        ]
+        keyboard.append([
+            InlineKeyboardButton("Статус", callback_data=_browse_prefix(next_status, sc_id, period) + "0"),
+            InlineKeyboardButton("СЦ", callback_data=_browse_prefix(status, next_sc, period) + "0"),
+            InlineKeyboardButton("Период", callback_data=_browse_prefix(status, sc_id, next_period) + "0"),
+        ])
+        keyboard.append(self.page_buttons(_browse_prefix(status, sc_id, period), page, pages))
+        await self.show_page(update, "\n".join(lines), InlineKeyboardMarkup(keyboard))
+
+    async def handle_inline_search(self, update: Update, context: CallbackContext):
+        """Поиск заявок администратором через inline-запрос «@бот текст»; следующая порция — по offset"""
+        inline_query = update.inline_query
+        if inline_query.from_user.id not in ADMIN_IDS:
+            await inline_query.answer([], cache_time=0, is_personal=True)
             return
-        for request_id, request in requests.items():
+        offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+        requests, total = await self.request_service.search_requests(inline_query.query, offset, ADMIN_SEARCH_RESULTS)
+        results = []
+        for request in requests:
             message = (
                 f"Заявка #{request.id}\n"
                 f"Клиент: {request.user_name or 'Неизвестный'}\n"
                 f"Описание: {request.description}\n"
                 f"Статус: {request.status}\n"
             )
+            if isinstance(request.location, str):
+                message += f"Адрес: {request.location}\n"
             keyboard = [[InlineKeyboardButton("Привязать к СЦ", callback_data=f"assign_sc_{request.id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text(message, reply_markup=reply_markup)
+            results.append(InlineQueryResultArticle(
+                id=request.id,
+                title=f"#{request.id} · {request.status} · {request.user_name or 'Неизвестный'}",
+                description=request.description[:100],
+                input_message_content=InputTextMessageContent(message),
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            ))
+        next_offset = offset + ADMIN_SEARCH_RESULTS
+        await inline_query.answer(
+            results, cache_time=0, is_personal=True, next_offset=str(next_offset) if next_offset < total else ""
+        )
+
+
+# Периоды фильтра по дате создания: ключ -> (название, дней назад; None — без ограничения)
+REQUEST_PERIODS = {
+    'all': ('всё время', None),
+    '1': ('сутки', 1),
+    '7': ('неделя', 7),
+    '30': ('месяц', 30),
+}
+
+
+def _browse_prefix(status: Optional[str], sc_id: Optional[str], period: str) -> str:
+    """Начало callback_data просмотра заявок с заданными фильтрами (без номера страницы)"""
+    return f"browse_{status if status is not None else '-'}_{sc_id if sc_id is not None else '-'}_{period}_"
+
+
+def _next_in_cycle(values: List[str], current: Optional[str], allow_none: bool = True) -> Optional[str]:
+    """Следующее значение фильтра по кругу; с allow_none после последнего значения фильтр снимается"""
+    cycle = ([None] if allow_none else []) + values
+    if current not in cycle:
+        return cycle[0] if cycle else None
+    return cycle[(cycle.index(current) + 1) % len(cycle)]
@@ -1,10 +1,34 @@
-from telegram import Update, ReplyKeyboardMarkup
+from typing import List
+from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import CallbackContext
 
 
 class BaseHandler:
     """Базовый класс для всех обработчиков"""
 
+    async def show_page(self, update: Update, text: str, reply_markup=None):
+        """Вывод страницы списка: первое открытие — новым сообщением, листание — правкой того же сообщения"""
+        if update.callback_query:
+            await update.callback_query.answer()
+            await update.callback_query.edit_message_text(text, reply_markup=reply_markup)
+        else:
+            await update.message.reply_text(text, reply_markup=reply_markup)
+
+    async def handle_noop(self, update: Update, context: CallbackContext):
+        """Нажатие на кнопку без действия (номер страницы)"""
+        await update.callback_query.answer()
+
+    @staticmethod
+    def page_buttons(callback_prefix: str, page: int, pages: int) -> List[InlineKeyboardButton]:
+        """Кнопки «назад/вперёд» для страницы page из pages; callback_data — префикс и номер страницы"""
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"{callback_prefix}{page - 1}"))
+        buttons.append(InlineKeyboardButton(f"{page + 1}/{max(pages, 1)}", callback_data="noop"))
+        if page + 1 < pages:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"{callback_prefix}{page + 1}"))
+        return buttons
+
     async def show_client_menu(self, update: Update, context: CallbackContext):
         """Отображение меню клиента"""
         keyboard = [
@@ -1,11 +1,12 @@
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from datetime import datetime
+from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext, ConversationHandler
 from handlers.base_handler import BaseHandler
 from services.user import UserService
 from services.request import RequestService
 from services.notification_service import NotificationService
-from config import CREATE_REQUEST_DESC, CREATE_REQUEST_PHOTOS, CREATE_REQUEST_LOCATION, PHOTOS_DIR
-from utils import save_photo
+from config import CREATE_REQUEST_DESC, CREATE_REQUEST_PHOTOS, CREATE_REQUEST_LOCATION, PHOTOS_DIR, USER_REQUESTS_PAGE_SIZE
+from utils import save_photo, format_datetime
 
 
 class ClientHandler(BaseHandler):
@@ -28,9 +29,9 @@ class ClientHandler(BaseHandler):
 
     async def handle_request_photos(self, update: Update, context: CallbackContext):
         """Обработка фотографий проблемы"""
-        photo_path = await save_photo(update.message, PHOTOS_DIR)
-        if photo_path:
-            context.user_data["photos"].append(photo_path)
+        photo = await save_photo(update.message, PHOTOS_DIR)
+        if photo:
+            context.user_data["photos"].append(photo)
             await update.message.reply_text(f"Фото #{len(context.user_data['photos'])} загружено. Отправьте еще или /done для завершения.")
         return CREATE_REQUEST_PHOTOS
 
@@ -81,31 +82,61 @@ class ClientHandler(BaseHandler):
         )
         # Уведомление администраторов
         await self.notification_service.notify_about_new_request(update.get_bot(), request.id, request.to_dict())
-        # Отправка фотографий администраторам
-        from config import ADMIN_IDS
-        for admin_id in ADMIN_IDS:
-            for photo_path in context.user_data["photos"]:
-                try:
-                    with open(photo_path, 'rb') as photo:
-                        await update.get_bot().send_photo(chat_id=admin_id, photo=photo)
-                except Exception as e:
-                    print(f"Ошибка при отправке фото администратору {admin_id}: {e}")
-        
+        # Отправка фотографий администраторам: один альбом каждому, по file_id без повторной загрузки
+        await self.notification_service.notify_admins_photos(
+            update.get_bot(), request.photos, caption=f"Фото к заявке #{request.id}"
+        )
+
         # Отображение меню клиента после создания заявки
         await self.show_client_menu(update, context)
         return ConversationHandler.END
 
     async def show_user_requests(self, update: Update, context: CallbackContext):
         """Отображение заявок пользователя"""
+        await self.show_user_requests_page(update, 0)
+
+    async def handle_user_requests_page(self, update: Update, context: CallbackContext):
+        """Листание «Мои заявки»: callback_data myreqs_<страница>"""
+        page = update.callback_query.data.split('_')[1]
+        await self.show_user_requests_page(update, int(page) if page.isdigit() else 0)
+
+    async def show_user_requests_page(self, update: Update, page: int):
+        """Страница заявок пользователя в одном сообщении, новые первыми"""
         user_id = str(update.effective_user.id)
         requests = await self.request_service.get_user_requests(user_id)
         if not requests:
-            await update.message.reply_text("У вас пока нет заявок.")
+            await self.show_page(update, "У вас пока нет заявок.")
             return
+        requests.sort(key=lambda request: (len(request.id), request.id), reverse=True)
+        pages = (len(requests) + USER_REQUESTS_PAGE_SIZE - 1) // USER_REQUESTS_PAGE_SIZE
+        page = min(page, pages - 1)
+        requests = requests[page * USER_REQUESTS_PAGE_SIZE:(page + 1) * USER_REQUESTS_PAGE_SIZE]
+        lines = ["Ваши заявки:", ""]
         for request in requests:
-            message = (
-                f"Заявка #{request.id}\n"
-                f"Описание: {request.description}\n"
-                f"Статус: {request.status}\n"
-            )
-            await update.message.reply_text(message)
+            lines.append(f"#{request.id} · {request.status}")
+            lines.append(request.description[:100])
+            lines.append("")
+        keyboard = [
+            [InlineKeyboardButton(f"Заявка #{request.id}", callback_data=f"myreq_{request.id}_{page}")]
+            for request in requests
+        ]
+        keyboard.append(self.page_buttons("myreqs_", page, pages))
+        await self.show_page(update, "\n".join(lines), InlineKeyboardMarkup(keyboard))
+
+    async def handle_user_request_details(self, update: Update, context: CallbackContext):
+        """Подробности заявки из списка: callback_data myreq_<ID заявки>_<страница списка>"""
+        _, request_id, page = update.callback_query.data.split('_')
+        request = await self.request_service.get_request(request_id)
+        if not request or request.user_id != str(update.effective_user.id):
+            await update.callback_query.answer("Заявка не найдена")
+            return
+        message = (
+            f"Заявка #{request.id}\n"
+            f"Описание: {request.description}\n"
+            f"Статус: {request.status}\n"
+            f"Фото: {len(request.photos)}\n"
+        )
+        if request.created_at:
+            message += f"Создана: {format_datetime(datetime.fromisoformat(request.created_at))}\n"
+        keyboard = [[InlineKeyboardButton("◀️ К списку", callback_data=f"myreqs_{page}")]]
+        await self.show_page(update, message, InlineKeyboardMarkup(keyboard))
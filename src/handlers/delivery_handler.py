@@ -1,10 +1,15 @@
+from typing import Optional
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update, ReplyKeyboardMarkup
 from telegram.ext import CallbackContext, ConversationHandler
 from handlers.base_handler import BaseHandler
 from services.user import UserService
 from services.delivery import DeliveryService
 from services.notification_service import NotificationService
-from config import ENTER_NAME, ENTER_PHONE, ORDER_STATUS_IN_SC, ORDER_STATUS_DELIVERY_TO_SC
+from models import DeliveryStatus
+from config import (
+    ENTER_NAME, ENTER_PHONE, ORDER_STATUS_IN_SC, ORDER_STATUS_DELIVERY_TO_SC, DELIVERY_TASKS_PAGE_SIZE,
+    AVAILABLE_TASKS_LIMIT
+)
 
 
 class DeliveryHandler(BaseHandler):
@@ -54,45 +59,66 @@ class DeliveryHandler(BaseHandler):
         user_id = str(update.effective_user.id)
         tasks = await self.delivery_service.get_delivery_tasks(user_id)
         if not tasks:
-            # Показываем доступные задачи
-            available_tasks = await self.delivery_service.get_available_tasks()
-            if not available_tasks:
-                await update.message.reply_text("Нет доступных задач доставки.")
-                return
-            await update.message.reply_text("Ваши текущие задачи отсутствуют. Доступные задачи:")
-            for task in available_tasks:
-                message = (
-                    f"Задача #{task.task_id}\n"
-                    f"Заявка: #{task.request_id}\n"
-                    f"СЦ: {task.sc_name}\n"
-                    f"Клиент: {task.client_name or 'Неизвестный'}\n"
-                    f"Адрес: {task.client_address}\n"
-                    f"Описание: {task.description or 'Нет описания'}\n"
-                )
-                keyboard = [[InlineKeyboardButton("Принять", callback_data=f"accept_delivery_{task.task_id}")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(message, reply_markup=reply_markup)
+            # Текущих задач нет — сразу показываем доступные
+            await self.show_available_tasks_page(update, 0)
         else:
-            await update.message.reply_text("Ваши текущие задачи:")
-            for task in tasks:
-                message = (
-                    f"Задача #{task.task_id}\n"
-                    f"Заявка: #{task.request_id}\n"
-                    f"СЦ: {task.sc_name}\n"
-                    f"Клиент: {task.client_name or 'Неизвестный'}\n"
-                    f"Адрес: {task.client_address}\n"
-                    f"Статус: {task.status}\n"
-                )
-                keyboard = []
-                if task.status == "Принято":
-                    keyboard.append([InlineKeyboardButton("Доставлено клиенту", callback_data=f"delivered_to_client_{task.task_id}")])
-                elif task.status == ORDER_STATUS_DELIVERY_TO_SC:
-                    keyboard.append([InlineKeyboardButton("Доставлено в СЦ", callback_data=f"delivered_to_sc_{task.task_id}")])
-                if keyboard:
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text(message, reply_markup=reply_markup)
-                else:
-                    await update.message.reply_text(message)
+            await self.show_delivery_tasks_page(update, 0)
+
+    async def handle_delivery_tasks_page(self, update: Update, context: CallbackContext):
+        """Листание «Мои задания»: callback_data mytasks_<страница>"""
+        await self.show_delivery_tasks_page(update, _page_number(update.callback_query.data))
+
+    async def handle_available_tasks_page(self, update: Update, context: CallbackContext):
+        """Листание доступных задач: callback_data avail_<страница>"""
+        await self.show_available_tasks_page(update, _page_number(update.callback_query.data))
+
+    async def show_delivery_tasks_page(self, update: Update, page: int):
+        """Страница текущих задач доставщика в одном сообщении"""
+        user_id = str(update.effective_user.id)
+        tasks = await self.delivery_service.get_delivery_tasks(user_id)
+        tasks.sort(key=lambda task: (len(task.task_id), task.task_id))
+        pages = (len(tasks) + DELIVERY_TASKS_PAGE_SIZE - 1) // DELIVERY_TASKS_PAGE_SIZE
+        page = max(min(page, pages - 1), 0)
+        tasks = tasks[page * DELIVERY_TASKS_PAGE_SIZE:(page + 1) * DELIVERY_TASKS_PAGE_SIZE]
+        lines = ["Ваши текущие задачи:", ""]
+        keyboard = []
+        for task in tasks:
+            lines.append(f"#{task.task_id} · {task.status} · Заявка #{task.request_id}")
+            lines.append(f"СЦ: {task.sc_name}")
+            lines.append(f"Клиент: {task.client_name or 'Неизвестный'}, {task.client_address}")
+            lines.append("")
+            if task.status == DeliveryStatus.ACCEPTED:
+                keyboard.append([InlineKeyboardButton(f"#{task.task_id}: доставлено клиенту", callback_data=f"delivered_to_client_{task.task_id}")])
+            elif task.status == ORDER_STATUS_DELIVERY_TO_SC:
+                keyboard.append([InlineKeyboardButton(f"#{task.task_id}: доставлено в СЦ", callback_data=f"delivered_to_sc_{task.task_id}")])
+        if not tasks:
+            lines.append("Текущих задач нет.")
+        keyboard.append(self.page_buttons("mytasks_", page, pages))
+        keyboard.append([InlineKeyboardButton("Доступные задачи", callback_data="avail_0")])
+        await self.show_page(update, "\n".join(lines), InlineKeyboardMarkup(keyboard))
+
+    async def show_available_tasks_page(self, update: Update, page: int):
+        """Страница доступных задач: только AVAILABLE_TASKS_LIMIT самых подходящих доставщику"""
+        user_id = str(update.effective_user.id)
+        tasks = await self.delivery_service.get_relevant_tasks(user_id, AVAILABLE_TASKS_LIMIT)
+        keyboard = [[InlineKeyboardButton("Мои задания", callback_data="mytasks_0")]]
+        if not tasks:
+            await self.show_page(update, "Нет доступных задач доставки.", InlineKeyboardMarkup(keyboard))
+            return
+        pages = (len(tasks) + DELIVERY_TASKS_PAGE_SIZE - 1) // DELIVERY_TASKS_PAGE_SIZE
+        page = min(page, pages - 1)
+        tasks = tasks[page * DELIVERY_TASKS_PAGE_SIZE:(page + 1) * DELIVERY_TASKS_PAGE_SIZE]
+        lines = ["Доступные задачи:", ""]
+        for task in tasks:
+            lines.append(f"#{task.task_id} · Заявка #{task.request_id} · СЦ: {task.sc_name}")
+            lines.append(f"Клиент: {task.client_name or 'Неизвестный'}, {task.client_address}")
+            lines.append((task.description or 'Нет описания')[:100])
+            lines.append("")
+        keyboard = [
+            [InlineKeyboardButton(f"Принять #{task.task_id}", callback_data=f"accept_delivery_{task.task_id}")]
+            for task in tasks
+        ] + [self.page_buttons("avail_", page, pages)] + keyboard
+        await self.show_page(update, "\n".join(lines), InlineKeyboardMarkup(keyboard))
 
     async def handle_accept_delivery(self, update: Update, context: CallbackContext):
         """Обработка принятия задачи доставки"""
@@ -109,9 +135,7 @@ class DeliveryHandler(BaseHandler):
             await query.edit_message_text("Не удалось принять задачу. Возможно, она уже принята другим доставщиком.")
             return
         # Уведомляем клиента
-        from src.services.request import RequestService
-        request_service = RequestService()
-        request = await request_service.get_request(task.request_id)
+        request = await self.delivery_service.request_service.get_request(task.request_id)
         if request:
             user = await self.user_service.get_user(delivery_id)
             delivery_name = user.name if user else "Доставщик"
@@ -121,7 +145,7 @@ class DeliveryHandler(BaseHandler):
                 f"Доставщик {delivery_name} принял вашу заявку #{request.id} и скоро будет у вас."
             )
         # Уведомляем других доставщиков
-        await self.update_delivery_messages(update.get_bot(), task_id, task.to_dict())
+        await self.update_delivery_messages(update.get_bot(), task_id, task.to_dict(), query.message.message_id)
         await query.edit_message_text(
             f"Вы приняли задачу #{task_id}.\n"
             f"Заявка: #{task.request_id}\n"
@@ -144,9 +168,7 @@ class DeliveryHandler(BaseHandler):
             await query.edit_message_text("Не удалось обновить статус задачи")
             return
         # Уведомляем клиента
-        from src.services.request import RequestService
-        request_service = RequestService()
-        request = await request_service.get_request(task.request_id)
+        request = await self.delivery_service.request_service.get_request(task.request_id)
         if request:
             await self.notification_service.notify_user(
                 update.get_bot(),
@@ -174,9 +196,7 @@ class DeliveryHandler(BaseHandler):
             await query.edit_message_text("Не удалось обновить статус задачи")
             return
         # Уведомляем клиента
-        from src.services.request import RequestService
-        request_service = RequestService()
-        request = await request_service.get_request(task.request_id)
+        request = await self.delivery_service.request_service.get_request(task.request_id)
         if request:
             await self.notification_service.notify_user(
                 update.get_bot(),
@@ -185,16 +205,25 @@ class DeliveryHandler(BaseHandler):
             )
         await query.edit_message_text(f"Отличная работа! Заказ №{task.request_id} доставлен в Сервисный Центр.")
 
-    async def update_delivery_messages(self, bot: Bot, task_id: str, task_data: dict):
-        """Обновление сообщений для других доставщиков"""
-        from src.config import DELIVERY_IDS
-        for delivery_id in DELIVERY_IDS:
-            if delivery_id != int(task_data.get('assigned_to', '0')):
-                message = f"Задача доставки #{task_id} принята другим доставщиком.\n"
-                message += f"Заявка: #{task_data['request_id']}\n"
-                message += f"СЦ: {task_data['sc_name']}\n"
-                message += f"Статус: {task_data['status']}"
-                try:
-                    await bot.send_message(chat_id=delivery_id, text=message)
-                except Exception as e:
-                    print(f"Ошибка при отправке уведомления доставщику {delivery_id}: {e}")
+    async def update_delivery_messages(self, bot: Bot, task_id: str, task_data: dict, accepted_message_id: Optional[int] = None):
+        """Закрытие предложения задачи у доставщиков: их сообщения правятся на месте, кнопка убирается.
+
+        accepted_message_id — сообщение, в котором задачу приняли: его правит сам обработчик нажатия.
+        Если задачу приняли из списка, собственное предложение принявшего тоже закрывается.
+        """
+        details = f"Заявка: #{task_data['request_id']}\n"
+        details += f"СЦ: {task_data['sc_name']}\n"
+        details += f"Статус: {task_data['status']}"
+        assigned_to = task_data.get('assigned_to')
+        await self.notification_service.close_delivery_offer(
+            task_id,
+            f"Задача доставки #{task_id} принята другим доставщиком.\n" + details,
+            skip={assigned_to: accepted_message_id} if accepted_message_id is not None else None,
+            texts={assigned_to: f"Вы приняли задачу доставки #{task_id}.\n" + details}
+        )
+
+
+def _page_number(callback_data: str) -> int:
+    """Номер страницы из callback_data вида <префикс>_<страница>"""
+    page = callback_data.rsplit('_', 1)[-1]
+    return int(page) if page.isdigit() else 0
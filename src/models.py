@@ -1,21 +1,74 @@
+import sys
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import Dict, List, Optional, Union, Any
 
+from config import (
+    ORDER_STATUS_NEW, ORDER_STATUS_ASSIGNED_TO_SC, ORDER_STATUS_DELIVERY_TO_CLIENT,
+    ORDER_STATUS_DELIVERY_TO_SC, ORDER_STATUS_IN_SC, ORDER_STATUS_READY, ORDER_STATUS_COMPLETED,
+    DELIVERY_STATUS_PENDING, DELIVERY_STATUS_ACCEPTED
+)
 
-@dataclass
+
+class StrValueEnum(str, Enum):
+    """Перечисление строк: члены — единственные экземпляры значений, в тексте и JSON выглядят как сами строки"""
+
+    def __str__(self) -> str:
+        return str.__str__(self)
+
+    def __format__(self, format_spec: str) -> str:
+        return str.__format__(str.__str__(self), format_spec)
+
+    @classmethod
+    def parse(cls, value: Any) -> Any:
+        """Член перечисления для известного значения, иначе интернированная строка"""
+        # Прямой поиск по словарю значений: вызов cls(value) заметно медленнее на холодной загрузке
+        member = cls._value2member_map_.get(value)
+        return member if member is not None else _intern(value)
+
+
+class OrderStatus(StrValueEnum):
+    NEW = ORDER_STATUS_NEW
+    ASSIGNED_TO_SC = ORDER_STATUS_ASSIGNED_TO_SC
+    DELIVERY_TO_CLIENT = ORDER_STATUS_DELIVERY_TO_CLIENT
+    DELIVERY_TO_SC = ORDER_STATUS_DELIVERY_TO_SC
+    IN_SC = ORDER_STATUS_IN_SC
+    READY = ORDER_STATUS_READY
+    COMPLETED = ORDER_STATUS_COMPLETED
+
+
+class DeliveryStatus(StrValueEnum):
+    PENDING = DELIVERY_STATUS_PENDING
+    ACCEPTED = DELIVERY_STATUS_ACCEPTED
+    DELIVERY_TO_SC = ORDER_STATUS_DELIVERY_TO_SC
+    IN_SC = ORDER_STATUS_IN_SC
+
+
+class UserRole(StrValueEnum):
+    CLIENT = "client"
+    ADMIN = "admin"
+    DELIVERY = "delivery"
+
+
+def _intern(value: Any) -> Any:
+    """Интернирование часто повторяющихся строк (ID пользователей, СЦ, доставщиков)"""
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(frozen=True, slots=True)
 class User:
     id: str
     name: Optional[str] = None
     phone: Optional[str] = None
-    role: str = "client"  # "client", "admin", "delivery"
+    role: UserRole = UserRole.CLIENT
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'User':
+    def from_dict(cls, data: dict, key: Optional[str] = None) -> 'User':
         return cls(
-            id=data.get('id', ''),
+            id=_intern(data.get('id', '') if key is None else key),
             name=data.get('name'),
             phone=data.get('phone'),
-            role=data.get('role', 'client')
+            role=UserRole.parse(data.get('role', UserRole.CLIENT))
         )
 
     def to_dict(self) -> dict:
@@ -26,7 +79,7 @@ class User:
         }
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Location:
     latitude: float
     longitude: float
@@ -45,18 +98,39 @@ class Location:
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class Photo:
+    """Фото заявки: file_id в Telegram для повторной отправки без загрузки и копия на диске"""
+    path: str
+    file_id: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {
+            'path': self.path,
+            'file_id': self.file_id
+        }
+
+    @classmethod
+    def from_dict(cls, data: Union[Dict[str, Any], str]) -> 'Photo':
+        # Заявки, созданные до появления file_id, хранят только путь к файлу
+        if isinstance(data, str):
+            return cls(path=data)
+        return cls(path=data.get('path', ''), file_id=data.get('file_id'))
+
+
+@dataclass(frozen=True, slots=True)
 class Request:
     id: str
     user_id: str
     description: str
-    status: str = "Новая"
+    status: OrderStatus = OrderStatus.NEW
     user_name: Optional[str] = None
-    photos: List[str] = field(default_factory=list)
+    photos: List[Photo] = field(default_factory=list)
     location: Optional[Union[Location, Dict, str]] = None
     location_link: Optional[str] = None
     assigned_sc: Optional[str] = None
     assigned_delivery: Optional[str] = None
+    created_at: Optional[str] = None  # ISO-время создания; у заявок, созданных раньше, его нет
 
     @property
     def location_url(self) -> str:
@@ -67,7 +141,7 @@ class Request:
         return "Местоположение не указано"
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Request':
+    def from_dict(cls, data: Dict[str, Any], key: Optional[str] = None) -> 'Request':
         location = data.get('location')
         if isinstance(location, dict) and 'latitude' in location and 'longitude' in location:
             location_obj = Location.from_dict(location)
@@ -75,16 +149,17 @@ class Request:
             location_obj = location
 
         return cls(
-            id=data.get('id', ''),
-            user_id=data.get('user_id', ''),
+            id=data.get('id', '') if key is None else key,
+            user_id=_intern(data.get('user_id', '')),
             description=data.get('description', ''),
-            status=data.get('status', 'Новая'),
+            status=OrderStatus.parse(data.get('status', OrderStatus.NEW)),
             user_name=data.get('user_name'),
-            photos=data.get('photos', []),
+            photos=[Photo.from_dict(photo) for photo in data.get('photos', [])],
             location=location_obj,
             location_link=data.get('location_link'),
-            assigned_sc=data.get('assigned_sc'),
-            assigned_delivery=data.get('assigned_delivery')
+            assigned_sc=_intern(data.get('assigned_sc')),
+            assigned_delivery=_intern(data.get('assigned_delivery')),
+            created_at=data.get('created_at')
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -92,7 +167,7 @@ class Request:
             'user_id': self.user_id,
             'description': self.description,
             'status': self.status,
-            'photos': self.photos,
+            'photos': [photo.to_dict() for photo in self.photos],
             'assigned_sc': self.assigned_sc,
             'assigned_delivery': self.assigned_delivery
         }
@@ -100,6 +175,9 @@ class Request:
         if self.user_name:
             result['user_name'] = self.user_name
 
+        if self.created_at:
+            result['created_at'] = self.created_at
+
         if self.location:
             if isinstance(self.location, Location):
                 result['location'] = self.location.to_dict()
@@ -113,38 +191,43 @@ class Request:
         return result
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ServiceCenter:
     id: str
     name: str
     address: str
     phone: Optional[str] = None
     description: Optional[str] = None
+    location: Optional[Location] = None  # Координаты для подбора ближайшего к клиенту СЦ
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'ServiceCenter':
+    def from_dict(cls, data: Dict[str, Any], key: Optional[str] = None) -> 'ServiceCenter':
         return cls(
-            id=data.get('id', ''),
+            id=data.get('id', '') if key is None else key,
             name=data.get('name', ''),
             address=data.get('address', ''),
             phone=data.get('phone'),
-            description=data.get('description')
+            description=data.get('description'),
+            location=Location.from_dict(data['location']) if data.get('location') else None
         )
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
+        result = {
             'name': self.name,
             'address': self.address,
             'phone': self.phone,
             'description': self.description
         }
+        if self.location:
+            result['location'] = self.location.to_dict()
+        return result
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DeliveryTask:
     task_id: str
     request_id: str
-    status: str
+    status: DeliveryStatus
     sc_name: str
     client_address: str
     client_name: Optional[str] = None
@@ -153,17 +236,17 @@ class DeliveryTask:
     assigned_to: Optional[str] = None
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'DeliveryTask':
+    def from_dict(cls, data: Dict[str, Any], key: Optional[str] = None) -> 'DeliveryTask':
         return cls(
-            task_id=data.get('task_id', ''),
+            task_id=data.get('task_id', '') if key is None else key,
             request_id=data.get('request_id', ''),
-            status=data.get('status', 'Ожидает'),
-            sc_name=data.get('sc_name', ''),
+            status=DeliveryStatus.parse(data.get('status', DeliveryStatus.PENDING)),
+            sc_name=_intern(data.get('sc_name', '')),
             client_address=data.get('client_address', ''),
             client_name=data.get('client_name'),
             client_phone=data.get('client_phone'),
             description=data.get('description'),
-            assigned_to=data.get('assigned_to')
+            assigned_to=_intern(data.get('assigned_to'))
         )
 
     def to_dict(self) -> Dict[str, Any]:
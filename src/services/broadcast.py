@@ -0,0 +1,183 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from datetime import timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable, Set, TypeVar
+
+from telegram.error import RetryAfter, NetworkError, BadRequest
+
+from config import (
+    BROADCAST_CONCURRENCY, BROADCAST_GLOBAL_RATE, BROADCAST_CHAT_RATE, BROADCAST_CHAT_BURST,
+    BROADCAST_MAX_RETRIES, BROADCAST_STATS_WINDOW, BOT_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """Ограничитель скорости: rate разрешений в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def idle(self) -> bool:
+        """Ведро полное и не на паузе: его можно забыть без потери ограничения"""
+        now = time.monotonic()
+        self._refill(now)
+        return self._tokens >= self.capacity and now >= self._paused_until
+
+    async def acquire(self, cost: float = 1) -> None:
+        """Ожидание разрешения на cost отправок.
+
+        Запрос дороже ёмкости ведра ждёт полного ведра и забирает его целиком: больше
+        ведро не накопит никогда.
+        """
+        cost = min(cost, self.capacity)
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._paused_until - now
+            if wait <= 0:
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                wait = (cost - self._tokens) / self.rate
+            # После сна условие проверяется заново: пока ждали, разрешения могли забрать или поставить паузу
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Запрет отправок на seconds секунд (ответ Telegram RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class Broadcaster:
+    """Параллельная отправка запросов к Telegram с учётом ограничений скорости.
+
+    Одновременно выполняется не больше BROADCAST_CONCURRENCY запросов; каждая отправка ждёт
+    разрешения от ведра своего чата и общего ведра бота. На RetryAfter чат и весь бот ставятся
+    на паузу, после которой запрос повторяется. Сам запрос передаётся функцией без аргументов,
+    поэтому движку всё равно, какой это метод Bot, а в проверках Bot легко заменить заглушкой.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> 'Broadcaster':
+        """Общий движок процесса: ограничения Telegram действуют на весь бот"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, concurrency: int = BROADCAST_CONCURRENCY, global_rate: float = BROADCAST_GLOBAL_RATE / BOT_WORKERS,
+                 chat_rate: float = BROADCAST_CHAT_RATE, chat_burst: float = BROADCAST_CHAT_BURST,
+                 max_retries: int = BROADCAST_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        # Общий лимит делится между рабочими процессами бота
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sent_at: deque = deque()  # Время успешных отправок за последнее окно статистики
+        self.counters = {'sent': 0, 'failed': 0, 'retries': 0, 'queued': 0, 'max_queued': 0}
+        self.errors: Dict[Any, str] = {}  # Последняя ошибка чатов, в которые отправить не удалось
+        # Чаты, последнюю отправку в которые Telegram отклонил окончательно (бот заблокирован,
+        # чат не найден): повтор того же запроса не поможет
+        self.rejected: Set[Any] = set()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 10000:
+                # Забываем чаты, которым давно ничего не отправляли
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def send(self, chat_id: Any, request: Callable[[], Awaitable[T]], cost: int = 1) -> Optional[T]:
+        """Выполнение запроса в чат с ожиданием лимитов; при ошибке — запись в лог и None.
+
+        cost — сколько сообщений отправляет запрос (например, число фото в альбоме).
+        """
+        chat = self._chat_bucket(chat_id)
+        self.counters['queued'] += 1
+        self.counters['max_queued'] = max(self.counters['max_queued'], self.counters['queued'])
+        queued = True
+        try:
+            for attempt in range(self.max_retries + 1):
+                await chat.acquire(cost)
+                async with self._semaphore:
+                    await self._global.acquire(cost)
+                    if queued:
+                        self.counters['queued'] -= 1
+                        queued = False
+                    try:
+                        result = await request()
+                    except RetryAfter as e:
+                        delay = e.retry_after
+                        if isinstance(delay, timedelta):
+                            delay = delay.total_seconds()
+                        logger.warning(f"Telegram просит подождать {delay} с перед отправкой в чат {chat_id}")
+                        chat.pause(delay)
+                        self._global.pause(delay)
+                        error = e
+                    except BadRequest as e:
+                        # BadRequest наследует NetworkError, но повтор того же запроса не поможет
+                        return self._failed(chat_id, e, permanent=True)
+                    except NetworkError as e:
+                        # Сетевой сбой (в том числе таймаут) — повтор с нарастающей паузой
+                        chat.pause(2 ** attempt)
+                        error = e
+                    except Exception as e:
+                        # Forbidden и прочие отказы: повторяются только RetryAfter и сетевые сбои
+                        return self._failed(chat_id, e, permanent=True)
+                    else:
+                        self.errors.pop(chat_id, None)
+                        self.rejected.discard(chat_id)
+                        self.counters['sent'] += cost
+                        self._sent_at.append((time.monotonic(), cost))
+                        return result
+                if attempt < self.max_retries:
+                    self.counters['retries'] += 1
+            logger.warning(f"Повторы отправки в чат {chat_id} исчерпаны")
+            return self._failed(chat_id, error)
+        finally:
+            if queued:
+                self.counters['queued'] -= 1
+
+    def _failed(self, chat_id: Any, error: Exception, permanent: bool = False) -> None:
+        logger.error(f"Ошибка при отправке в чат {chat_id}: {error}")
+        self.counters['failed'] += 1
+        self.errors[chat_id] = str(error)
+        if permanent:
+            self.rejected.add(chat_id)
+        else:
+            self.rejected.discard(chat_id)
+        return None
+
+    async def broadcast(self, chat_ids: Iterable[Any], request: Callable[[Any], Awaitable[T]],
+                        cost: int = 1) -> Dict[Any, Optional[T]]:
+        """Параллельная отправка в несколько чатов: request(chat_id) для каждого; результат по чатам"""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        results = await asyncio.gather(*(self.send(chat_id, lambda chat_id=chat_id: request(chat_id), cost)
+                                         for chat_id in chat_ids))
+        return dict(zip(chat_ids, results))
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики отправок, глубина очереди и скорость отправки (сообщений в секунду) за окно"""
+        border = time.monotonic() - BROADCAST_STATS_WINDOW
+        while self._sent_at and self._sent_at[0][0] < border:
+            self._sent_at.popleft()
+        throughput = sum(cost for _, cost in self._sent_at) / BROADCAST_STATS_WINDOW
+        return {**self.counters, 'throughput': round(throughput, 2), 'chats': len(self._chats)}
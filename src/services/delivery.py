@@ -1,51 +1,84 @@
-from typing import List, Optional, Dict
-from models import DeliveryTask
-from storage import JsonStorage
+import heapq
+from collections import Counter
+from dataclasses import replace
+from typing import List, Optional, Mapping
+from models import DeliveryTask, DeliveryStatus, OrderStatus
+from storage import (
+    get_storage, IdentityMap, SequenceAllocator, Transaction, ConflictError, record_version,
+    ArchiveStorage, archive_records
+)
 from services.request import RequestService
-from services.notification_service import NotificationService
-from config import DELIVERY_TASKS_JSON, ORDER_STATUS_DELIVERY_TO_CLIENT
+from services.notification_service import NotificationService, delivery_offer_key
+from config import DELIVERY_TASKS_JSON
 
 
 class DeliveryService:
     def __init__(self):
-        self.storage = JsonStorage.get_instance(DELIVERY_TASKS_JSON)
+        self.storage = get_storage(DELIVERY_TASKS_JSON)
+        # Задания, доставленные в СЦ, уходят в архив; ID новых заданий продолжают и архивные
+        self.archive = ArchiveStorage.get_instance('delivery_tasks')
+        self.ids = SequenceAllocator.get_instance('delivery_tasks', self.storage, archive=self.archive)
+        self.storage.ensure_index('status')
+        self.storage.ensure_index('assigned_to')
+        self.tasks = IdentityMap.get_instance(
+            self.storage, lambda task_id, task_data: DeliveryTask.from_dict(task_data, task_id)
+        )
         self.request_service = RequestService()
         self.notification_service = NotificationService()
 
     async def get_task(self, task_id: str) -> Optional[DeliveryTask]:
-        """Получение задачи доставки по ID"""
-        data = await self.storage.get(task_id)
-        if data:
-            return DeliveryTask.from_dict({**data, 'task_id': task_id})
-        return None
+        """Получение задачи доставки по ID (активной или из архива)"""
+        task = await self.tasks.get(task_id)
+        if task is None:
+            data = await self.archive.get(task_id)
+            task = DeliveryTask.from_dict(data, task_id) if data else None
+        return task
 
-    async def get_all_tasks(self) -> Dict[str, DeliveryTask]:
-        """Получение всех задач доставки"""
-        data = await self.storage.load()
-        return {task_id: DeliveryTask.from_dict({**task_data, 'task_id': task_id})
-                for task_id, task_data in data.items()}
+    async def get_all_tasks(self) -> Mapping[str, DeliveryTask]:
+        """Получение всех задач доставки (неизменяемое отображение разделяемых объектов)"""
+        return await self.tasks.all()
 
     async def get_available_tasks(self) -> List[DeliveryTask]:
         """Получение доступных задач доставки"""
-        tasks = await self.get_all_tasks()
-        return [task for task in tasks.values() if task.status == "Ожидает"]
+        return self.tasks.resolve(await self.storage.find('status', DeliveryStatus.PENDING))
+
+    async def get_relevant_tasks(self, delivery_id: str, limit: int) -> List[DeliveryTask]:
+        """Не больше limit доступных задач, самые подходящие доставщику первыми.
+
+        Выше задачи в СЦ, куда доставщик уже возит (чем больше его задач туда, тем выше),
+        среди равных — дольше всех ожидающие (меньший ID). Объекты создаются только для отобранных.
+        """
+        pending = await self.storage.find('status', DeliveryStatus.PENDING)
+        own = await self.storage.find('assigned_to', delivery_id)
+        familiar = Counter(task.get('sc_name') for task in own.values())
+        best = heapq.nsmallest(
+            limit, pending.items(), key=lambda item: (-familiar[item[1].get('sc_name')], len(item[0]), item[0])
+        )
+        return self.tasks.resolve(dict(best))
 
     async def get_delivery_tasks(self, delivery_id: str) -> List[DeliveryTask]:
         """Получение задач доставки для конкретного доставщика"""
-        tasks = await self.get_all_tasks()
-        return [task for task in tasks.values() if task.assigned_to == delivery_id]
+        return self.tasks.resolve(await self.storage.find('assigned_to', delivery_id))
+
+    async def archive_delivered(self) -> int:
+        """Перенос заданий, доставленных в СЦ, в архив"""
+        delivered = list(await self.storage.find('status', DeliveryStatus.IN_SC))
+        archived = await archive_records(self.storage, self.archive, 'status', DeliveryStatus.IN_SC)
+        if archived:
+            # Предложения этих заданий давно закрыты и больше не правятся
+            await self.notification_service.forget_tracked([delivery_offer_key(task_id) for task_id in delivered])
+        return archived
 
     async def create_delivery_task(self, request_id: str, sc_name: str) -> Optional[DeliveryTask]:
         """Создание новой задачи доставки"""
         request = await self.request_service.get_request(request_id)
         if not request:
             return None
-        data = await self.storage.load()
-        task_id = str(len(data) + 1)
+        task_id = await self.ids.next_id()
         task = DeliveryTask(
             task_id=task_id,
             request_id=request_id,
-            status="Ожидает",
+            status=DeliveryStatus.PENDING,
             sc_name=sc_name,
             client_address=request.location_link if request.location_link else "Адрес не указан",
             client_name=request.user_name,
@@ -56,24 +89,32 @@ class DeliveryService:
 
     async def accept_task(self, task_id: str, delivery_id: str) -> Optional[DeliveryTask]:
         """Принятие задачи доставки доставщиком"""
-        task = await self.get_task(task_id)
-        if task and task.status == "Ожидает":
-            task.status = "Принято"
-            task.assigned_to = delivery_id
-            await self.storage.set(task_id, task.to_dict())
-            # Обновляем статус заявки
-            await self.request_service.update_request_status(task.request_id, ORDER_STATUS_DELIVERY_TO_CLIENT)
-            await self.request_service.assign_to_delivery(task.request_id, delivery_id)
-            return task
-        return None
+        record = await self.storage.get(task_id)
+        # Быстрый отказ, если задачу уже приняли: без транзакции и блокировок
+        if not record or record.get('status') != DeliveryStatus.PENDING:
+            return None
+        version = record_version(record)
+        task = replace(await self.tasks.get(task_id), status=DeliveryStatus.ACCEPTED, assigned_to=delivery_id)
+        try:
+            # Задача и заявка фиксируются вместе; задача — только если её не приняли с момента чтения
+            async with Transaction() as tx:
+                tx.set(self.storage, task_id, task.to_dict(), expected_version=version)
+                await self.request_service.update_request(
+                    task.request_id, tx,
+                    status=OrderStatus.DELIVERY_TO_CLIENT, assigned_delivery=delivery_id
+                )
+        except ConflictError:
+            return None
+        return task
 
     async def update_task_status(self, task_id: str, status: str) -> Optional[DeliveryTask]:
         """Обновление статуса задачи доставки"""
         task = await self.get_task(task_id)
         if task:
-            task.status = status
-            await self.storage.set(task_id, task.to_dict())
-            # Обновляем статус заявки
-            await self.request_service.update_request_status(task.request_id, status)
+            task = replace(task, status=DeliveryStatus.parse(status))
+            async with Transaction() as tx:
+                tx.set(self.storage, task_id, task.to_dict())
+                # Обновляем статус заявки
+                await self.request_service.update_request_status(task.request_id, status, tx)
             return task
         return None
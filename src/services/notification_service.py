@@ -1,34 +1,205 @@
-from typing import List, Optional, Dict, Any
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from config import ADMIN_IDS, DELIVERY_IDS
+import asyncio
+from contextlib import ExitStack
+from dataclasses import replace
+from typing import List, Optional, Dict, Any, Tuple
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, Message
+from telegram.error import BadRequest
+from config import ADMIN_IDS, DELIVERY_IDS, SENT_MESSAGES_JSON
+from models import Photo
+from services.broadcast import Broadcaster
+from services.outbox import Outbox
+from storage import get_storage, record_version
 import logging
 
 logger = logging.getLogger(__name__)
 
+MEDIA_GROUP_LIMIT = 10  # Больше фото в один альбом Telegram не принимает
+
+
+def delivery_offer_key(task_id: str) -> str:
+    """Ключ отслеживаемых предложений задачи доставки доставщикам"""
+    return f"delivery_offer_{task_id}"
+
 
 class NotificationService:
-    async def notify_admins(self, bot: Bot, message: str, reply_markup=None) -> None:
+    def __init__(self, broadcaster: Optional[Broadcaster] = None, outbox: Optional[Outbox] = None):
+        # Отправки идут параллельно в пределах лимитов Telegram
+        self.broadcaster = broadcaster or Broadcaster.get_instance()
+        # Уведомления обработчиков ставятся в очередь и доставляются фоновым циклом run_outbox
+        self.outbox = outbox or Outbox.get_instance()
+        # Отправленные сообщения, которые потом правятся на месте: ключ -> ID сообщений по чатам
+        self.sent = get_storage(SENT_MESSAGES_JSON)
+
+    async def broadcast(self, bot: Bot, chat_ids: List[Any], message: str, reply_markup=None) -> Dict[Any, Optional[Message]]:
+        """Отправка одного сообщения в несколько чатов сразу; результат — отправленные сообщения по чатам"""
+        return await self.broadcaster.broadcast(
+            chat_ids, lambda chat_id: bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup)
+        )
+
+    async def enqueue_message(self, chat_ids: List[Any], message: str, reply_markup=None,
+                              track: Optional[str] = None) -> str:
+        """Постановка сообщения в очередь уведомлений; возвращает ID записи очереди.
+
+        С track ID отправленных сообщений запоминаются под этим ключом, чтобы потом
+        закрыть их все на месте через close_tracked().
+        """
+        return await self.outbox.enqueue(
+            'message', chat_ids, text=message, reply_markup=reply_markup.to_dict() if reply_markup else None, track=track
+        )
+
+    async def close_tracked(self, track: str, text: str, skip: Optional[Dict[Any, int]] = None,
+                            texts: Optional[Dict[Any, str]] = None) -> None:
+        """Замена текста отслеживаемых сообщений с удалением их кнопок (правки идут через очередь).
+
+        Сообщения, которые ещё не отправлены, уже не отправятся, а отправляемые прямо сейчас
+        будут исправлены сразу после отправки. skip — сообщения (чат -> ID), которые правит сам
+        вызывающий; texts — свой текст для отдельных чатов вместо text.
+        """
+        record = await self._update_tracked(track, closed_text=text)
+        skip = {str(chat_id): message_id for chat_id, message_id in (skip or {}).items()}
+        messages = {
+            chat_id: message_id for chat_id, message_id in record['messages'].items() if skip.get(chat_id) != message_id
+        }
+        if messages:
+            texts = {str(chat_id): chat_text for chat_id, chat_text in (texts or {}).items() if str(chat_id) in messages}
+            await self.outbox.enqueue('edit', list(messages), messages=messages, text=text, texts=texts)
+
+    async def forget_tracked(self, tracks: List[str]) -> None:
+        """Удаление записей об отслеживаемых сообщениях, которые больше не будут правиться"""
+        for track in tracks:
+            await self.sent.delete(track)
+
+    async def _update_tracked(self, track: str, messages: Optional[Dict[str, int]] = None,
+                              closed_text: Optional[str] = None) -> Dict[str, Any]:
+        """Условное обновление записи об отслеживаемых сообщениях; возвращает её новое состояние"""
+        while True:
+            record = await self.sent.get(track) or {}
+            value = {
+                'messages': {**record.get('messages', {}), **(messages or {})},
+                'closed_text': closed_text if closed_text is not None else record.get('closed_text')
+            }
+            # Запись дополняют доставка (ID сообщений) и закрытие — в том числе из других процессов
+            if await self.sent.compare_and_set(track, record_version(record), value):
+                return value
+
+    async def notify_admins(self, bot: Bot, message: str, reply_markup=None) -> str:
         """Отправка уведомления всем администраторам"""
-        for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_message(chat_id=admin_id, text=message, reply_markup=reply_markup)
-            except Exception as e:
-                logger.error(f"Ошибка при отправке уведомления администратору {admin_id}: {e}")
+        return await self.enqueue_message(ADMIN_IDS, message, reply_markup)
 
-    async def notify_delivery(self, bot: Bot, message: str, reply_markup=None) -> None:
+    async def notify_delivery(self, bot: Bot, message: str, reply_markup=None) -> str:
         """Отправка уведомления всем доставщикам"""
-        for delivery_id in DELIVERY_IDS:
-            try:
-                await bot.send_message(chat_id=delivery_id, text=message, reply_markup=reply_markup)
-            except Exception as e:
-                logger.error(f"Ошибка при отправке уведомления доставщику {delivery_id}: {e}")
+        return await self.enqueue_message(DELIVERY_IDS, message, reply_markup)
 
-    async def notify_user(self, bot: Bot, user_id: str, message: str, reply_markup=None) -> None:
+    async def notify_user(self, bot: Bot, user_id: str, message: str, reply_markup=None) -> str:
         """Отправка уведомления конкретному пользователю"""
-        try:
-            await bot.send_message(chat_id=user_id, text=message, reply_markup=reply_markup)
-        except Exception as e:
-            logger.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}")
+        return await self.enqueue_message([user_id], message, reply_markup)
+
+    async def notify_admins_photos(self, bot: Bot, photos: List[Photo], caption: Optional[str] = None) -> str:
+        """Отправка фото всем администраторам альбомами"""
+        return await self.outbox.enqueue(
+            'photos', ADMIN_IDS, photos=[photo.to_dict() for photo in photos], caption=caption
+        )
+
+    async def run_outbox(self, bot: Bot) -> None:
+        """Фоновая доставка очереди уведомлений (запускается при старте бота)"""
+        await self.outbox.run(lambda entry: self.deliver(bot, entry))
+
+    async def deliver(self, bot: Bot, entry: Dict[str, Any]) -> List[Any]:
+        """Доставка записи очереди; возвращает чаты, отправку в которые стоит повторить.
+
+        Чаты, которые Telegram отклонил окончательно (Forbidden, BadRequest), не возвращаются:
+        повтор им не поможет.
+        """
+        if entry['kind'] == 'edit':
+            results = await self.broadcaster.broadcast(
+                entry['chat_ids'],
+                lambda chat_id: bot.edit_message_text(
+                    entry.get('texts', {}).get(str(chat_id), entry['text']),
+                    chat_id=chat_id, message_id=entry['messages'][str(chat_id)]
+                )
+            )
+            failed = [chat_id for chat_id, message in results.items() if message is None]
+        elif entry['kind'] == 'photos':
+            photos = [Photo.from_dict(photo) for photo in entry['photos']]
+            photos, failed = await self.send_photos(bot, entry['chat_ids'], photos, entry.get('caption'))
+            # Повтор пойдёт с file_id, полученными при загрузке с диска
+            entry['photos'] = [photo.to_dict() for photo in photos]
+        else:
+            track = entry.get('track')
+            if track and (await self.sent.get(track) or {}).get('closed_text') is not None:
+                # Сообщение закрыто до отправки (например, задачу уже приняли) — отправлять нечего
+                return []
+            reply_markup = InlineKeyboardMarkup.de_json(entry['reply_markup'], bot) if entry.get('reply_markup') else None
+            results = await self.broadcast(bot, entry['chat_ids'], entry['text'], reply_markup)
+            failed = [chat_id for chat_id, message in results.items() if message is None]
+            sent = {str(chat_id): message.message_id for chat_id, message in results.items() if message is not None}
+            if track and sent:
+                record = await self._update_tracked(track, messages=sent)
+                if record['closed_text'] is not None:
+                    # Закрыто, пока сообщения отправлялись: правим только что отправленные
+                    await self.broadcaster.broadcast(
+                        list(sent), lambda chat_id: bot.edit_message_text(
+                            record['closed_text'], chat_id=chat_id, message_id=sent[chat_id])
+                    )
+        entry['error'] = '; '.join(f"{chat_id}: {self.broadcaster.errors.get(chat_id)}" for chat_id in failed) or None
+        rejected = [chat_id for chat_id in failed if chat_id in self.broadcaster.rejected]
+        if rejected:
+            # Бот заблокирован или чата нет: эти чаты не повторяются и не держат запись в очереди
+            logger.warning(f"Уведомление не будет доставлено в чаты {rejected}: {entry['error']}")
+        return [chat_id for chat_id in failed if chat_id not in self.broadcaster.rejected]
+
+    async def send_photos(self, bot: Bot, chat_ids: List[Any], photos: List[Photo],
+                          caption: Optional[str] = None) -> Tuple[List[Photo], List[Any]]:
+        """Отправка фото в несколько чатов: по альбому на чат, фото передаются по file_id.
+
+        С диска фото загружаются, только если file_id нет или Telegram его не принял, и только
+        в один чат: остальные получают file_id из ответа на эту загрузку. Возвращает фото
+        с действующими file_id и чаты, в которые отправить не удалось.
+        """
+        result = []
+        failed: Dict[Any, None] = {}
+        for start in range(0, len(photos), MEDIA_GROUP_LIMIT):
+            group_caption = caption if start == 0 else None
+            state = {'group': list(photos[start:start + MEDIA_GROUP_LIMIT])}
+            upload_lock = asyncio.Lock()
+
+            async def send(chat_id: Any, state=state, upload_lock=upload_lock, group_caption=group_caption):
+                current = state['group']
+                if all(photo.file_id for photo in current):
+                    try:
+                        return await self._send_group(bot, chat_id, current, group_caption)
+                    except BadRequest as e:
+                        if 'file' not in str(e).lower():
+                            raise
+                        logger.warning(f"file_id фото не принят Telegram, загружаем с диска: {e}")
+                async with upload_lock:
+                    if state['group'] is current:
+                        messages = await self._send_group(bot, chat_id, current, group_caption, from_disk=True)
+                        state['group'] = [
+                            replace(photo, file_id=message.photo[-1].file_id) for photo, message in zip(current, messages)
+                        ]
+                        return messages
+                return await self._send_group(bot, chat_id, state['group'], group_caption)
+
+            # Альбом идёт в лимит чата как столько сообщений, сколько в нём фото; дороже ёмкости
+            # ведра он не бывает — такой запрос ждёт полного ведра (TokenBucket.acquire)
+            results = await self.broadcaster.broadcast(chat_ids, send, cost=len(state['group']))
+            failed.update((chat_id, None) for chat_id, messages in results.items() if messages is None)
+            result.extend(state['group'])
+        return result, list(failed)
+
+    async def _send_group(self, bot: Bot, chat_id: Any, photos: List[Photo], caption: Optional[str] = None,
+                          from_disk: bool = False) -> List[Message]:
+        """Один альбом (одно фото — обычным сообщением) в чат; возвращает отправленные сообщения"""
+        with ExitStack() as stack:
+            if from_disk:
+                media = [stack.enter_context(open(photo.path, 'rb')) for photo in photos]
+            else:
+                media = [photo.file_id for photo in photos]
+            if len(media) == 1:
+                return [await bot.send_photo(chat_id=chat_id, photo=media[0], caption=caption)]
+            album = [InputMediaPhoto(item, caption=caption if i == 0 else None) for i, item in enumerate(media)]
+            return list(await bot.send_media_group(chat_id=chat_id, media=album))
 
     async def notify_about_new_request(self, bot: Bot, request_id: str, request_data: Dict[str, Any]) -> None:
         """Уведомление администраторов о новой заявке"""
@@ -57,4 +228,10 @@ class NotificationService:
         message += f"Статус: {task_data.get('status', 'Ожидает')}"
         keyboard = [[InlineKeyboardButton("Принять", callback_data=f"accept_delivery_{task_id}")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await self.notify_delivery(bot, message, reply_markup)
+        # Предложения запоминаются, чтобы после принятия задачи убрать кнопку у всех доставщиков
+        await self.enqueue_message(DELIVERY_IDS, message, reply_markup, track=delivery_offer_key(task_id))
+
+    async def close_delivery_offer(self, task_id: str, text: str, skip: Optional[Dict[Any, int]] = None,
+                                   texts: Optional[Dict[Any, str]] = None) -> None:
+        """Закрытие предложений задачи доставки у доставщиков (задача принята или отменена)"""
+        await self.close_tracked(delivery_offer_key(task_id), text, skip, texts)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Any, List, Callable, Awaitable
+
+from config import (
+    OUTBOX_JSON, OUTBOX_POLL_INTERVAL, OUTBOX_BATCH_SIZE, OUTBOX_LEASE, OUTBOX_DELIVERY_TIMEOUT, OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX, OUTBOX_MAX_ATTEMPTS
+)
+from storage import get_storage, record_version, SequenceAllocator
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = 'pending'
+OUTBOX_DEAD = 'dead'  # Попытки исчерпаны: запись остаётся в хранилище для разбора
+
+# Доставка записи: список чатов, в которые отправить не удалось (пустой — доставлено всем).
+# Доставка может обновить поля записи (например, file_id фото): при повторе они сохраняются
+Deliver = Callable[[Dict[str, Any]], Awaitable[List[Any]]]
+
+
+class Outbox:
+    """Очередь исходящих уведомлений в хранилище.
+
+    Обработчик только записывает уведомление и сразу продолжает работу; фоновый цикл run()
+    доставляет его, при неудаче повторяет с экспоненциальной паузой только для чатов, в которые
+    отправить не удалось, а после OUTBOX_MAX_ATTEMPTS попыток помечает запись мёртвой.
+    Записи переживают перезапуск. Перед доставкой запись захватывается условной записью
+    с арендой на OUTBOX_LEASE секунд, поэтому из нескольких процессов её отправит один.
+    Доставка, не уложившаяся в OUTBOX_DELIVERY_TIMEOUT, прерывается и повторяется позже,
+    чтобы одно зависшее уведомление не задерживало остальные.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> 'Outbox':
+        """Общая очередь процесса"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, file_path: str = OUTBOX_JSON):
+        self.storage = get_storage(file_path)
+        self.storage.ensure_index('status')
+        self.ids = SequenceAllocator.get_instance('outbox', self.storage)
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, kind: str, chat_ids: List[Any], **payload) -> str:
+        """Постановка уведомления в очередь; возвращает ID записи"""
+        now = time.time()
+        key = await self.ids.next_id()
+        entry = {
+            'kind': kind,
+            'chat_ids': list(chat_ids),
+            'status': OUTBOX_PENDING,
+            'attempts': 0,
+            'next_at': now,
+            'created_at': now,
+            'error': None,
+            **payload
+        }
+        await self.storage.set(key, entry)
+        self._wakeup.set()
+        return key
+
+    async def due(self) -> Dict[str, Dict[str, Any]]:
+        """Записи, которые пора доставить, в порядке постановки"""
+        now = time.time()
+        pending = await self.storage.find('status', OUTBOX_PENDING)
+        # Числовые ID по возрастанию — порядок постановки
+        keys = sorted((key for key, entry in pending.items() if entry['next_at'] <= now), key=lambda key: (len(key), key))
+        return {key: pending[key] for key in keys[:OUTBOX_BATCH_SIZE]}
+
+    async def dead(self) -> Dict[str, Dict[str, Any]]:
+        """Записи, доставка которых прекращена"""
+        return await self.storage.find('status', OUTBOX_DEAD)
+
+    async def run(self, deliver: Deliver) -> None:
+        """Фоновый цикл доставки; ждёт новых записей или истечения паузы"""
+        while True:
+            try:
+                batch = await self.due()
+                await asyncio.gather(*(self._process(key, entry, deliver) for key, entry in batch.items()))
+            except Exception as e:
+                logger.error(f"Ошибка в очереди уведомлений: {e}")
+                batch = {}
+            if len(batch) < OUTBOX_BATCH_SIZE:
+                self._wakeup.clear()
+                try:
+                    # Другие процессы будят только по таймеру
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _process(self, key: str, entry: Dict[str, Any], deliver: Deliver) -> None:
+        """Захват записи, доставка и фиксация результата"""
+        claimed = {**entry, 'next_at': time.time() + OUTBOX_LEASE}
+        if not await self.storage.compare_and_set(key, record_version(entry), claimed):
+            return  # Запись захватил другой процесс
+        try:
+            failed = await asyncio.wait_for(deliver(claimed), OUTBOX_DELIVERY_TIMEOUT)
+            error = claimed.get('error') or f"Не доставлено в чаты {failed}"
+        except asyncio.TimeoutError:
+            # Какие чаты успели получить уведомление, неизвестно: повтор идёт во все
+            failed, error = claimed['chat_ids'], f"Доставка не уложилась в {OUTBOX_DELIVERY_TIMEOUT} с"
+        except Exception as e:
+            failed, error = claimed['chat_ids'], str(e)
+        if not failed:
+            await self.storage.delete(key)
+            return
+        attempts = claimed['attempts'] + 1
+        retry = {**claimed, 'chat_ids': failed, 'attempts': attempts, 'error': error}
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            retry['status'] = OUTBOX_DEAD
+            logger.error(f"Уведомление {key} не доставлено после {attempts} попыток: {error}")
+        else:
+            retry['next_at'] = time.time() + min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+            logger.warning(f"Уведомление {key} будет повторено (попытка {attempts}): {error}")
+        await self.storage.set(key, retry)
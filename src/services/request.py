@@ -1,41 +1,96 @@
-from typing import List, Optional, Dict, Any
+import heapq
+from dataclasses import replace
+from datetime import datetime
+from typing import List, Optional, Mapping, Any, Tuple
 
-from models import Request, Location
-from storage import JsonStorage
+from models import Request, Location, OrderStatus, Photo
+from storage import (
+    get_storage, IdentityMap, TextIndex, OrderedIndex, SequenceAllocator, Transaction, ArchiveStorage, archive_records
+)
 from services.notification_service import NotificationService
-from config import REQUESTS_JSON, ORDER_STATUS_NEW, ORDER_STATUS_ASSIGNED_TO_SC
+from config import REQUESTS_JSON, ORDER_STATUS_NEW
 
 
 class RequestService:
     def __init__(self):
-        self.storage = JsonStorage.get_instance(REQUESTS_JSON)
+        self.storage = get_storage(REQUESTS_JSON)
+        # Завершённые заявки уходят в архив, в горячем файле остаются только активные
+        self.archive = ArchiveStorage.get_instance('requests')
+        self.archive.ensure_index('user_id')
+        # ID новых заявок продолжают и архивные, а не только активные
+        self.ids = SequenceAllocator.get_instance('requests', self.storage, archive=self.archive)
+        self.storage.ensure_index('user_id')
+        self.storage.ensure_index('status')
+        self.storage.ensure_index('assigned_sc')
+        self.requests = IdentityMap.get_instance(
+            self.storage, lambda req_id, req_data: Request.from_dict(req_data, req_id)
+        )
+        # Полнотекстовый поиск по описанию, имени клиента и адресу, введённому вручную
+        self.search_index = TextIndex.get_instance(self.storage, _search_fields)
+        # Заявки по времени создания для листания без чтения и сортировки всех записей
+        self.created_index = OrderedIndex.get_instance(self.storage, _created_order)
         self.notification_service = NotificationService()
 
     async def get_request(self, request_id: str) -> Optional[Request]:
-        """Получение заявки по ID"""
-        data = await self.storage.get(request_id)
-        if data:
-            return Request.from_dict({**data, 'id': request_id})
-        return None
+        """Получение заявки по ID (активной или из архива)"""
+        request = await self.requests.get(request_id)
+        if request is None:
+            data = await self.archive.get(request_id)
+            request = Request.from_dict(data, request_id) if data else None
+        return request
+
+    async def get_all_requests(self) -> Mapping[str, Request]:
+        """Получение всех заявок (неизменяемое отображение разделяемых объектов)"""
+        return await self.requests.all()
+
+    async def browse_requests(
+            self, status: Optional[str] = None, sc_id: Optional[str] = None, since: Optional[str] = None,
+            offset: int = 0, limit: int = 10
+    ) -> Tuple[List[Request], int]:
+        """Страница активных заявок по фильтрам (новые первыми) и общее число подходящих.
+
+        Без фильтров по статусу и СЦ страница — срез упорядоченного индекса по времени создания.
+        С ними кандидаты берутся из индексов по статусу и СЦ, а из них выбираются только заявки
+        до конца страницы; объекты Request создаются только для заявок страницы.
+        """
+        if status is None and sc_id is None:
+            keys, total = await self.created_index.descending(offset, limit, (since,) if since else None)
+            requests = [await self.requests.get(key) for key in keys]
+            return [request for request in requests if request is not None], total
+        if status is not None and sc_id is not None:
+            by_status = await self.storage.find('status', status)
+            by_sc = await self.storage.find('assigned_sc', sc_id)
+            records = {key: value for key, value in by_status.items() if key in by_sc}
+        elif status is not None:
+            records = await self.storage.find('status', status)
+        else:
+            records = await self.storage.find('assigned_sc', sc_id)
+        if since:
+            records = {key: value for key, value in records.items() if (value.get('created_at') or '') >= since}
+        page = heapq.nlargest(offset + limit, records.items(), key=lambda item: _created_order(*item))[offset:]
+        return self.requests.resolve(dict(page)), len(records)
 
-    async def get_all_requests(self) -> Dict[str, Request]:
-        """Получение всех заявок"""
-        data = await self.storage.load()
-        return {req_id: Request.from_dict({**req_data, 'id': req_id}) 
-                for req_id, req_data in data.items()}
+    async def search_requests(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Request], int]:
+        """Активные заявки, подходящие под поисковый запрос, самые релевантные первыми; и их число"""
+        keys, total = await self.search_index.search(query, offset, limit)
+        requests = [await self.requests.get(key) for key in keys]
+        return [request for request in requests if request is not None], total
 
     async def get_user_requests(self, user_id: str) -> List[Request]:
-        """Получение заявок пользователя"""
-        requests = await self.get_all_requests()
-        return [req for req in requests.values() if req.user_id == user_id]
+        """Получение заявок пользователя: сначала архивные, затем активные"""
+        active = await self.storage.find('user_id', user_id)
+        archived = [
+            Request.from_dict(data, key) for key, data in (await self.archive.find('user_id', user_id)).items()
+            if key not in active
+        ]
+        return archived + self.requests.resolve(active)
 
     async def create_request(
-            self, user_id: str, description: str, photos: List[str],
+            self, user_id: str, description: str, photos: List[Photo],
             location: Any, user_name: str
     ) -> Request:
         """Создание новой заявки"""
-        data = await self.storage.load()
-        request_id = str(len(data) + 1)
+        request_id = await self.ids.next_id()
         # Обработка местоположения
         if isinstance(location, dict) and 'latitude' in location and 'longitude' in location:
             location_obj = Location(
@@ -54,35 +109,49 @@ class RequestService:
             location=location_obj,
             location_link=location_link,
             user_name=user_name,
-            status=ORDER_STATUS_NEW
+            status=ORDER_STATUS_NEW,
+            created_at=datetime.now().isoformat(timespec='seconds')
         )
         await self.storage.set(request_id, request.to_dict())
         return request
 
-    async def update_request_status(self, request_id: str, status: str) -> Optional[Request]:
-        """Обновление статуса заявки"""
+    async def update_request(self, request_id: str, tx: Optional[Transaction] = None, **fields) -> Optional[Request]:
+        """Обновление полей заявки; с транзакцией запись фиксируется вместе с ней"""
         request = await self.get_request(request_id)
         if request:
-            request.status = status
-            await self.storage.set(request_id, request.to_dict())
+            request = replace(request, **fields)
+            if tx:
+                tx.set(self.storage, request_id, request.to_dict())
+            else:
+                await self.storage.set(request_id, request.to_dict())
             return request
         return None
 
+    async def update_request_status(
+            self, request_id: str, status: str, tx: Optional[Transaction] = None
+    ) -> Optional[Request]:
+        """Обновление статуса заявки"""
+        return await self.update_request(request_id, tx, status=OrderStatus.parse(status))
+
+    async def archive_completed(self) -> int:
+        """Перенос завершённых заявок в архив"""
+        return await archive_records(self.storage, self.archive, 'status', OrderStatus.COMPLETED)
+
     async def assign_to_service_center(self, request_id: str, sc_id: str, sc_name: str) -> Optional[Request]:
         """Привязка заявки к сервисному центру"""
-        request = await self.get_request(request_id)
-        if request:
-            request.assigned_sc = sc_id
-            request.status = ORDER_STATUS_ASSIGNED_TO_SC
-            await self.storage.set(request_id, request.to_dict())
-            return request
-        return None
+        return await self.update_request(request_id, assigned_sc=sc_id, status=OrderStatus.ASSIGNED_TO_SC)
 
     async def assign_to_delivery(self, request_id: str, delivery_id: str) -> Optional[Request]:
         """Привязка заявки к доставщику"""
-        request = await self.get_request(request_id)
-        if request:
-            request.assigned_delivery = delivery_id
-            await self.storage.set(request_id, request.to_dict())
-            return request
-        return None
+        return await self.update_request(request_id, assigned_delivery=delivery_id)
+
+
+def _created_order(key: str, data: dict) -> tuple:
+    """Порядок заявок по времени создания; заявки без него — раньше всех, среди равных — по ID"""
+    return data.get('created_at') or '', len(key), key
+
+
+def _search_fields(data: dict) -> List[Optional[str]]:
+    """Тексты заявки для поиска; адрес — только введённый вручную (строкой, а не координатами)"""
+    location = data.get('location')
+    return [data.get('description'), data.get('user_name'), location if isinstance(location, str) else None]
@@ -1,40 +1,53 @@
-from typing import Dict, List, Optional
-from models import ServiceCenter
-from storage import JsonStorage
+from dataclasses import replace
+from typing import Mapping, List, Optional, Tuple
+from models import ServiceCenter, Location
+from storage import get_storage, IdentityMap, SequenceAllocator, GeoIndex
 from config import SERVICE_CENTERS_JSON
 
 
 class ServiceCenterService:
     def __init__(self):
-        self.storage = JsonStorage.get_instance(SERVICE_CENTERS_JSON)
+        self.storage = get_storage(SERVICE_CENTERS_JSON)
+        self.ids = SequenceAllocator.get_instance('service_centers', self.storage)
+        self.service_centers = IdentityMap.get_instance(
+            self.storage, lambda sc_id, sc_data: ServiceCenter.from_dict(sc_data, sc_id)
+        )
+        # СЦ с координатами в пространственном индексе для подбора ближайших к клиенту
+        self.geo_index = GeoIndex.get_instance(self.storage, _sc_point)
 
     async def get_service_center(self, sc_id: str) -> Optional[ServiceCenter]:
         """Получение сервисного центра по ID"""
-        data = await self.storage.get(sc_id)
-        if data:
-            return ServiceCenter.from_dict({'id': sc_id, **data})
-        return None
+        return await self.service_centers.get(sc_id)
+
+    async def get_all_service_centers(self) -> Mapping[str, ServiceCenter]:
+        """Получение всех сервисных центров (неизменяемое отображение разделяемых объектов)"""
+        return await self.service_centers.all()
 
-    async def get_all_service_centers(self) -> Dict[str, ServiceCenter]:
-        """Получение всех сервисных центров"""
-        data = await self.storage.load()
-        return {sc_id: ServiceCenter.from_dict({'id': sc_id, **sc_data})
-                for sc_id, sc_data in data.items()}
+    async def get_nearest_service_centers(self, location: Location, limit: int) -> List[Tuple[ServiceCenter, float]]:
+        """Не больше limit ближайших к точке СЦ с расстоянием в километрах; СЦ без координат не учитываются"""
+        nearest = await self.geo_index.nearest((location.latitude, location.longitude), limit)
+        result = []
+        for sc_id, distance in nearest:
+            sc = await self.service_centers.get(sc_id)
+            if sc:
+                result.append((sc, distance))
+        return result
 
     async def create_service_center(
             self, name: str, address: str,
             phone: Optional[str] = None,
-            description: Optional[str] = None
+            description: Optional[str] = None,
+            location: Optional[Location] = None
     ) -> ServiceCenter:
         """Создание нового сервисного центра"""
-        data = await self.storage.load()
-        sc_id = str(len(data) + 1)
+        sc_id = await self.ids.next_id()
         sc = ServiceCenter(
             id=sc_id,
             name=name,
             address=address,
             phone=phone,
-            description=description
+            description=description,
+            location=location
         )
         await self.storage.set(sc_id, sc.to_dict())
         return sc
@@ -43,23 +56,34 @@ class ServiceCenterService:
             self, sc_id: str, name: Optional[str] = None,
             address: Optional[str] = None,
             phone: Optional[str] = None,
-            description: Optional[str] = None
+            description: Optional[str] = None,
+            location: Optional[Location] = None
     ) -> Optional[ServiceCenter]:
         """Обновление сервисного центра"""
         sc = await self.get_service_center(sc_id)
         if not sc:
             return None
         if name:
-            sc.name = name
+            sc = replace(sc, name=name)
         if address:
-            sc.address = address
+            sc = replace(sc, address=address)
         if phone:
-            sc.phone = phone
+            sc = replace(sc, phone=phone)
         if description:
-            sc.description = description
+            sc = replace(sc, description=description)
+        if location:
+            sc = replace(sc, location=location)
         await self.storage.set(sc_id, sc.to_dict())
         return sc
 
     async def delete_service_center(self, sc_id: str) -> None:
         """Удаление сервисного центра"""
         await self.storage.delete(sc_id)
+
+
+def _sc_point(data: dict) -> Optional[Tuple[float, float]]:
+    """Координаты СЦ для пространственного индекса"""
+    location = data.get('location')
+    if not location:
+        return None
+    return float(location['latitude']), float(location['longitude'])
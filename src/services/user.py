@@ -1,25 +1,25 @@
-from typing import List, Optional, Dict
-from models import User
-from storage import JsonStorage
+from dataclasses import replace
+from typing import List, Optional, Mapping
+from models import User, UserRole
+from storage import get_storage, IdentityMap
 from config import USERS_JSON, ADMIN_IDS, DELIVERY_IDS
 
 
 class UserService:
     def __init__(self):
-        self.storage = JsonStorage.get_instance(USERS_JSON)
+        self.storage = get_storage(USERS_JSON)
+        self.storage.ensure_index('role')
+        self.users = IdentityMap.get_instance(
+            self.storage, lambda user_id, user_data: User.from_dict(user_data, user_id)
+        )
 
     async def get_user(self, user_id: str) -> Optional[User]:
         """Получение пользователя по ID"""
-        data = await self.storage.get(user_id)
-        if data:
-            return User.from_dict({'id': user_id, **data})
-        return None
+        return await self.users.get(user_id)
 
-    async def get_all_users(self) -> Dict[str, User]:
-        """Получение всех пользователей"""
-        data = await self.storage.load()
-        return {user_id: User.from_dict({'id': user_id, **user_data})
-                for user_id, user_data in data.items()}
+    async def get_all_users(self) -> Mapping[str, User]:
+        """Получение всех пользователей (неизменяемое отображение разделяемых объектов)"""
+        return await self.users.all()
 
     async def create_or_update_user(
             self, user_id: str, name: Optional[str] = None,
@@ -31,21 +31,21 @@ class UserService:
         if not user:
             # Определяем роль нового пользователя
             if int(user_id) in ADMIN_IDS:
-                assigned_role = "admin"
+                assigned_role = UserRole.ADMIN
             elif int(user_id) in DELIVERY_IDS:
-                assigned_role = "delivery"
+                assigned_role = UserRole.DELIVERY
             else:
-                assigned_role = "client"
+                assigned_role = UserRole.CLIENT
 
             user = User(id=user_id, role=assigned_role)
 
         # Обновляем поля, если они предоставлены
         if name:
-            user.name = name
+            user = replace(user, name=name)
         if phone:
-            user.phone = phone
+            user = replace(user, phone=phone)
         if role:
-            user.role = role
+            user = replace(user, role=UserRole.parse(role))
         await self.storage.set(user.id, user.to_dict())
         return user
 
@@ -55,13 +55,12 @@ class UserService:
 
     async def get_users_by_role(self, role: str) -> List[User]:
         """Получение пользователей по роли"""
-        users = await self.get_all_users()
-        return [user for user in users.values() if user.role == role]
+        return self.users.resolve(await self.storage.find('role', role))
 
     async def get_admins(self) -> List[User]:
         """Получение всех администраторов"""
-        return await self.get_users_by_role("admin")
+        return await self.get_users_by_role(UserRole.ADMIN)
 
     async def get_delivery_users(self) -> List[User]:
         """Получение всех доставщиков"""
-        return await self.get_users_by_role("delivery")
+        return await self.get_users_by_role(UserRole.DELIVERY)
@@ -0,0 +1,18 @@
+from storage.json_storage import JsonStorage, StorageError, ConflictError, VERSION_FIELD, record_version
+from storage.sqlite_storage import SqliteStorage, migrate_json_to_sqlite
+from storage.sharding import ShardedStorage, reshard
+from storage.factory import get_storage, flush_all
+from storage.identity_map import IdentityMap
+from storage.text_index import TextIndex
+from storage.geo_index import GeoIndex
+from storage.ordered_index import OrderedIndex
+from storage.locks import FileLock
+from storage.sequence import SequenceAllocator
+from storage.transaction import Transaction, recover_transactions
+from storage.archive import ArchiveStorage, archive_records
+from storage.wal import WriteAheadLog
+
+__all__ = [
+    'JsonStorage', 'StorageError', 'ConflictError', 'VERSION_FIELD', 'record_version', 'SqliteStorage', 'ShardedStorage', 'reshard', 'WriteAheadLog', 'IdentityMap', 'TextIndex', 'GeoIndex', 'OrderedIndex', 'SequenceAllocator', 'FileLock',
+    'Transaction', 'ArchiveStorage', 'archive_records', 'get_storage', 'flush_all', 'recover_transactions', 'migrate_json_to_sqlite',
+]
@@ -0,0 +1,178 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+from config import ARCHIVE_DIR, ARCHIVE_SEGMENT_CACHE, STORAGE_CODEC, STORAGE_MULTIPROCESS
+from storage.codecs import get_codec
+from storage.files import atomic_write
+from storage.json_storage import ConflictError, record_version
+from storage.locks import FileLock
+from storage.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+
+class ArchiveStorage:
+    """Холодный архив записей в конечном статусе: неизменяемые сжатые сегменты по месяцам.
+
+    Сегмент — gzip со строками {"k": ключ, "v": запись}, рядом с ним индекс .idx.json со списком
+    ключей и ключами по значениям индексируемых полей. Индексы читаются при первом обращении,
+    а сегмент распаковывается, только если в нём есть нужная запись.
+    """
+
+    _instances = {}  # Архивы по имени
+
+    @classmethod
+    def get_instance(cls, name: str, archive_dir: str = ARCHIVE_DIR) -> 'ArchiveStorage':
+        """Получение единственного архива для каждого имени"""
+        if name not in cls._instances:
+            cls._instances[name] = cls(name, archive_dir)
+        return cls._instances[name]
+
+    def __init__(self, name: str, archive_dir: str = ARCHIVE_DIR):
+        self.path = os.path.join(archive_dir, name)
+        self.codec = get_codec(STORAGE_CODEC)
+        self.lock = FileLock(self.path, STORAGE_MULTIPROCESS)
+        self.fields: List[str] = []  # Поля, по которым строятся индексы новых сегментов
+        self._indexes: Dict[str, Dict[str, Any]] = {}  # Имя сегмента -> его индекс
+        self._key_segments: Dict[str, str] = {}  # Ключ -> самый новый сегмент с записью
+        self._dir_signature = None  # mtime каталога: новые сегменты меняют его
+        self._decoded: 'OrderedDict[str, Dict[str, Dict[str, Any]]]' = OrderedDict()  # LRU распакованных
+        os.makedirs(self.path, exist_ok=True)
+
+    def ensure_index(self, field: str) -> None:
+        """Регистрация поля, по которому индексируются новые сегменты"""
+        if field not in self.fields:
+            self.fields.append(field)
+
+    async def append(self, records: Dict[str, Dict[str, Any]]) -> str:
+        """Запись новой пачки записей отдельным сегментом текущего месяца"""
+        async with self.lock:
+            return await asyncio.to_thread(self._write_segment, records)
+
+    def _write_segment(self, records: Dict[str, Dict[str, Any]]) -> str:
+        bucket = time.strftime('%Y-%m')
+        number = sum(1 for name in os.listdir(self.path) if name.startswith(bucket) and name.endswith(INDEX_SUFFIX))
+        name = f"{bucket}.{number + 1:04d}"
+        dumps = self.codec.dumps
+        content = b''.join(dumps({'k': key, 'v': value}) + b'\n' for key, value in records.items())
+        atomic_write(os.path.join(self.path, name + SEGMENT_SUFFIX), gzip.compress(content))
+        fields: Dict[str, Dict[str, List[str]]] = {field: {} for field in self.fields}
+        for key, value in records.items():
+            for field in self.fields:
+                if value.get(field) is not None:
+                    fields[field].setdefault(str(value[field]), []).append(key)
+        index = {'keys': list(records), 'fields': fields}
+        # Индекс пишется последним: сегмент без индекса читатели не видят
+        atomic_write(os.path.join(self.path, name + INDEX_SUFFIX), json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        return name
+
+    async def _refresh_indexes(self) -> None:
+        """Подгрузка индексов сегментов, появившихся после прошлого обращения"""
+        try:
+            signature = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if signature == self._dir_signature:
+            return
+        self._dir_signature = signature
+        names = sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.path) if name.endswith(INDEX_SUFFIX))
+        new = [name for name in names if name not in self._indexes]
+        if not new:
+            return
+        indexes = await asyncio.to_thread(self._read_indexes, new)
+        for name in new:
+            self._indexes[name] = indexes[name]
+            for key in indexes[name]['keys']:
+                self._key_segments[key] = name
+        # Сегменты в порядке имён — от старых к новым
+        self._indexes = dict(sorted(self._indexes.items()))
+
+    def _read_indexes(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        indexes = {}
+        for name in names:
+            with open(os.path.join(self.path, name + INDEX_SUFFIX), 'rb') as file:
+                indexes[name] = json.loads(file.read())
+        return indexes
+
+    async def _segment(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """Записи сегмента; несколько последних распакованных сегментов держатся в памяти"""
+        if name in self._decoded:
+            self._decoded.move_to_end(name)
+            return self._decoded[name]
+        records = await asyncio.to_thread(self._read_segment, name)
+        self._decoded[name] = records
+        while len(self._decoded) > ARCHIVE_SEGMENT_CACHE:
+            self._decoded.popitem(last=False)
+        return records
+
+    def _read_segment(self, name: str) -> Dict[str, Dict[str, Any]]:
+        with open(os.path.join(self.path, name + SEGMENT_SUFFIX), 'rb') as file:
+            content = gzip.decompress(file.read())
+        records = {}
+        for line in content.splitlines():
+            record = self.codec.loads(line)
+            records[record['k']] = record['v']
+        return records
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Архивная запись по ключу"""
+        await self._refresh_indexes()
+        name = self._key_segments.get(key)
+        if name is None:
+            return None
+        return (await self._segment(name)).get(key)
+
+    async def keys(self) -> List[str]:
+        """Ключи всех архивных записей (по индексам, без распаковки сегментов)"""
+        await self._refresh_indexes()
+        return list(self._key_segments)
+
+    async def find(self, field: str, value: Any) -> Dict[str, Dict[str, Any]]:
+        """Архивные записи с заданным значением поля (от старых к новым)"""
+        await self._refresh_indexes()
+        result = {}
+        for name, index in self._indexes.items():
+            if field in index['fields']:
+                keys: List[str] = index['fields'][field].get(str(value), [])
+                if not keys:
+                    continue
+                records = await self._segment(name)
+            else:
+                # Сегмент записан до появления индекса по полю — просматривается целиком
+                records = await self._segment(name)
+                keys = [key for key, record in records.items() if record.get(field) == value]
+            for key in keys:
+                if self._key_segments.get(key) == name:
+                    result[key] = records[key]
+        return result
+
+
+async def archive_records(storage, archive: ArchiveStorage, field: str, value: Any) -> int:
+    """Перенос записей с конечным значением поля из горячего хранилища в архив.
+
+    Сначала пишется сегмент, затем записи удаляются из хранилища, если они не изменились после
+    выборки. Сбой между шагами оставит копии в обоих местах: чтение идёт сначала из хранилища,
+    а следующий перенос запишет новый сегмент, который перекроет старый.
+    """
+    records = await storage.find(field, value)
+    if not records:
+        return 0
+    await archive.append(records)
+    try:
+        async with Transaction() as tx:
+            for key, record in records.items():
+                tx.delete(storage, key, expected_version=record_version(record))
+    except ConflictError:
+        logger.warning(f"Записи {storage.file_path} изменились во время переноса в архив, перенос повторится позже")
+        return 0
+    logger.info(f"В архив {archive.path} перенесено записей: {len(records)}")
+    return len(records)
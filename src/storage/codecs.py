@@ -0,0 +1,55 @@
+import json
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class JsonCodec:
+    """Кодек на стандартном модуле json: без зависимостей, используется по умолчанию"""
+
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def loads(self, content: bytes) -> Any:
+        return json.loads(content)
+
+    def dumps(self, value: Any) -> bytes:
+        return self._encoder.encode(value).encode('utf-8')
+
+
+class OrjsonCodec:
+    """Кодек на orjson: разбор и сериализация в C за один проход, сразу в bytes"""
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, content: bytes) -> Any:
+        return self._orjson.loads(content)
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+
+_CODECS = {codec.name: codec for codec in (JsonCodec, OrjsonCodec)}
+_instances: Dict[str, Any] = {}
+
+
+def get_codec(name: str):
+    """Кодек по имени из config.STORAGE_CODEC; при отсутствии библиотеки — стандартный json"""
+    if name not in _instances:
+        codec_cls = _CODECS.get(name)
+        if codec_cls is None:
+            logger.warning(f"Неизвестный кодек хранилища {name}, используется json")
+            codec_cls = JsonCodec
+        try:
+            _instances[name] = codec_cls()
+        except ImportError:
+            logger.warning(f"Кодек {name} недоступен (pip install {name}), используется json")
+            _instances[name] = JsonCodec()
+    return _instances[name]
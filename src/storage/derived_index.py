@@ -0,0 +1,69 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Set
+
+
+class DerivedIndex(ABC):
+    """Основа индексов, которые строятся по записям хранилища и обновляются по подписке на него.
+
+    Изменённые записи только помечаются и переиндексируются перед следующим чтением индекса,
+    поэтому запись в хранилище ничего не ждёт; перезагрузка хранилища строит индекс заново.
+    Наследники реализуют _rebuild (всё по данным) и _update (одна запись).
+    """
+
+    _instances = {}  # Один индекс каждого вида на хранилище
+
+    @classmethod
+    def get_instance(cls, storage, *args):
+        """Получение единственного индекса этого вида для каждого хранилища"""
+        key = (cls, id(storage))
+        if key not in DerivedIndex._instances:
+            DerivedIndex._instances[key] = cls(storage, *args)
+        return DerivedIndex._instances[key]
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._built = False
+        self._dirty: Set[str] = set()
+        self._lock = asyncio.Lock()
+        storage.subscribe(self.invalidate)
+
+    def invalidate(self, key: Optional[str]) -> None:
+        """Пометка записи изменённой; None — хранилище перезагружено, индекс строится заново"""
+        if key is None:
+            self._built = False
+            self._dirty.clear()
+        elif self._built:
+            self._dirty.add(key)
+
+    @abstractmethod
+    async def _rebuild(self, data) -> None:
+        """Построение индекса заново по неизменяемой версии данных хранилища"""
+
+    @abstractmethod
+    def _update(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        """Переиндексация одной записи; None — запись удалена"""
+
+    def _synced(self) -> None:
+        """Вызывается, когда индекс приведён к хранилищу (для отложенных пересчётов)"""
+
+    async def warm_up(self) -> None:
+        """Построение индекса заранее, чтобы первое чтение не ждало"""
+        await self.sync()
+
+    async def sync(self) -> None:
+        """Приведение индекса к текущему состоянию хранилища"""
+        async with self._lock:
+            await self.storage.refresh()
+            while not self._built:
+                self._built = True
+                self._dirty.clear()
+                data = await self.storage.load()
+                if not self._built:
+                    continue  # Хранилище перезагрузилось, пока читали
+                # Записи, изменённые во время построения, уже помечены и доиндексируются ниже
+                await self._rebuild(data)
+            while self._dirty:
+                key = self._dirty.pop()
+                self._update(key, await self.storage.get(key))
+            self._synced()
@@ -0,0 +1,23 @@
+from typing import Union
+
+from config import STORAGE_BACKEND, STORAGE_SHARDS
+from storage.json_storage import JsonStorage
+from storage.sharding import ShardedStorage
+from storage.sqlite_storage import SqliteStorage
+
+Storage = Union[JsonStorage, ShardedStorage, SqliteStorage]
+
+
+def get_storage(file_path: str) -> Storage:
+    """Хранилище для файла данных с бэкендом, выбранным в config.STORAGE_BACKEND"""
+    if STORAGE_BACKEND == 'sqlite':
+        return SqliteStorage.get_instance(file_path)
+    if STORAGE_SHARDS > 1:
+        return ShardedStorage.get_instance(file_path)
+    return JsonStorage.get_instance(file_path)
+
+
+async def flush_all() -> None:
+    """Запись отложенных изменений и закрытие соединений всех бэкендов при остановке"""
+    await JsonStorage.flush_all()
+    await SqliteStorage.close_all()
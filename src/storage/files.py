@@ -0,0 +1,17 @@
+import os
+
+
+def atomic_write(path: str, content: bytes) -> None:
+    """Атомарная запись файла: временный файл, fsync и переименование поверх старого"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    # Фиксируем само переименование в каталоге
+    dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,103 @@
+import heapq
+import math
+from typing import Dict, Any, Optional, Callable, List, Tuple, Union
+
+from storage.derived_index import DerivedIndex
+
+EARTH_RADIUS_KM = 6371.0
+KD_LEAF_SIZE = 8  # Сколько точек лист дерева проверяет перебором
+
+Point = Tuple[float, float]  # Широта и долгота в градусах
+Vector = Tuple[float, float, float, str]  # Точка на единичной сфере и ключ записи
+Node = Union[List[Vector], Tuple[int, float, Any, Any]]  # Лист или (ось, граница, левое, правое поддерево)
+
+
+def _vector(point: Point) -> Tuple[float, float, float]:
+    """Точка на единичной сфере: длина хорды растёт вместе с расстоянием по поверхности"""
+    latitude, longitude = map(math.radians, point)
+    return math.cos(latitude) * math.cos(longitude), math.cos(latitude) * math.sin(longitude), math.sin(latitude)
+
+
+def _chord_to_km(squared_chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(squared_chord) / 2))
+
+
+def _build_tree(vectors: List[Vector]) -> Node:
+    """KD-дерево: делим по оси наибольшего разброса пополам, пока в части не останется KD_LEAF_SIZE точек"""
+    if len(vectors) <= KD_LEAF_SIZE:
+        return vectors
+    axis = max(range(3), key=lambda i: max(v[i] for v in vectors) - min(v[i] for v in vectors))
+    vectors = sorted(vectors, key=lambda v: v[axis])
+    middle = len(vectors) // 2
+    return axis, vectors[middle][axis], _build_tree(vectors[:middle]), _build_tree(vectors[middle:])
+
+
+class GeoIndex(DerivedIndex):
+    """Пространственный индекс записей хранилища: KD-дерево точек на единичной сфере.
+
+    Координаты записи берёт функция locate (None — у записи их нет). В трёхмерных координатах
+    нет разрывов у полюсов и на 180-м меридиане, а порядок по длине хорды совпадает с порядком
+    по расстоянию на поверхности. Дерево перестраивается целиком после изменений — записей
+    (сервисных центров) немного и меняются они редко, зато поиск обходит только соседние листья.
+    """
+
+    @classmethod
+    def get_instance(cls, storage, locate: Callable[[Dict[str, Any]], Optional[Point]]) -> 'GeoIndex':
+        """Получение единственного индекса для каждого хранилища"""
+        return super().get_instance(storage, locate)
+
+    def __init__(self, storage, locate: Callable[[Dict[str, Any]], Optional[Point]]):
+        super().__init__(storage)
+        self.locate = locate
+        self._points: Dict[str, Point] = {}
+        self._tree: Optional[Node] = None  # None — устарело, перестраивается перед поиском
+
+    async def _rebuild(self, data) -> None:
+        self._points = {}
+        for key, value in data.items():
+            point = self.locate(value)
+            if point is not None:
+                self._points[key] = point
+        self._tree = None
+
+    def _update(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        point = self.locate(data) if data is not None else None
+        if point != self._points.get(key):
+            if point is None:
+                del self._points[key]
+            else:
+                self._points[key] = point
+            self._tree = None
+
+    def _synced(self) -> None:
+        if self._tree is None:
+            self._tree = _build_tree([(*_vector(point), key) for key, point in self._points.items()])
+
+    async def nearest(self, point: Point, limit: int) -> List[Tuple[str, float]]:
+        """Ключи не больше limit ближайших к точке записей с расстоянием в километрах, ближние первыми"""
+        await self.sync()
+        if limit <= 0:
+            return []
+        target = _vector(point)
+        best: List[Tuple[float, str]] = []  # Куча с обратным знаком: на вершине самая дальняя из найденных
+        # Узлы к обходу с квадратом расстояния до их границы: дальнее поддерево проверяется,
+        # только если граница ближе самой дальней из уже найденных точек
+        stack = [(self._tree, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == limit and bound >= -best[0][0]:
+                continue
+            if isinstance(node, list):
+                for x, y, z, key in node:
+                    item = (-((x - target[0]) ** 2 + (y - target[1]) ** 2 + (z - target[2]) ** 2), key)
+                    if len(best) < limit:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+                continue
+            axis, border, left, right = node
+            difference = target[axis] - border
+            near, far = (left, right) if difference < 0 else (right, left)
+            stack.append((far, max(bound, difference * difference)))
+            stack.append((near, bound))
+        return [(key, _chord_to_km(-squared)) for squared, key in sorted(best, reverse=True)]
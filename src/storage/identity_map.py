@@ -0,0 +1,106 @@
+from typing import Dict, Any, Optional, Callable, Generic, TypeVar, Mapping, List, Set
+
+from storage.snapshot import Snapshot
+
+T = TypeVar('T')
+
+
+class IdentityMap(Generic[T]):
+    """Кэш разобранных объектов моделей поверх хранилища.
+
+    Объекты моделей неизменяемы и разделяются между вызывающими; изменение записи в хранилище
+    помечает устаревшим только её объект, остальные переиспользуются. Сама карта — неизменяемая
+    версия (Snapshot), поэтому all() отдаёт её без копирования.
+    """
+
+    _instances = {}  # Одна карта на хранилище
+
+    @classmethod
+    def get_instance(cls, storage, factory: Callable[[str, Dict[str, Any]], T]) -> 'IdentityMap[T]':
+        """Получение единственной карты для каждого хранилища"""
+        if id(storage) not in cls._instances:
+            cls._instances[id(storage)] = cls(storage, factory)
+        return cls._instances[id(storage)]
+
+    def __init__(self, storage, factory: Callable[[str, Dict[str, Any]], T]):
+        self.storage = storage
+        self.factory = factory
+        self._objects: Snapshot = Snapshot()
+        self._stale: Set[str] = set()
+        self._complete = False  # В карте есть объекты для всех записей хранилища
+        self._generation = 0  # Растёт при каждой инвалидации, защищает от гонок с await
+        storage.subscribe(self.invalidate)
+
+    def invalidate(self, key: Optional[str]) -> None:
+        """Пометка записи изменённой; None — сброс всей карты (перезагрузка хранилища)"""
+        if key is None and not self._objects and not self._complete:
+            # Сбрасывать нечего: первая загрузка хранилища не должна заставлять перечитывать его снова
+            return
+        self._generation += 1
+        if key is None:
+            self._objects = Snapshot()
+            self._stale.clear()
+            self._complete = False
+        elif self._complete or key in self._objects:
+            self._stale.add(key)
+
+    def _fresh(self, key: str) -> Optional[T]:
+        if key in self._stale:
+            return None
+        return self._objects.get(key)
+
+    async def get(self, key: str) -> Optional[T]:
+        """Объект записи по ключу"""
+        await self.storage.refresh()
+        obj = self._fresh(key)
+        if obj is not None:
+            return obj
+        generation = self._generation
+        data = await self.storage.get(key)
+        obj = self.factory(key, data) if data else None
+        if self._generation == generation:
+            self._stale.discard(key)
+            self._objects = self._objects.apply({key: obj})
+        return obj
+
+    def resolve(self, records: Dict[str, Dict[str, Any]]) -> List[T]:
+        """Объекты для записей, уже выбранных из хранилища (например, по индексу)"""
+        result = []
+        created = {}
+        for key, data in records.items():
+            obj = self._fresh(key)
+            if obj is None:
+                obj = self.factory(key, data)
+                if key not in self._stale:
+                    created[key] = obj
+            result.append(obj)
+        if created:
+            self._objects = self._objects.apply(created)
+        return result
+
+    async def all(self) -> Mapping[str, T]:
+        """Все объекты в виде неизменяемой версии; без изменений — без новых аллокаций"""
+        await self.storage.refresh()
+        while not self._complete or self._stale:
+            generation = self._generation
+            if not self._complete:
+                data = await self.storage.load()
+                objects = {}
+                for key, value in data.items():
+                    obj = self._fresh(key)
+                    objects[key] = obj if obj is not None else self.factory(key, value)
+                if self._generation == generation:
+                    self._objects = Snapshot.from_dict(objects)
+            else:
+                changes: Dict[str, Optional[T]] = {}
+                for key in list(self._stale):
+                    value = await self.storage.get(key)
+                    changes[key] = self.factory(key, value) if value else None
+                if self._generation == generation:
+                    # Новая версия от текущей: get() мог добавить объекты, пока шли await
+                    self._objects = self._objects.apply(changes)
+            if self._generation == generation:
+                self._stale.clear()
+                self._complete = True
+        # Версия не меняется: итерация по ней переживает записи, сделанные во время await
+        return self._objects
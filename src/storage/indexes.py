@@ -0,0 +1,37 @@
+from typing import Dict, Any, Optional, Hashable
+
+
+class SecondaryIndex:
+    """Вторичный индекс: значение поля -> ключи записей (в порядке добавления)"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._keys: Dict[Hashable, Dict[str, None]] = {}
+        self._values: Dict[str, Hashable] = {}  # Ключ записи -> проиндексированное значение
+
+    def rebuild(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """Полное перестроение по загруженным данным"""
+        self._keys.clear()
+        self._values.clear()
+        for key, value in data.items():
+            self.update(key, value)
+
+    def update(self, key: str, value: Optional[Dict[str, Any]]) -> None:
+        """Учёт изменения одной записи; None — запись удалена"""
+        new = None if value is None else value.get(self.field)
+        if key in self._values:
+            old = self._values[key]
+            if value is not None and old == new:
+                return
+            bucket = self._keys[old]
+            del bucket[key]
+            if not bucket:
+                del self._keys[old]
+            del self._values[key]
+        if value is not None:
+            self._keys.setdefault(new, {})[key] = None
+            self._values[key] = new
+
+    def keys(self, value: Hashable) -> list:
+        """Ключи записей с заданным значением поля"""
+        return list(self._keys.get(value, ()))
@@ -0,0 +1,484 @@
+import asyncio
+import aiofiles
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, Callable, List, Tuple, Mapping
+import os
+import time
+import logging
+
+from config import (
+    STORAGE_WAL_ENABLED, STORAGE_WAL_COMPACT_BYTES, STORAGE_GROUP_COMMIT_WINDOW, STORAGE_CODEC,
+    STORAGE_MULTIPROCESS, STORAGE_REVALIDATE_INTERVAL
+)
+from storage.codecs import get_codec
+from storage.files import atomic_write
+from storage.indexes import SecondaryIndex
+from storage.locks import FileLock
+from storage.offsets import OffsetIndex, write_offsets
+from storage.snapshot import Snapshot
+from storage.wal import WriteAheadLog, Changes
+
+logger = logging.getLogger(__name__)
+
+
+# Служебное поле записи со счётчиком версий; модели его игнорируют
+VERSION_FIELD = '_version'
+
+
+class StorageError(Exception):
+    """Файл хранилища не удалось прочитать; пустые данные вместо него привели бы к потере записей"""
+
+
+class ConflictError(StorageError):
+    """Запись изменилась после чтения: условная запись отклонена"""
+
+
+def record_version(record: Optional[Dict[str, Any]]) -> int:
+    """Версия записи; 0 — записи нет или она создана до появления версий"""
+    return record.get(VERSION_FIELD, 0) if record else 0
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Признак версии файла: inode, mtime и размер; None — файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class JsonStorage:
+    """Класс для асинхронной работы с JSON-файлами с кэшированием и блокировками"""
+
+    _instances = {}  # Словарь для хранения экземпляров по пути к файлу
+
+    @classmethod
+    def get_instance(cls, file_path: str) -> 'JsonStorage':
+        """Получение единственного экземпляра хранилища для каждого файла"""
+        if file_path not in cls._instances:
+            cls._instances[file_path] = cls(file_path)
+        return cls._instances[file_path]
+
+    def __init__(self, file_path: str, wal_enabled: bool = STORAGE_WAL_ENABLED, codec_name: str = STORAGE_CODEC,
+                 interprocess: bool = STORAGE_MULTIPROCESS):
+        self.file_path = file_path
+        # Кодек формата на диске: стандартный json или быстрый orjson
+        self.codec = get_codec(codec_name)
+        # В режиме нескольких процессов блокировка берёт ещё и flock на <файл>.lock
+        self.lock = FileLock(file_path, interprocess)
+        # Текущая неизменяемая версия данных: запись публикует новую, читатели держат свою
+        self._cache = Snapshot()
+        self._cache_valid = False
+        # Что из файлов на диске уже отражено в кэше: поколение lock-файла, признаки снимка
+        # и журнала после нашей последней записи или чтения, смещение в журнале
+        self._seen_generation = 0
+        self._snapshot_id: Optional[Tuple[int, int, int]] = None
+        self._wal_id: Optional[Tuple[int, int, int]] = None
+        self._wal_offset = 0
+        # Сверка кэша с файлами (ручные правки data/*.json) не чаще раза в интервал
+        self.revalidate_interval = STORAGE_REVALIDATE_INTERVAL
+        self._checked_at = 0.0
+        self.cache_stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'replays': 0, 'point_reads': 0}
+        # Точечное чтение до полной загрузки: записи по индексу смещений снимка и журнал поверх него
+        self._offset_index = OffsetIndex(file_path)
+        self._offsets_open = False
+        self._records: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Журнал изменений: файл снимка + дописываемый лог мутаций
+        self.wal_enabled = wal_enabled
+        self.wal = WriteAheadLog(file_path + '.wal', self.codec)
+        self._compaction_task: Optional[asyncio.Task] = None
+        # Групповая фиксация: изменения за окно сливаются в одну физическую запись
+        self._pending: Changes = {}
+        self._pending_future: Optional[asyncio.Future] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._unwritten: List[Changes] = []  # Пачки, уже применённые к кэшу и ждущие записи
+        # Вторичные индексы по полям записей, поддерживаются при каждом изменении
+        self._indexes: Dict[str, SecondaryIndex] = {}
+        # Подписчики на изменения записей (ключ или None при полной перезагрузке)
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        # Создаем директорию, если она не существует
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    async def load(self) -> Snapshot:
+        """Неизменяемая версия данных из кэша; кэш перечитывается, только если файлы изменились"""
+        if self._cache_valid:
+            await self.refresh()
+            self.cache_stats['hits'] += 1
+            return self._cache
+        # Под блокировкой другой процесс не заменит снимок между его чтением и чтением журнала,
+        # а одновременные вызовы дождутся одной загрузки
+        async with self.lock:
+            if not self._cache_valid:
+                self.cache_stats['misses'] += 1
+                await self._reload()
+        return self._cache
+
+    async def _reload(self) -> None:
+        """Чтение снимка и журнала в кэш (под блокировкой)"""
+        try:
+            # Проверяем существование файла
+            if not os.path.exists(self.file_path):
+                # Создаем пустой файл
+                async with aiofiles.open(self.file_path, 'w', encoding='utf-8') as file:
+                    await file.write('{}')
+                data = {}
+            else:
+                # Чтение и разбор большого файла не должны блокировать цикл событий
+                data = await asyncio.to_thread(self._read_snapshot)
+            # Накатываем журнал поверх снимка (он может остаться и после отключения режима)
+            changes, wal_offset = await self.wal.read_since(0)
+            WriteAheadLog.apply(data, changes)
+        except ValueError as e:
+            logger.error(f"Ошибка декодирования JSON в файле {self.file_path}: {e}")
+            raise StorageError(f"Повреждён файл {self.file_path}") from e
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных из {self.file_path}: {e}")
+            raise StorageError(f"Не удалось загрузить {self.file_path}") from e
+        self._cache = Snapshot.from_dict(data)
+        self._cache_valid = True
+        # Полный кэш заменяет прочитанные по отдельности записи
+        self._close_offsets()
+        self._remember_files()
+        self._wal_offset = wal_offset
+        self._seen_generation = self.lock.generation()
+        self._rebuild_indexes()
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        """Чтение и разбор файла снимка (выполняется в рабочем потоке)"""
+        with open(self.file_path, 'rb') as file:
+            content = file.read()
+        return self.codec.loads(content) if content else {}
+
+    def _remember_files(self) -> None:
+        """Запоминание признаков файлов после нашего чтения или записи: свои записи не считаются изменениями"""
+        self._snapshot_id = file_signature(self.file_path)
+        self._wal_id = file_signature(self.wal.path)
+        self._checked_at = time.monotonic()
+
+    def _files_changed(self) -> bool:
+        """Файлы изменены не нами: другим процессом (поколение) или вручную (stat раз в интервал)"""
+        if self.lock.generation() != self._seen_generation:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < self.revalidate_interval:
+            return False
+        self._checked_at = now
+        return (file_signature(self.file_path), file_signature(self.wal.path)) != (self._snapshot_id, self._wal_id)
+
+    async def refresh(self) -> None:
+        """Подхват изменений файлов, сделанных не этим экземпляром; без изменений — без чтения файлов"""
+        if not self._cache_valid or not self._files_changed():
+            return
+        async with self.lock:
+            await self._catch_up()
+
+    async def _catch_up(self) -> None:
+        """Применение к кэшу изменений файлов, сделанных не нами (только под блокировкой).
+
+        Если после нашей последней записи другой процесс лишь дописал журнал, читается только
+        его хвост; если снимок заменён (свёртка, save, ручная правка), файл перечитывается
+        целиком. Наши ещё не записанные изменения поверх чужих применяются заново.
+        """
+        if not self._cache_valid:
+            return
+        generation = self.lock.generation()
+        snapshot_id, wal_id = file_signature(self.file_path), file_signature(self.wal.path)
+        if generation == self._seen_generation and (snapshot_id, wal_id) == (self._snapshot_id, self._wal_id):
+            return
+        if generation != self._seen_generation and snapshot_id == self._snapshot_id and self.wal.size() >= self._wal_offset:
+            changes, self._wal_offset = await self.wal.read_since(self._wal_offset)
+            self._apply(changes, bump=False)
+            self._remember_files()
+            self.cache_stats['replays'] += 1
+            overwritten = changes.keys()
+        else:
+            logger.info(f"Файл {self.file_path} изменён извне, данные перечитываются")
+            await self._reload()
+            self.cache_stats['reloads'] += 1
+            overwritten = None
+        self._seen_generation = generation
+        for batch in (self._pending, *self._unwritten):
+            if not batch:
+                continue
+            stale = {key: value for key, value in batch.items() if overwritten is None or key in overwritten}
+            self._apply(stale)
+            batch.update(stale)
+
+    async def save(self, data: Mapping[str, Any]) -> None:
+        """Сохранение данных в JSON-файл с блокировкой"""
+        async with self.lock:
+            try:
+                data = Snapshot.from_dict(data)
+                await self._write_snapshot(data)
+                if data is not self._cache:
+                    self._cache = data
+                    self._close_offsets()
+                    self._rebuild_indexes()
+                self._cache_valid = True
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении данных в {self.file_path}: {e}")
+                raise StorageError(f"Не удалось сохранить {self.file_path}") from e
+
+    async def _write_snapshot(self, data: Snapshot) -> None:
+        """Атомарная запись файла снимка; журнал после этого больше не нужен"""
+        # Версия неизменяема: поток сериализует её без копии, пока цикл событий публикует новые
+        await asyncio.to_thread(self._dump_snapshot, data)
+        await self.wal.truncate()
+        self._remember_files()
+        self._wal_offset = 0
+        self._seen_generation = self.lock.advance()
+
+    def _dump_snapshot(self, data: Mapping[str, Any]) -> None:
+        """Компактная сериализация и атомарная замена файла (выполняется в рабочем потоке)"""
+        # Кодируем по записи: один вызов кодека на весь файл держал бы GIL до конца
+        # и останавливал цикл событий так же, как сериализация в основном потоке
+        dumps = self.codec.dumps
+        parts = []
+        offsets = {}
+        position = 1
+        for key, value in data.items():
+            encoded_key, encoded_value = dumps(key), dumps(value)
+            # Смещение значения в файле: по нему get() читает запись, не разбирая остальные
+            offsets[key] = (position + len(encoded_key) + 1, len(encoded_value))
+            parts.append(encoded_key + b':' + encoded_value)
+            position += len(encoded_key) + len(encoded_value) + 2
+        atomic_write(self.file_path, b'{' + b','.join(parts) + b'}')
+        write_offsets(self.file_path, offsets)
+
+    async def _commit(self, changes: Changes) -> None:
+        """Сохранение изменений, уже применённых к кэшу (версии проверены до применения)"""
+        if STORAGE_GROUP_COMMIT_WINDOW <= 0 or self.lock.held():
+            # Под удерживаемой блокировкой (транзакция между процессами) пачку записывает сам вызывающий
+            await self._write(changes)
+            return
+        self._pending.update(changes)
+        if self._pending_future is None:
+            self._pending_future = asyncio.get_running_loop().create_future()
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+        # Ждём записи всей пачки; отмена одного вызывающего не отменяет запись для остальных
+        await asyncio.shield(self._pending_future)
+
+    async def _delayed_flush(self) -> None:
+        """Запись накопленной пачки по истечении окна групповой фиксации"""
+        await asyncio.sleep(STORAGE_GROUP_COMMIT_WINDOW)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except StorageError:
+            pass  # Ошибка уже передана всем, кто ждёт записи пачки
+
+    async def flush(self) -> None:
+        """Немедленная запись накопленных изменений одной физической записью"""
+        if self._pending_future is None:
+            return
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        changes, future = self._pending, self._pending_future
+        self._pending, self._pending_future = {}, None
+        try:
+            await self._write(changes)
+        except BaseException as e:
+            # Каждый вызывающий из пачки узнаёт, что его изменения не записаны
+            future.set_exception(e if isinstance(e, Exception) else StorageError(f"Запись в {self.file_path} прервана"))
+            # Исключение получат ожидающие; если все они отменены, не считаем его потерянным
+            future.exception()
+            raise
+        future.set_result(None)
+
+    @classmethod
+    async def flush_all(cls) -> None:
+        """Запись всех отложенных изменений во всех хранилищах (при остановке бота)"""
+        instances = list(cls._instances.values())
+        await asyncio.gather(*(storage.flush() for storage in instances))
+        await asyncio.gather(*(storage._compaction_task for storage in instances if storage._compaction_task))
+
+    async def _write(self, changes: Changes) -> None:
+        """Физическая запись пачки изменений: в журнал или полной перезаписью файла"""
+        self._unwritten.append(changes)
+        try:
+            async with self.lock:
+                await self._catch_up()
+                try:
+                    if not self.wal_enabled:
+                        await self.save(self._cache)
+                        return
+                    await self.wal.append(changes)
+                except Exception as e:
+                    logger.error(f"Ошибка при записи {self.file_path}: {e}")
+                    await self._drop_unwritten(changes)
+                    raise StorageError(f"Не удалось записать изменения в {self.file_path}") from e
+                # Чужие записи подхвачены перед дописыванием, поэтому весь журнал уже в кэше
+                self._wal_offset = self.wal.size()
+                self._remember_files()
+                self._seen_generation = self.lock.advance()
+        finally:
+            self._unwritten.remove(changes)
+        if self.wal.size() >= STORAGE_WAL_COMPACT_BYTES and not self._compaction_task:
+            self._compaction_task = asyncio.create_task(self._compact())
+
+    async def _drop_unwritten(self, failed: Changes) -> None:
+        """Удаление из кэша пачки, которую не удалось записать (только под блокировкой).
+
+        Кэш перечитывается с диска, а ещё не записанные пачки других вызывающих применяются
+        поверх: так кэш не показывает данных, которых нет на диске. Если не удалось и прочитать,
+        кэш помечается недействительным и будет загружен при следующем обращении.
+        """
+        try:
+            await self._reload()
+        except StorageError:
+            self._cache_valid = False
+            self._close_offsets()
+            for listener in self._listeners:
+                listener(None)
+            return
+        for batch in (self._pending, *self._unwritten):
+            if batch and batch is not failed:
+                stale = dict(batch)
+                self._apply(stale)
+                batch.update(stale)
+
+    async def _compact(self) -> None:
+        """Фоновая свёртка журнала в новый снимок"""
+        try:
+            async with self.lock:
+                # Записи других процессов из журнала должны попасть в снимок до его очистки
+                await self._catch_up()
+                await self._write_snapshot(self._cache)
+                logger.info(f"Журнал {self.wal.path} свёрнут в снимок")
+        except Exception as e:
+            logger.error(f"Ошибка при свёртке журнала {self.wal.path}: {e}")
+        finally:
+            self._compaction_task = None
+
+    def ensure_index(self, field: str) -> None:
+        """Регистрация вторичного индекса по полю записей"""
+        if field in self._indexes:
+            return
+        index = SecondaryIndex(field)
+        if self._cache_valid:
+            index.rebuild(self._cache)
+        self._indexes[field] = index
+
+    def subscribe(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Подписка на изменения: listener(key) при записи, listener(None) при перезагрузке"""
+        self._listeners.append(listener)
+
+    def _rebuild_indexes(self) -> None:
+        for index in self._indexes.values():
+            index.rebuild(self._cache)
+        for listener in self._listeners:
+            listener(None)
+
+    def _exclusive(self):
+        """Блокировка на время проверки версий и записи; нужна, только если пишут и другие процессы"""
+        return self.lock if self.lock.interprocess else nullcontext()
+
+    async def _ensure_loaded(self) -> None:
+        """Загрузка кэша перед применением изменений транзакции"""
+        await self.load()
+
+    def _versions_match(self, expected: Dict[str, int]) -> bool:
+        """Проверка ожидаемых версий записей по кэшу (без ожиданий, атомарно для цикла событий)"""
+        return all(record_version(self._cache.get(key)) == version for key, version in expected.items())
+
+    def _apply(self, changes: Changes, bump: bool = True) -> None:
+        """Публикация новой версии кэша и обновление индексов; записываемым значениям присваивается новая версия"""
+        if bump:
+            for key, value in changes.items():
+                if value is not None:
+                    changes[key] = {**value, VERSION_FIELD: record_version(self._cache.get(key)) + 1}
+        self._cache = self._cache.apply(changes)
+        for key, value in changes.items():
+            for index in self._indexes.values():
+                index.update(key, value)
+            for listener in self._listeners:
+                listener(key)
+
+    async def find(self, field: str, value: Any) -> Dict[str, Dict[str, Any]]:
+        """Выборка записей по значению поля за время, пропорциональное размеру результата"""
+        data = await self.load()
+        self.ensure_index(field)
+        return {key: data[key] for key in self._indexes[field].keys(value)}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Получение элемента по ключу; до полной загрузки — чтением одной записи по индексу смещений"""
+        if not self._cache_valid:
+            if key in self._records and not self._files_changed():
+                self.cache_stats['hits'] += 1
+                return self._records[key]
+            async with self.lock:
+                if not self._cache_valid and await self._open_offsets():
+                    if key not in self._records:
+                        self._records[key] = self._offset_index.read(key, self.codec.loads)
+                        self.cache_stats['point_reads'] += 1
+                    return self._records[key]
+        data = await self.load()
+        return data.get(key)
+
+    async def _open_offsets(self) -> bool:
+        """Подготовка точечного чтения (под блокировкой); False — индекса нет, нужна полная загрузка.
+
+        Снимок с индексом и журнал читаются под одной блокировкой, поэтому согласованы между собой.
+        Если файлы изменились не нами, прочитанные записи сбрасываются и индекс открывается заново.
+        """
+        generation = self.lock.generation()
+        if self._offsets_open and generation == self._seen_generation and \
+                (file_signature(self.file_path), file_signature(self.wal.path)) == (self._snapshot_id, self._wal_id):
+            return True
+        self._close_offsets()
+        if not await asyncio.to_thread(self._offset_index.open):
+            return False
+        # Записи журнала новее снимка и уже разобраны: с них начинается набор прочитанных записей
+        changes, self._wal_offset = await self.wal.read_since(0)
+        self._records = dict(changes)
+        self._offsets_open = True
+        self._remember_files()
+        self._seen_generation = generation
+        return True
+
+    def _close_offsets(self) -> None:
+        self._offset_index.close()
+        self._offsets_open = False
+        self._records = {}
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Установка значения по ключу"""
+        await self.load()
+        changes = {key: value}
+        self._apply(changes)
+        await self._commit(changes)
+
+    async def compare_and_set(self, key: str, expected_version: int, value: Dict[str, Any]) -> bool:
+        """Запись, только если версия записи не изменилась с момента чтения.
+
+        Проверка и применение к кэшу идут без await между ними, поэтому из нескольких
+        одновременных вызовов с одной версией успешен ровно один, а остальные сразу получают
+        отказ, не дожидаясь блокировки файла.
+        """
+        await self.load()
+        async with self._exclusive():
+            # Между процессами версии сверяются под flock с уже подхваченными чужими записями
+            await self.refresh()
+            if not self._versions_match({key: expected_version}):
+                return False
+            changes = {key: value}
+            self._apply(changes)
+            await self._commit(changes)
+        return True
+
+    async def delete(self, key: str) -> None:
+        """Удаление элемента по ключу"""
+        data = await self.load()
+        if key in data:
+            self._apply({key: None})
+            await self._commit({key: None})
+
+    async def clear_cache(self) -> None:
+        """Очистка кэша"""
+        self._cache_valid = False
+        # Индекс переоткроется при следующем get() под блокировкой
+        self._offsets_open = False
+        self._records = {}
+        for listener in self._listeners:
+            listener(None)
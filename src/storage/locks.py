@@ -0,0 +1,83 @@
+import asyncio
+import fcntl
+import os
+from typing import Optional
+
+
+class FileLock:
+    """Блокировка файла данных: asyncio.Lock внутри процесса и flock на <файл>.lock между процессами.
+
+    Повторный вход из той же задачи не блокирует: транзакция держит блокировки своих хранилищ,
+    а их записи идут обычным путём фиксации. В lock-файле хранится поколение — счётчик
+    физических записей, по которому другие процессы дёшево узнают, что файл изменился.
+    """
+
+    def __init__(self, path: str, interprocess: bool = False):
+        self.path = path + '.lock'
+        self.interprocess = interprocess
+        self._lock = asyncio.Lock()
+        self._owner: Optional[asyncio.Task] = None
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def _fileno(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def held(self) -> bool:
+        """Блокировку держит текущая задача"""
+        return self._depth > 0 and self._owner is asyncio.current_task()
+
+    async def acquire(self) -> None:
+        if self.held():
+            self._depth += 1
+            return
+        await self._lock.acquire()
+        if self.interprocess:
+            fd = self._fileno()
+            future = asyncio.ensure_future(asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX))
+            try:
+                await asyncio.shield(future)
+            except BaseException:
+                # Поток всё равно дождётся flock: отпускаем обе блокировки, когда он закончит
+                future.add_done_callback(lambda _: self._unlock())
+                raise
+        self._owner = asyncio.current_task()
+        self._depth = 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._unlock()
+
+    def _unlock(self) -> None:
+        if self.interprocess:
+            fcntl.flock(self._fileno(), fcntl.LOCK_UN)
+        self._lock.release()
+
+    async def __aenter__(self) -> 'FileLock':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+    def generation(self) -> int:
+        """Поколение файла; читается без блокировки (оборванное чтение даст -1 и лишнюю проверку)"""
+        if not self.interprocess:
+            return 0
+        content = os.pread(self._fileno(), 20, 0)
+        try:
+            return int(content) if content.strip() else 0
+        except ValueError:
+            return -1
+
+    def advance(self) -> int:
+        """Увеличение поколения после физической записи (только под блокировкой)"""
+        if not self.interprocess:
+            return 0
+        generation = max(self.generation(), 0) + 1
+        os.pwrite(self._fileno(), str(generation).encode().ljust(20), 0)
+        return generation
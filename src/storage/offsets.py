@@ -0,0 +1,67 @@
+import json
+import mmap
+import os
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from storage.files import atomic_write
+
+INDEX_SUFFIX = '.idx'
+
+
+def _signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def write_offsets(snapshot_path: str, offsets: Dict[str, Tuple[int, int]]) -> None:
+    """Запись индекса смещений только что записанного снимка (в рабочем потоке).
+
+    В индексе хранится признак снимка: если файл потом заменят вручную или процесс упадёт
+    между записью снимка и индекса, индекс не совпадёт с файлом и читаться не будет.
+    """
+    index = {'snapshot': _signature(os.stat(snapshot_path)), 'offsets': offsets}
+    atomic_write(snapshot_path + INDEX_SUFFIX, json.dumps(index, ensure_ascii=False).encode('utf-8'))
+
+
+class OffsetIndex:
+    """Индекс файла снимка: ключ -> смещение и длина значения в файле.
+
+    Снимок отображается в память (mmap), и чтение записи разбирает только её байты: после
+    перезапуска точечные запросы не загружают весь файл, а в памяти остаются ключи индекса
+    и прочитанные записи.
+    """
+
+    def __init__(self, snapshot_path: str):
+        self.snapshot_path = snapshot_path
+        self.path = snapshot_path + INDEX_SUFFIX
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._mmap: Optional[mmap.mmap] = None
+
+    def open(self) -> bool:
+        """Отображение снимка и чтение индекса (в рабочем потоке); False — индекса нет или он устарел"""
+        self.close()
+        try:
+            with open(self.path, 'rb') as file:
+                index = json.loads(file.read())
+            with open(self.snapshot_path, 'rb') as file:
+                # Признак берётся у открытого файла: отображается ровно тот снимок, что описан индексом
+                if tuple(index['snapshot']) != _signature(os.fstat(file.fileno())):
+                    return False
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError):
+            return False
+        self._offsets = index['offsets']
+        return True
+
+    def read(self, key: str, loads: Callable[[bytes], Any]) -> Optional[Dict[str, Any]]:
+        """Запись по ключу из отображённого снимка; None — записи в снимке нет"""
+        position = self._offsets.get(key)
+        if position is None or self._mmap is None:
+            return None
+        offset, length = position
+        return loads(self._mmap[offset:offset + length])
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._offsets = {}
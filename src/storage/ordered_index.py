@@ -0,0 +1,50 @@
+import bisect
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+from storage.derived_index import DerivedIndex
+
+SortKey = Tuple[Any, ...]
+
+
+class OrderedIndex(DerivedIndex):
+    """Упорядоченный индекс записей хранилища: ключи, отсортированные по sort_key.
+
+    Страница берётся срезом отсортированного списка, нижняя граница — двоичным поиском,
+    поэтому листание не читает и не сортирует все записи. Изменённая запись переставляется
+    на своё место при следующем чтении.
+    """
+
+    @classmethod
+    def get_instance(cls, storage, sort_key: Callable[[str, Dict[str, Any]], SortKey]) -> 'OrderedIndex':
+        """Получение единственного индекса для каждого хранилища"""
+        return super().get_instance(storage, sort_key)
+
+    def __init__(self, storage, sort_key: Callable[[str, Dict[str, Any]], SortKey]):
+        super().__init__(storage)
+        self.sort_key = sort_key
+        self._entries: List[Tuple[SortKey, str]] = []  # (ключ сортировки, ключ записи) по возрастанию
+        self._positions: Dict[str, SortKey] = {}  # Ключ записи -> её ключ сортировки в _entries
+
+    async def _rebuild(self, data) -> None:
+        self._positions = {key: self.sort_key(key, value) for key, value in data.items()}
+        self._entries = sorted((sort_key, key) for key, sort_key in self._positions.items())
+
+    def _update(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        old = self._positions.pop(key, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (old, key))]
+        if data is not None:
+            self._positions[key] = self.sort_key(key, data)
+            bisect.insort(self._entries, (self._positions[key], key))
+
+    async def descending(self, offset: int = 0, limit: int = 10,
+                         lower: Optional[SortKey] = None) -> Tuple[List[str], int]:
+        """Ключи записей от больших ключей сортировки к меньшим и их общее число.
+
+        lower — начало ключа сортировки: учитываются только записи, у которых ключ не меньше его.
+        """
+        await self.sync()
+        start = bisect.bisect_left(self._entries, (lower,)) if lower is not None else 0
+        total = len(self._entries) - start
+        end = len(self._entries) - offset
+        return [key for _, key in reversed(self._entries[max(start, end - limit):max(start, end)])], total
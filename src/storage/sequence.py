@@ -0,0 +1,83 @@
+import json
+import asyncio
+import os
+import logging
+from typing import Dict
+
+from config import SEQUENCES_JSON, SEQUENCE_BLOCK_SIZE, STORAGE_MULTIPROCESS
+from storage.files import atomic_write
+from storage.locks import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceAllocator:
+    """Монотонный генератор ID для типа сущности.
+
+    В файле последовательностей хранится верхняя граница зарезервированного блока, поэтому
+    выдача ID — это инкремент в памяти, а запись на диск нужна раз в SEQUENCE_BLOCK_SIZE выдач.
+    После перезапуска остаток блока пропускается: ID не переиспользуются, но возможны пропуски.
+    """
+
+    _instances = {}  # Экземпляры по имени последовательности
+    _file_locks: Dict[str, FileLock] = {}  # Файл последовательностей общий для всех имён (и процессов)
+
+    @classmethod
+    def get_instance(cls, name: str, storage, path: str = SEQUENCES_JSON, archive=None) -> 'SequenceAllocator':
+        """Получение единственного генератора для каждой последовательности"""
+        if name not in cls._instances:
+            cls._instances[name] = cls(name, storage, path, archive=archive)
+        return cls._instances[name]
+
+    def __init__(self, name: str, storage, path: str = SEQUENCES_JSON, block_size: int = SEQUENCE_BLOCK_SIZE,
+                 archive=None):
+        self.name = name
+        # Хранилище и архив его записей нужны только для начального значения по уже существующим ключам
+        self.storage = storage
+        self.archive = archive
+        self.path = path
+        self.block_size = block_size
+        self._next = 0
+        self._limit = 0
+        self._lock = asyncio.Lock()
+
+    async def next_id(self) -> str:
+        """Выдача следующего ID"""
+        while self._next >= self._limit:
+            async with self._lock:
+                if self._next >= self._limit:
+                    await self._reserve_block()
+        value = self._next
+        self._next += 1
+        return str(value)
+
+    async def _reserve_block(self) -> None:
+        """Резервирование следующего блока ID в файле последовательностей"""
+        lock = self._file_locks.setdefault(self.path, FileLock(self.path, STORAGE_MULTIPROCESS))
+        async with lock:
+            sequences = await asyncio.to_thread(self._read)
+            start = sequences.get(self.name)
+            if start is None:
+                start = await self._initial_value()
+            limit = start + self.block_size
+            sequences[self.name] = limit
+            await asyncio.to_thread(atomic_write, self.path, json.dumps(sequences).encode('utf-8'))
+        self._next, self._limit = start, limit
+
+    async def _initial_value(self) -> int:
+        """Первый ID после максимального числового ключа, созданного до появления генератора.
+
+        Учитываются и ключи, уже перенесённые в архив: иначе новая запись получила бы ID архивной.
+        """
+        keys = list(await self.storage.load())
+        if self.archive is not None:
+            keys += await self.archive.keys()
+        numeric_ids = [int(key) for key in keys if key.isdigit()]
+        return max(numeric_ids) + 1 if numeric_ids else 1
+
+    def _read(self) -> Dict[str, int]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        return json.loads(content) if content else {}
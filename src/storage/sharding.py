@@ -0,0 +1,299 @@
+import asyncio
+import json
+import os
+import shutil
+import zlib
+import logging
+from collections.abc import Mapping, ItemsView, ValuesView
+from contextlib import AsyncExitStack, nullcontext
+from typing import Dict, Any, Optional, List, Callable, Iterator, AsyncIterator, Tuple
+
+from config import STORAGE_SHARDS
+from storage.files import atomic_write
+from storage.json_storage import JsonStorage, StorageError
+from storage.offsets import INDEX_SUFFIX
+from storage.wal import Changes
+
+logger = logging.getLogger(__name__)
+
+
+def shard_dir(file_path: str) -> str:
+    """Каталог шардов файла данных: requests.json -> requests.shards"""
+    return os.path.splitext(file_path)[0] + '.shards'
+
+
+def read_shard_count(file_path: str) -> Optional[int]:
+    """Число шардов, с которым записан каталог; None — файл не шардирован"""
+    meta_path = os.path.join(shard_dir(file_path), 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'rb') as file:
+        return json.loads(file.read())['shards']
+
+
+def key_shard(key: str, shards: int) -> int:
+    """Номер шарда записи по crc32 ключа"""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def _sort_key(key: str) -> Tuple[int, str]:
+    # Числовые ID по возрастанию: такой порядок у записей в нешардированном файле
+    return len(key), key
+
+
+class ShardedView(Mapping):
+    """Все записи шардов без копирования: чтение по ключу идёт в свой шард, обход — по шардам подряд"""
+
+    def __init__(self, shards: List[Dict[str, Any]]):
+        self._shards = shards
+
+    def __getitem__(self, key: str) -> Any:
+        return self._shards[key_shard(key, len(self._shards))][key]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and key in self._shards[key_shard(key, len(self._shards))]
+
+    def __iter__(self) -> Iterator[str]:
+        for data in self._shards:
+            yield from data
+
+    def __len__(self) -> int:
+        return sum(len(data) for data in self._shards)
+
+    def items(self) -> ItemsView:
+        return _ShardedItems(self)
+
+    def values(self) -> ValuesView:
+        return _ShardedValues(self)
+
+
+class _ShardedItems(ItemsView):
+    def __iter__(self):
+        for data in self._mapping._shards:
+            yield from data.items()
+
+
+class _ShardedValues(ValuesView):
+    def __iter__(self):
+        for data in self._mapping._shards:
+            yield from data.values()
+
+
+class ShardedStorage:
+    """Хранилище, разбитое по crc32 ключа на K файлов JsonStorage с отдельными блокировками и кэшами.
+
+    Запись затрагивает один шард, поэтому изменения разных записей фиксируются параллельно.
+    Интерфейс тот же, что у JsonStorage; число шардов меняется офлайн: python -m storage.sharding K.
+    """
+
+    _instances = {}  # Экземпляры по пути к исходному файлу данных
+
+    @classmethod
+    def get_instance(cls, file_path: str, shards: int = STORAGE_SHARDS) -> 'ShardedStorage':
+        """Получение единственного экземпляра хранилища для каждого файла"""
+        if file_path not in cls._instances:
+            cls._instances[file_path] = cls(file_path, shards)
+        return cls._instances[file_path]
+
+    def __init__(self, file_path: str, shards: int = STORAGE_SHARDS):
+        self.file_path = file_path
+        written = read_shard_count(file_path)
+        if written is None and os.path.exists(file_path):
+            raise StorageError(f"{file_path} не разбит на шарды: python -m storage.sharding {shards}")
+        if written is not None and written != shards:
+            raise StorageError(f"{file_path} разбит на {written} шардов, а не {shards}: python -m storage.sharding {shards}")
+        directory = shard_dir(file_path)
+        if written is None:
+            os.makedirs(directory, exist_ok=True)
+            atomic_write(os.path.join(directory, 'meta.json'), json.dumps({'shards': shards}).encode('utf-8'))
+        self.shards = [JsonStorage.get_instance(os.path.join(directory, f'{i:02d}.json')) for i in range(shards)]
+
+    def shard(self, key: str) -> JsonStorage:
+        """Шард, в котором хранится запись"""
+        return self.shards[key_shard(key, len(self.shards))]
+
+    def _split(self, changes: Changes) -> Dict[JsonStorage, Changes]:
+        split: Dict[JsonStorage, Changes] = {}
+        for key, value in changes.items():
+            split.setdefault(self.shard(key), {})[key] = value
+        return split
+
+    async def load(self) -> Mapping:
+        """Все записи в виде отображения поверх кэшей шардов (без слияния в один словарь)"""
+        return ShardedView([await shard.load() for shard in self.shards])
+
+    async def scan(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Обход всех записей с загрузкой шардов по мере продвижения"""
+        for shard in self.shards:
+            for item in (await shard.load()).items():
+                yield item
+
+    async def save(self, data: Mapping) -> None:
+        """Полная замена содержимого всех шардов"""
+        parts: List[Dict[str, Any]] = [{} for _ in self.shards]
+        for key, value in data.items():
+            parts[key_shard(key, len(self.shards))][key] = value
+        await asyncio.gather(*(shard.save(part) for shard, part in zip(self.shards, parts)))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Получение элемента по ключу"""
+        return await self.shard(key).get(key)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Установка значения по ключу"""
+        await self.shard(key).set(key, value)
+
+    async def compare_and_set(self, key: str, expected_version: int, value: Dict[str, Any]) -> bool:
+        """Запись, только если версия записи не изменилась с момента чтения"""
+        return await self.shard(key).compare_and_set(key, expected_version, value)
+
+    async def delete(self, key: str) -> None:
+        """Удаление элемента по ключу"""
+        await self.shard(key).delete(key)
+
+    def ensure_index(self, field: str) -> None:
+        """Регистрация вторичного индекса по полю во всех шардах"""
+        for shard in self.shards:
+            shard.ensure_index(field)
+
+    async def find(self, field: str, value: Any) -> Dict[str, Dict[str, Any]]:
+        """Выборка записей по значению поля из всех шардов"""
+        found: Dict[str, Dict[str, Any]] = {}
+        for shard in self.shards:
+            found.update(await shard.find(field, value))
+        return {key: found[key] for key in sorted(found, key=_sort_key)}
+
+    def subscribe(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Подписка на изменения всех шардов"""
+        for shard in self.shards:
+            shard.subscribe(listener)
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """Суммарные счётчики кэшей шардов"""
+        stats: Dict[str, int] = {}
+        for shard in self.shards:
+            for name, value in shard.cache_stats.items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+
+    async def refresh(self) -> None:
+        """Подхват изменений файлов шардов, сделанных не этим процессом"""
+        for shard in self.shards:
+            await shard.refresh()
+
+    async def flush(self) -> None:
+        """Немедленная запись отложенных изменений всех шардов"""
+        await asyncio.gather(*(shard.flush() for shard in self.shards))
+
+    async def clear_cache(self) -> None:
+        """Очистка кэшей всех шардов"""
+        for shard in self.shards:
+            await shard.clear_cache()
+
+    def _exclusive(self):
+        """Блокировки всех шардов, всегда в одном порядке; нужны, только если пишут и другие процессы"""
+        return _ShardLocks(self.shards) if self.shards[0].lock.interprocess else nullcontext()
+
+    async def _ensure_loaded(self) -> None:
+        for shard in self.shards:
+            await shard._ensure_loaded()
+
+    def _versions_match(self, expected: Dict[str, int]) -> bool:
+        return all(self.shard(key)._versions_match({key: version}) for key, version in expected.items())
+
+    def _apply(self, changes: Changes, bump: bool = True) -> None:
+        for shard, part in self._split(changes).items():
+            shard._apply(part, bump)
+            # Шард проставляет версии в своей части; транзакция сохраняет исходный словарь
+            changes.update(part)
+
+    async def _commit(self, changes: Changes) -> None:
+        parts = self._split(changes)
+        if any(shard.lock.held() for shard in parts):
+            # Под блокировкой транзакции пишем в этой задаче: повторный вход доступен только владельцу
+            for shard, part in parts.items():
+                await shard._commit(part)
+        else:
+            await asyncio.gather(*(shard._commit(part) for shard, part in parts.items()))
+
+
+class _ShardLocks(AsyncExitStack):
+    """Контекст, берущий блокировки шардов при работе нескольких процессов"""
+
+    def __init__(self, shards: List[JsonStorage]):
+        super().__init__()
+        self._shards = shards
+
+    async def __aenter__(self) -> '_ShardLocks':
+        await super().__aenter__()
+        for shard in self._shards:
+            await self.enter_async_context(shard._exclusive())
+        return self
+
+
+async def load_records(file_path: str) -> Dict[str, Any]:
+    """Все записи файла данных в любой раскладке: один файл (со снимком и журналом) или шарды"""
+    shards = read_shard_count(file_path)
+    if shards is None:
+        return dict(await JsonStorage(file_path, interprocess=False).load())
+    data: Dict[str, Any] = {}
+    for i in range(shards):
+        data.update(await JsonStorage(os.path.join(shard_dir(file_path), f'{i:02d}.json'), interprocess=False).load())
+    return data
+
+
+def _write_file(path: str, data: Dict[str, Any]) -> None:
+    """Запись снимка в формате JsonStorage; ошибка прерывает перераскладку до удаления старых файлов"""
+    JsonStorage(path, wal_enabled=False, interprocess=False)._dump_snapshot(data)
+
+
+async def reshard(file_path: str, shards: int) -> int:
+    """Офлайн-перераскладка файла данных на заданное число шардов (1 — обратно в один файл).
+
+    Запускается при остановленном боте: новая раскладка пишется рядом и подменяет старую.
+    """
+    data = await load_records(file_path)
+    directory = shard_dir(file_path)
+    tmp_directory = directory + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    if shards > 1:
+        os.makedirs(tmp_directory)
+        parts: List[Dict[str, Any]] = [{} for _ in range(shards)]
+        for key, value in data.items():
+            parts[key_shard(key, shards)][key] = value
+        for i, part in enumerate(parts):
+            _write_file(os.path.join(tmp_directory, f'{i:02d}.json'), part)
+        atomic_write(os.path.join(tmp_directory, 'meta.json'), json.dumps({'shards': shards}).encode('utf-8'))
+    else:
+        _write_file(file_path + '.tmp', data)
+    # Старая раскладка удаляется только после того, как новая полностью записана
+    shutil.rmtree(directory, ignore_errors=True)
+    for suffix in ('', '.wal', '.lock', INDEX_SUFFIX):
+        if os.path.exists(file_path + suffix):
+            os.remove(file_path + suffix)
+    if shards > 1:
+        os.rename(tmp_directory, directory)
+    else:
+        # Переименование сохраняет inode и mtime снимка, поэтому индекс смещений остаётся верным
+        os.rename(file_path + '.tmp' + INDEX_SUFFIX, file_path + INDEX_SUFFIX)
+        os.rename(file_path + '.tmp', file_path)
+    logger.info(f"{file_path}: {len(data)} записей разложено на {shards} шардов")
+    return len(data)
+
+
+if __name__ == '__main__':
+    # Запуск из каталога src при остановленном боте: python -m storage.sharding 16
+    import sys
+    from config import (
+        USERS_JSON, REQUESTS_JSON, SERVICE_CENTERS_JSON, DELIVERY_TASKS_JSON, OUTBOX_JSON, SENT_MESSAGES_JSON
+    )
+    logging.basicConfig(level=logging.INFO)
+
+    async def main(shards: int) -> None:
+        for path in (USERS_JSON, REQUESTS_JSON, SERVICE_CENTERS_JSON, DELIVERY_TASKS_JSON, OUTBOX_JSON,
+                     SENT_MESSAGES_JSON):
+            await reshard(path, shards)
+
+    asyncio.run(main(int(sys.argv[1])))
+    print("Укажите в config.STORAGE_SHARDS новое число шардов")
@@ -0,0 +1,125 @@
+from collections.abc import Mapping, ItemsView, ValuesView
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple
+
+# Записей в одной корзине: изменение копирует только корзины, в которых лежат изменённые ключи
+BUCKET_SIZE = 256
+
+
+class Snapshot(Mapping):
+    """Неизменяемая версия данных хранилища со структурным разделением.
+
+    Записи лежат в корзинах по BUCKET_SIZE в порядке добавления. Новая версия копирует только
+    затронутые корзины и кортеж ссылок на них, остальные корзины общие со старыми версиями.
+    Читатель, получивший версию, видит её целиком, сколько бы записей ни прошло за время его
+    await: ни половины изменения, ни «dictionary changed size during iteration».
+
+    Карта ключ -> номер корзины общая у всех версий одной линии и только дополняется: ключ
+    никогда не переезжает в другую корзину, поэтому старая версия по ней находит свою копию
+    корзины, а ключей, добавленных позже, в ней просто нет. Удалённые ключи остаются в карте,
+    поэтому, когда их становится больше, чем живых, следующая версия начинает новую линию
+    с собственной картой и плотными корзинами (старые версии продолжают пользоваться старой).
+    """
+
+    __slots__ = ('version', '_buckets', '_index', '_size')
+
+    def __init__(self, buckets: Tuple[Dict[str, Any], ...] = (), index: Optional[Dict[str, int]] = None,
+                 size: int = 0, version: int = 0):
+        self.version = version
+        self._buckets = buckets
+        self._index = {} if index is None else index
+        self._size = size
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'Snapshot':
+        """Первая версия из загруженных данных"""
+        if isinstance(data, Snapshot):
+            return data
+        return cls._pack(data.items())
+
+    @classmethod
+    def _pack(cls, items: Iterable[Tuple[str, Any]], version: int = 0) -> 'Snapshot':
+        """Версия новой линии: записи по порядку в плотные корзины"""
+        buckets = []
+        index = {}
+        for key, value in items:
+            if not buckets or len(buckets[-1]) >= BUCKET_SIZE:
+                buckets.append({})
+            buckets[-1][key] = value
+            index[key] = len(buckets) - 1
+        return cls(tuple(buckets), index, len(index), version)
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> 'Snapshot':
+        """Новая версия с применёнными изменениями (None — удаление); текущая не меняется"""
+        buckets = list(self._buckets)
+        copied = set()
+        size = self._size
+        for key, value in changes.items():
+            number = self._index.get(key)
+            if number is None:
+                if value is None:
+                    continue
+                # Новый ключ — в последнюю корзину, а если она заполнена, в новую
+                if not buckets or len(buckets[-1]) >= BUCKET_SIZE:
+                    buckets.append({})
+                    copied.add(len(buckets) - 1)
+                number = len(buckets) - 1
+                self._index[key] = number
+            if number not in copied:
+                buckets[number] = dict(buckets[number])
+                copied.add(number)
+            bucket = buckets[number]
+            if value is None:
+                if bucket.pop(key, None) is not None:
+                    size -= 1
+            else:
+                if key not in bucket:
+                    size += 1
+                bucket[key] = value
+        if len(self._index) > 2 * size + BUCKET_SIZE:
+            # Удалённых ключей в общей карте больше, чем живых: перестройка за O(n) окупается
+            # не меньше чем n удалениями, так что карта и корзины не растут без предела
+            return Snapshot._pack((item for bucket in buckets for item in bucket.items()), self.version + 1)
+        return Snapshot(tuple(buckets), self._index, size, self.version + 1)
+
+    def __getitem__(self, key: str) -> Any:
+        number = self._index.get(key)
+        if number is None or number >= len(self._buckets):
+            raise KeyError(key)
+        return self._buckets[number][key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        number = self._index.get(key)
+        if number is None or number >= len(self._buckets):
+            return default
+        return self._buckets[number].get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        for bucket in self._buckets:
+            yield from bucket
+
+    def __len__(self) -> int:
+        return self._size
+
+    def items(self) -> ItemsView:
+        return _SnapshotItems(self)
+
+    def values(self) -> ValuesView:
+        return _SnapshotValues(self)
+
+
+_MISSING = object()
+
+
+class _SnapshotItems(ItemsView):
+    def __iter__(self):
+        for bucket in self._mapping._buckets:
+            yield from bucket.items()
+
+
+class _SnapshotValues(ValuesView):
+    def __iter__(self):
+        for bucket in self._mapping._buckets:
+            yield from bucket.values()
@@ -0,0 +1,250 @@
+import asyncio
+import sqlite3
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, List, Callable
+
+from config import SQLITE_DB_PATH, STORAGE_CODEC, STORAGE_MULTIPROCESS
+from storage.codecs import get_codec
+from storage.json_storage import StorageError, ConflictError, VERSION_FIELD, record_version
+from storage.sharding import load_records, read_shard_count
+from storage.wal import Changes
+
+logger = logging.getLogger(__name__)
+
+# Поля записей, по которым фильтруют сервисы; в таблице это отдельные индексированные колонки
+INDEXED_FIELDS = ('user_id', 'status', 'assigned_to', 'assigned_sc', 'role')
+
+
+class SqliteStorage:
+    """Хранилище в SQLite с тем же интерфейсом, что у JsonStorage: одна таблица на файл данных"""
+
+    _instances = {}  # Экземпляры по пути к исходному JSON-файлу
+    _connections: Dict[str, sqlite3.Connection] = {}
+    _executors: Dict[str, ThreadPoolExecutor] = {}
+
+    @classmethod
+    def get_instance(cls, file_path: str, db_path: str = SQLITE_DB_PATH) -> 'SqliteStorage':
+        """Получение единственного экземпляра хранилища для каждого файла"""
+        if file_path not in cls._instances:
+            cls._instances[file_path] = cls(file_path, db_path)
+        return cls._instances[file_path]
+
+    def __init__(self, file_path: str, db_path: str = SQLITE_DB_PATH):
+        self.file_path = file_path
+        self.db_path = db_path
+        # requests.json -> таблица requests
+        self.table = os.path.splitext(os.path.basename(file_path))[0]
+        self.codec = get_codec(STORAGE_CODEC)
+        self._schema_ready = False
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._data_version: Optional[int] = None  # PRAGMA data_version при последней проверке
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    @classmethod
+    def _executor(cls, db_path: str) -> ThreadPoolExecutor:
+        """Один поток на базу: соединение живёт в нём и не блокирует цикл событий"""
+        if db_path not in cls._executors:
+            cls._executors[db_path] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        return cls._executors[db_path]
+
+    @classmethod
+    def _connection(cls, db_path: str) -> sqlite3.Connection:
+        """Соединение с базой (вызывается только из потока базы)"""
+        if db_path not in cls._connections:
+            connection = sqlite3.connect(db_path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            cls._connections[db_path] = connection
+        return cls._connections[db_path]
+
+    async def _run(self, func, *args):
+        """Выполнение функции с соединением в потоке базы"""
+        if not self._schema_ready:
+            await asyncio.get_running_loop().run_in_executor(self._executor(self.db_path), self._create_schema)
+            self._schema_ready = True
+        return await asyncio.get_running_loop().run_in_executor(self._executor(self.db_path), func, *args)
+
+    def _create_schema(self) -> None:
+        connection = self._connection(self.db_path)
+        columns = ', '.join(f'{name} TEXT' for name in INDEXED_FIELDS)
+        with connection:
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, data TEXT NOT NULL, {columns})'
+            )
+            for name in INDEXED_FIELDS:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_{name} ON {self.table} ({name})')
+
+    def _row(self, key: str, value: Dict[str, Any]) -> tuple:
+        """Строка таблицы: ключ, JSON записи и значения индексированных полей"""
+        indexed = tuple(None if value.get(name) is None else str(value[name]) for name in INDEXED_FIELDS)
+        return (key, self.codec.dumps(value)) + indexed
+
+    def _write_changes(self, changes: Changes, expected: Dict[str, int]) -> None:
+        """Проверка версий, вставка/замена и удаление строк одной транзакцией SQLite"""
+        placeholders = ', '.join('?' * (2 + len(INDEXED_FIELDS)))
+        connection = self._connection(self.db_path)
+        with connection:
+            # IMMEDIATE сразу берёт блокировку записи: между проверкой версий и записью никто не вклинится
+            connection.execute('BEGIN IMMEDIATE')
+            current = {key: self._select_one(key) for key in changes}
+            for key, version in expected.items():
+                if record_version(current[key]) != version:
+                    raise ConflictError(f"Запись {key} в {self.table} изменилась")
+            rows = [
+                self._row(key, {**value, VERSION_FIELD: record_version(current[key]) + 1})
+                for key, value in changes.items() if value is not None
+            ]
+            deleted = [(key,) for key, value in changes.items() if value is None]
+            connection.executemany(f'INSERT OR REPLACE INTO {self.table} VALUES ({placeholders})', rows)
+            connection.executemany(f'DELETE FROM {self.table} WHERE key = ?', deleted)
+
+    def _select_one(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connection(self.db_path).execute(
+            f'SELECT data FROM {self.table} WHERE key = ?', (key,)
+        ).fetchone()
+        return self.codec.loads(row[0]) if row else None
+
+    def _select(self, where: str = '', params: tuple = ()) -> Dict[str, Dict[str, Any]]:
+        rows = self._connection(self.db_path).execute(
+            f'SELECT key, data FROM {self.table} {where}', params
+        ).fetchall()
+        return {key: self.codec.loads(data) for key, data in rows}
+
+    def _replace_all(self, rows: List[tuple]) -> None:
+        placeholders = ', '.join('?' * (2 + len(INDEXED_FIELDS)))
+        connection = self._connection(self.db_path)
+        with connection:
+            connection.execute(f'DELETE FROM {self.table}')
+            connection.executemany(f'INSERT INTO {self.table} VALUES ({placeholders})', rows)
+
+    def subscribe(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Подписка на изменения: listener(key) при записи, listener(None) при полной замене"""
+        self._listeners.append(listener)
+
+    def _notify(self, key: Optional[str]) -> None:
+        for listener in self._listeners:
+            listener(key)
+
+    async def load(self) -> Dict[str, Any]:
+        """Загрузка всех записей (для административных списков)"""
+        return await self._run(self._select)
+
+    async def save(self, data: Dict[str, Any]) -> None:
+        """Полная замена содержимого таблицы"""
+        try:
+            await self._run(self._replace_all, [self._row(key, value) for key, value in data.items()])
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении данных в {self.db_path}:{self.table}: {e}")
+            raise StorageError(f"Не удалось сохранить данные в {self.db_path}:{self.table}") from e
+        self._notify(None)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Получение элемента по ключу без загрузки всей таблицы"""
+        return await self._run(self._select_one, key)
+
+    def _select_data_version(self) -> int:
+        return self._connection(self.db_path).execute('PRAGMA data_version').fetchone()[0]
+
+    async def refresh(self) -> None:
+        """Сброс кэшей подписчиков, если базу изменил другой процесс (data_version растёт только от чужих записей)"""
+        if not STORAGE_MULTIPROCESS:
+            return
+        version = await self._run(self._select_data_version)
+        if self._data_version is not None and version != self._data_version:
+            self._notify(None)
+        self._data_version = version
+
+    def _exclusive(self):
+        """Отдельная блокировка не нужна: SQLite сам блокирует базу на время транзакции записи"""
+        return nullcontext()
+
+    async def _ensure_loaded(self) -> None:
+        """Данные не держатся в памяти, загружать нечего"""
+
+    def _versions_match(self, expected: Dict[str, int]) -> bool:
+        """Версии проверяются в транзакции SQLite при записи"""
+        return True
+
+    def _apply(self, changes: Changes) -> None:
+        """Кэша в памяти нет: изменения применяются в базе при фиксации"""
+
+    async def _commit(self, changes: Changes, expected: Optional[Dict[str, int]] = None) -> None:
+        """Запись пачки изменений одной транзакцией SQLite; при несовпадении версий — ConflictError"""
+        try:
+            await self._run(self._write_changes, changes, expected or {})
+        except ConflictError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при записи в {self.db_path}:{self.table}: {e}")
+            raise StorageError(f"Не удалось записать изменения в {self.db_path}:{self.table}") from e
+        for key in changes:
+            self._notify(key)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Установка значения по ключу"""
+        await self._commit({key: value})
+
+    async def compare_and_set(self, key: str, expected_version: int, value: Dict[str, Any]) -> bool:
+        """Запись, только если версия записи не изменилась с момента чтения"""
+        try:
+            await self._commit({key: value}, {key: expected_version})
+        except ConflictError:
+            return False
+        return True
+
+    async def delete(self, key: str) -> None:
+        """Удаление элемента по ключу"""
+        await self._commit({key: None})
+
+    def ensure_index(self, field: str) -> None:
+        """Индексы в SQLite заданы схемой таблицы"""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Поле {field} не индексируется")
+
+    async def find(self, field: str, value: Any) -> Dict[str, Dict[str, Any]]:
+        """Выборка записей по индексированному полю"""
+        self.ensure_index(field)
+        return await self._run(self._select, f'WHERE {field} = ?', (str(value),))
+
+    async def flush(self) -> None:
+        """Изменения фиксируются сразу, отложенных записей нет"""
+
+    async def clear_cache(self) -> None:
+        """Кэша нет: каждое чтение идёт в базу"""
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """Закрытие соединений при остановке бота"""
+        for db_path, executor in list(cls._executors.items()):
+            connection = cls._connections.pop(db_path, None)
+            if connection:
+                await asyncio.get_running_loop().run_in_executor(executor, connection.close)
+            executor.shutdown(wait=True)
+        cls._executors.clear()
+
+
+async def migrate_json_to_sqlite(file_paths: List[str], db_path: str = SQLITE_DB_PATH) -> Dict[str, int]:
+    """Однократный перенос данных из JSON-файлов (со снимком и журналом, в том числе шардов) в SQLite"""
+    migrated = {}
+    for file_path in file_paths:
+        if not os.path.exists(file_path) and read_shard_count(file_path) is None:
+            continue
+        data = await load_records(file_path)
+        await SqliteStorage(file_path, db_path).save(data)
+        migrated[file_path] = len(data)
+        logger.info(f"Перенесено {len(data)} записей из {file_path} в {db_path}")
+    return migrated
+
+
+if __name__ == '__main__':
+    # Запуск из каталога src: python -m storage.sqlite_storage
+    from config import (
+        USERS_JSON, REQUESTS_JSON, SERVICE_CENTERS_JSON, DELIVERY_TASKS_JSON, OUTBOX_JSON, SENT_MESSAGES_JSON
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate_json_to_sqlite([
+        USERS_JSON, REQUESTS_JSON, SERVICE_CENTERS_JSON, DELIVERY_TASKS_JSON, OUTBOX_JSON, SENT_MESSAGES_JSON
+    ]))
@@ -0,0 +1,132 @@
+import re
+from typing import List, Optional, Tuple, Dict
+
+# Стеммер Портера для русского языка (алгоритм Snowball): отсекает окончания и суффиксы,
+# чтобы «экрана», «экраном» и «экраны» искались как одно слово
+
+_VOWELS = frozenset('аеиоуыэюя')
+
+# Окончания группы 1 допустимы только после «а» или «я»
+_PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+_ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому',
+    'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'
+))
+_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+_REFLEXIVE = ((), ('ся', 'сь'))
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло',
+     'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю')
+)
+_NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям',
+    'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'
+))
+_SUPERLATIVE = ((), ('ейше', 'ейш'))
+_DERIVATIONAL = ((), ('ость', 'ост'))
+
+# Часто встречающиеся слова, которые ничего не дают поиску
+STOP_WORDS = frozenset((
+    'и', 'в', 'во', 'не', 'на', 'с', 'со', 'по', 'к', 'ко', 'у', 'о', 'об', 'от', 'до', 'за', 'из', 'а', 'но', 'же',
+    'что', 'как', 'это', 'для', 'при', 'то', 'ли', 'бы', 'так', 'уже', 'или', 'мне', 'мой', 'моя', 'мое', 'его', 'ее',
+))
+
+_WORD = re.compile(r'[0-9a-zа-я]+')
+
+_stems: Dict[str, str] = {}  # Кэш основ: словарь заявок невелик, а слова в нём повторяются постоянно
+
+
+def _by_length(groups: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> List[Tuple[str, bool]]:
+    """Окончания от длинных к коротким с признаком «только после а/я»"""
+    endings = [(ending, True) for ending in groups[0]] + [(ending, False) for ending in groups[1]]
+    return sorted(endings, key=lambda item: -len(item[0]))
+
+
+_PERFECTIVE_GERUND, _ADJECTIVE, _PARTICIPLE, _REFLEXIVE, _VERB, _NOUN, _SUPERLATIVE, _DERIVATIONAL = map(
+    _by_length, (_PERFECTIVE_GERUND, _ADJECTIVE, _PARTICIPLE, _REFLEXIVE, _VERB, _NOUN, _SUPERLATIVE, _DERIVATIONAL)
+)
+
+
+def _strip(word: str, region: int, endings: List[Tuple[str, bool]]) -> Optional[str]:
+    """Слово без самого длинного окончания из списка, лежащего в области region; None — не найдено.
+
+    Как в Snowball, выбирается самое длинное совпадение; если его условие не выполнено,
+    более короткие окончания не пробуются.
+    """
+    for ending, after_a in endings:
+        if word.endswith(ending):
+            start = len(word) - len(ending)
+            if start < region:
+                return None
+            if after_a and not (start > region and word[start - 1] in 'ая'):
+                return None
+            return word[:start]
+    return None
+
+
+def _regions(word: str) -> Tuple[int, int]:
+    """Начала областей RV и R2 алгоритма"""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in _VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def stem(word: str) -> str:
+    """Основа слова в нижнем регистре"""
+    cached = _stems.get(word)
+    if cached is not None:
+        return cached
+    rv, r2 = _regions(word)
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное/причастие, глагол или существительное
+    result = _strip(word, rv, _PERFECTIVE_GERUND)
+    if result is None:
+        result = _strip(word, rv, _REFLEXIVE) or word
+        adjective = _strip(result, rv, _ADJECTIVE)
+        if adjective is not None:
+            result = _strip(adjective, rv, _PARTICIPLE) or adjective
+        else:
+            verb = _strip(result, rv, _VERB)
+            if verb is None:
+                verb = _strip(result, rv, _NOUN)
+            if verb is not None:
+                result = verb
+    # Шаг 2: конечная «и»
+    if result.endswith('и') and len(result) - 1 >= rv:
+        result = result[:-1]
+    # Шаг 3: словообразовательный суффикс в R2
+    derivational = _strip(result, r2, _DERIVATIONAL)
+    if derivational is not None:
+        result = derivational
+    # Шаг 4: двойная «н», превосходная степень или мягкий знак
+    superlative = _strip(result, rv, _SUPERLATIVE)
+    if superlative is not None:
+        result = superlative
+    if result.endswith('нн') and len(result) - 2 >= rv:
+        result = result[:-1]
+    elif superlative is None and result.endswith('ь') and len(result) - 1 >= rv:
+        result = result[:-1]
+    if len(_stems) < 200000:
+        _stems[word] = result
+    return result
+
+
+def words(text: str) -> List[str]:
+    """Слова текста в нижнем регистре («ё» приравнена к «е»)"""
+    return _WORD.findall(text.lower().replace('ё', 'е'))
+
+
+def tokenize(text: str) -> List[str]:
+    """Основы значимых слов текста для полнотекстового индекса"""
+    return [stem(word) for word in words(text) if word not in STOP_WORDS]
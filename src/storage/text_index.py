@@ -0,0 +1,142 @@
+import asyncio
+import bisect
+import heapq
+import math
+import sys
+from typing import Dict, Any, Optional, Callable, Iterable, List, Set, Tuple
+
+from storage.derived_index import DerivedIndex
+from storage.stemmer import tokenize, words, stem, STOP_WORDS
+
+# Параметры ранжирования BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_EXPANSION = 50  # Сколько основ подставлять вместо недописанного последнего слова запроса
+
+
+class TextIndex(DerivedIndex):
+    """Полнотекстовый (инвертированный) индекс записей хранилища: основа слова -> ключи записей.
+
+    Тексты записи берёт функция fields. Полное построение идёт в отдельном потоке
+    по неизменяемой версии хранилища.
+    """
+
+    @classmethod
+    def get_instance(cls, storage, fields: Callable[[Dict[str, Any]], Iterable[Optional[str]]]) -> 'TextIndex':
+        """Получение единственного индекса для каждого хранилища"""
+        return super().get_instance(storage, fields)
+
+    def __init__(self, storage, fields: Callable[[Dict[str, Any]], Iterable[Optional[str]]]):
+        super().__init__(storage)
+        self.fields = fields
+        self._postings: Dict[str, Dict[str, int]] = {}  # Основа -> ключи записей с числом её вхождений
+        # Ключ записи -> число слов и различные основы (чтобы убрать запись из индекса при изменении)
+        self._docs: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._total_length = 0
+        self._terms: List[str] = []  # Основы по алфавиту для поиска по началу слова
+        self._terms_dirty = False
+
+    def _index(self, postings: Dict[str, Dict[str, int]], key: str, data: Dict[str, Any]) -> Tuple[int, Tuple[str, ...]]:
+        """Добавление записи в postings; возвращает её описание для _docs"""
+        terms = [term for text in self.fields(data) if text for term in tokenize(text)]
+        unique = []
+        for term in terms:
+            keys = postings.get(term)
+            if keys is None:
+                term = sys.intern(term)
+                keys = postings[term] = {}
+            if key not in keys:
+                unique.append(term)
+            keys[key] = keys.get(key, 0) + 1
+        return len(terms), tuple(unique)
+
+    def _build(self, data) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Tuple[int, Tuple[str, ...]]], int]:
+        """Построение индекса по неизменяемой версии данных (выполняется в отдельном потоке)"""
+        postings: Dict[str, Dict[str, int]] = {}
+        docs = {key: self._index(postings, key, value) for key, value in data.items()}
+        return postings, docs, sum(length for length, _ in docs.values())
+
+    def _update(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        """Переиндексация одной записи; None — запись удалена"""
+        old = self._docs.pop(key, None)
+        if old is not None:
+            self._total_length -= old[0]
+            for term in old[1]:
+                keys = self._postings[term]
+                del keys[key]
+                if not keys:
+                    del self._postings[term]
+                    self._terms_dirty = True
+        if data is not None:
+            terms_before = len(self._postings)
+            self._docs[key] = self._index(self._postings, key, data)
+            self._total_length += self._docs[key][0]
+            if len(self._postings) != terms_before:
+                self._terms_dirty = True
+
+    async def _rebuild(self, data) -> None:
+        self._postings, self._docs, self._total_length = await asyncio.to_thread(self._build, data)
+        self._terms_dirty = True
+
+    def _synced(self) -> None:
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+
+    def _expand(self, prefix: str) -> Set[str]:
+        """Основы, начинающиеся с prefix (не больше PREFIX_EXPANSION)"""
+        start = bisect.bisect_left(self._terms, prefix)
+        result = set()
+        for term in self._terms[start:start + PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            result.add(term)
+        return result
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[str], int]:
+        """Ключи записей, содержащих все слова запроса, по убыванию релевантности (BM25); и их число.
+
+        Последнее слово запроса может быть недописанным: оно совпадает с основами, которые с него начинаются.
+        """
+        await self.sync()
+        query_words = [word for word in words(query) if word not in STOP_WORDS]
+        if not query_words or not self._docs:
+            return [], 0
+        # Для каждого слова запроса — основы, которые ему подходят, и их списки записей
+        alternatives = [{stem(word)} for word in query_words]
+        alternatives[-1] |= self._expand(query_words[-1])
+        postings = []
+        for terms in alternatives:
+            groups = [self._postings[term] for term in terms if term in self._postings]
+            if not groups:
+                return [], 0
+            if len(groups) > 1:
+                # Несколько основ одного слова складываются в один список с суммарной частотой
+                merged: Dict[str, int] = {}
+                for group in groups:
+                    for key, frequency in group.items():
+                        merged[key] = merged.get(key, 0) + frequency
+                groups = [merged]
+            postings.append(groups[0])
+        # Пересечение начинается с самого редкого слова: его размер ограничивает всю работу
+        postings.sort(key=len)
+        matches = postings[0].keys()
+        for group in postings[1:]:
+            matches = [key for key in matches if key in group]
+            if not matches:
+                return [], 0
+        count = len(self._docs)
+        average = self._total_length / count or 1
+        weights = [(group, math.log(1 + (count - len(group) + 0.5) / (len(group) + 0.5))) for group in postings]
+        docs = self._docs
+
+        def score(key: str) -> float:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[key][0] / average)
+            total = 0.0
+            for group, idf in weights:
+                frequency = group[key]
+                total += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            return total
+
+        ranked = heapq.nlargest(offset + limit, matches, key=lambda key: (score(key), len(key), key))
+        return ranked[offset:], len(matches)
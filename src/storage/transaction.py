@@ -0,0 +1,147 @@
+import json
+import asyncio
+import os
+import uuid
+import logging
+from contextlib import AsyncExitStack
+from typing import Dict, Any, Optional, List
+
+from config import TRANSACTIONS_DIR
+from storage.factory import get_storage
+from storage.files import atomic_write
+from storage.json_storage import ConflictError
+from storage.sqlite_storage import SqliteStorage
+from storage.wal import Changes
+
+logger = logging.getLogger(__name__)
+
+
+class Transaction:
+    """Транзакция над несколькими хранилищами.
+
+    Изменения копятся до фиксации. При фиксации проверяются ожидаемые версии записей и все
+    изменения применяются к кэшам без await между хранилищами: читатели не видят половины
+    транзакции, а из конкурирующих условных транзакций проходит одна. Затем пишется журнал
+    намерений и каждое хранилище сохраняется одной записью на файл; журнал удаляется, только
+    когда записали все хранилища. Если запись не удалась или процесс упал раньше, журнал
+    остаётся и recover_transactions() доиграет его.
+    """
+
+    def __init__(self, journal_dir: str = TRANSACTIONS_DIR):
+        self.journal_dir = journal_dir
+        self._changes: Dict[Any, Changes] = {}  # Хранилище -> изменения в нём
+        self._expected: Dict[Any, Dict[str, int]] = {}  # Хранилище -> ожидаемые версии записей
+
+    def set(self, storage, key: str, value: Dict[str, Any], expected_version: Optional[int] = None) -> None:
+        """Запись значения в рамках транзакции; с expected_version — только если запись не менялась"""
+        self._changes.setdefault(storage, {})[key] = value
+        if expected_version is not None:
+            self._expected.setdefault(storage, {})[key] = expected_version
+
+    def delete(self, storage, key: str, expected_version: Optional[int] = None) -> None:
+        """Удаление записи в рамках транзакции; с expected_version — только если запись не менялась"""
+        self._changes.setdefault(storage, {})[key] = None
+        if expected_version is not None:
+            self._expected.setdefault(storage, {})[key] = expected_version
+
+    async def get(self, storage, key: str) -> Optional[Dict[str, Any]]:
+        """Чтение с учётом ещё не зафиксированных изменений транзакции"""
+        changes = self._changes.get(storage, {})
+        if key in changes:
+            return changes[key]
+        return await storage.get(key)
+
+    async def commit(self) -> None:
+        """Фиксация всех изменений; при изменённой с момента чтения записи — ConflictError"""
+        if not self._changes:
+            return
+        # Один порядок взятия блокировок во всех процессах исключает взаимную блокировку
+        storages = sorted(self._changes, key=lambda storage: storage.file_path)
+        for storage in storages:
+            await storage._ensure_loaded()
+        async with AsyncExitStack() as stack:
+            # Если пишут несколько процессов, блокировки держатся от проверки версий до записи
+            locked = [storage for storage in storages if await stack.enter_async_context(storage._exclusive())]
+            for storage in storages:
+                await storage.refresh()
+            # Проверка версий и применение без await: проигравшие получают отказ без блокировок и записи
+            for storage in storages:
+                if not storage._versions_match(self._expected.get(storage, {})):
+                    self.rollback()
+                    raise ConflictError(f"Записи в {storage.file_path} изменились")
+            for storage in storages:
+                storage._apply(self._changes[storage])
+            journal_path = os.path.join(self.journal_dir, f"{uuid.uuid4()}.json")
+            await asyncio.to_thread(self._write_journal, journal_path)
+            try:
+                # Условные записи фиксируются первыми: SQLite перепроверяет версии в своей транзакции.
+                # Под блокировкой процесса пишем в этой же задаче: повторный вход доступен только владельцу
+                sequential = [storage for storage in storages if storage in self._expected or storage in locked]
+                for storage in sequential:
+                    if isinstance(storage, SqliteStorage):
+                        await storage._commit(self._changes[storage], self._expected.get(storage))
+                    else:
+                        # Версии JSON-хранилищ уже сверены по кэшу до применения
+                        await storage._commit(self._changes[storage])
+                results = await asyncio.gather(*(
+                    storage._commit(self._changes[storage]) for storage in storages if storage not in sequential
+                ), return_exceptions=True)
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+            except BaseException:
+                # Часть хранилищ могла записать изменения: журнал остаётся, recover_transactions() доиграет его
+                logger.error(f"Транзакция записана не полностью, журнал сохранён: {journal_path}")
+                raise
+            finally:
+                self.rollback()
+            await asyncio.to_thread(os.remove, journal_path)
+
+    def rollback(self) -> None:
+        """Отмена накопленных изменений"""
+        self._changes = {}
+        self._expected = {}
+
+    def _write_journal(self, journal_path: str) -> None:
+        os.makedirs(self.journal_dir, exist_ok=True)
+        journal = {storage.file_path: changes for storage, changes in self._changes.items()}
+        atomic_write(journal_path, json.dumps(journal, ensure_ascii=False).encode('utf-8'))
+
+    async def __aenter__(self) -> 'Transaction':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.commit()
+        else:
+            self.rollback()
+
+
+async def recover_transactions(journal_dir: str = TRANSACTIONS_DIR) -> int:
+    """Доигрывание транзакций, журнал которых остался после сбоя (вызывается при старте)"""
+    if not os.path.isdir(journal_dir):
+        return 0
+    paths: List[str] = sorted(
+        (os.path.join(journal_dir, name) for name in os.listdir(journal_dir) if name.endswith('.json')),
+        key=os.path.getmtime
+    )
+    for path in paths:
+        with open(path, 'rb') as file:
+            content = file.read()
+        try:
+            journal = json.loads(content)
+        except ValueError:
+            # Журнал не дописан — транзакция не успела примениться ни к одному хранилищу
+            logger.warning(f"Пропущен неполный журнал транзакции {path}")
+            os.remove(path)
+            continue
+        for file_path, changes in journal.items():
+            storage = get_storage(file_path)
+            await storage._ensure_loaded()
+            async with storage._exclusive():
+                await storage.refresh()
+                storage._apply(changes)
+                await storage._commit(changes)
+        os.remove(path)
+        logger.info(f"Восстановлена транзакция из {path}")
+    return len(paths)
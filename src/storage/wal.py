@@ -0,0 +1,87 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import aiofiles
+
+from storage.codecs import JsonCodec
+
+logger = logging.getLogger(__name__)
+
+# Изменения пачки: ключ -> новое значение или None для удаления
+Changes = Dict[str, Optional[Dict[str, Any]]]
+
+
+class WriteAheadLog:
+    """Журнал изменений хранилища: каждая мутация дописывается одной компактной строкой"""
+
+    def __init__(self, path: str, codec=None):
+        self.path = path
+        self.codec = codec or JsonCodec()
+
+    def size(self) -> int:
+        """Текущий размер журнала в байтах"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def encode(self, changes: Changes) -> bytes:
+        """Сериализация пачки изменений в строки журнала"""
+        lines = []
+        for key, value in changes.items():
+            record = {'k': key, 'd': 1} if value is None else {'k': key, 'v': value}
+            lines.append(self.codec.dumps(record) + b'\n')
+        return b''.join(lines)
+
+    async def append(self, changes: Changes) -> None:
+        """Дописывание пачки изменений в конец журнала одной записью"""
+        async with aiofiles.open(self.path, 'ab') as file:
+            await file.write(self.encode(changes))
+            await file.flush()
+            # Вызывающие ждут записи, поэтому она должна пережить сбой питания
+            await asyncio.to_thread(os.fsync, file.fileno())
+
+    @staticmethod
+    def apply(data: Dict[str, Any], changes: Changes) -> None:
+        """Применение пачки изменений к словарю данных"""
+        for key, value in changes.items():
+            if value is None:
+                data.pop(key, None)
+            else:
+                data[key] = value
+
+    async def read_since(self, offset: int) -> Tuple[Changes, int]:
+        """Изменения, дописанные после смещения offset (другими процессами), и новое смещение"""
+        if not os.path.exists(self.path):
+            return {}, 0
+        async with aiofiles.open(self.path, 'rb') as file:
+            await file.seek(offset)
+            content = await file.read()
+        return self._decode(content), offset + len(content)
+
+    def _decode(self, content: bytes) -> Changes:
+        """Разбор строк журнала в пачку изменений (последнее изменение ключа побеждает)"""
+        changes: Changes = {}
+        for line_no, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = self.codec.loads(line)
+            except ValueError:
+                # Оборванная последняя запись после сбоя — всё, что до неё, уже применено
+                logger.warning(f"Пропущена повреждённая запись {line_no} в журнале {self.path}")
+                continue
+            key = record['k']
+            if key in changes and changes[key] is None:
+                # Запись создана заново после удаления — в порядке ключей она идёт в конец
+                del changes[key]
+            changes[key] = None if record.get('d') else record['v']
+        return changes
+
+    async def truncate(self) -> None:
+        """Очистка журнала после записи нового снимка"""
+        if os.path.exists(self.path):
+            async with aiofiles.open(self.path, 'wb') as file:
+                await file.write(b'')
@@ -4,12 +4,13 @@ from datetime import datetime
 import logging
 from typing import List, Optional
 from telegram import Bot, Update, Message
+from models import Photo
 
 logger = logging.getLogger(__name__)
 
 
-async def save_photo(message: Message, photos_dir: str) -> Optional[str]:
-    """Сохраняет фото из сообщения и возвращает путь к файлу"""
+async def save_photo(message: Message, photos_dir: str) -> Optional[Photo]:
+    """Сохраняет фото из сообщения и возвращает путь к файлу вместе с file_id"""
     try:
         # Создаем директорию, если она не существует
         os.makedirs(photos_dir, exist_ok=True)
@@ -19,12 +20,12 @@ async def save_photo(message: Message, photos_dir: str) -> Optional[str]:
         # Генерируем уникальное имя файла
         file_name = f"{uuid.uuid4()}.jpg"
         file_path = os.path.join(photos_dir, file_name)
-        # Скачиваем и сохраняем фото
+        # Скачиваем и сохраняем фото: копия на диске нужна, если file_id перестанет действовать
         # Получаем бот из application вместо message
         bot = message.get_bot()
         file = await bot.get_file(file_id)
         await file.download_to_drive(file_path)
-        return file_path
+        return Photo(path=file_path, file_id=file_id)
     except Exception as e:
         logger.error(f"Ошибка при сохранении фото: {e}")
         return None
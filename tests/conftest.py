@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+# Бот запускается из src/, пакета src при этом нет: импорт через него должен падать и в тестах
+sys.modules['src'] = None
+
+import config  # noqa: E402
+
+# Файлы данных тестов — во временном каталоге; пути подменяются до импорта сервисов,
+# которые берут их из config при импорте
+DATA_DIR = tempfile.mkdtemp(prefix='mkplace-tests-')
+config.DATA_DIR = DATA_DIR
+config.PHOTOS_DIR = os.path.join(DATA_DIR, 'photos')
+for name in ('USERS', 'REQUESTS', 'SERVICE_CENTERS', 'DELIVERY_TASKS', 'SEQUENCES', 'OUTBOX', 'SENT_MESSAGES'):
+    setattr(config, f'{name}_JSON', os.path.join(DATA_DIR, f'{name.lower()}.json'))
+config.TRANSACTIONS_DIR = os.path.join(DATA_DIR, 'transactions')
+config.ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+config.SQLITE_DB_PATH = os.path.join(DATA_DIR, 'mkplace.db')
+
+from services.broadcast import Broadcaster  # noqa: E402
+from services.outbox import Outbox  # noqa: E402
+from storage import JsonStorage, SqliteStorage, ShardedStorage, IdentityMap, SequenceAllocator, ArchiveStorage  # noqa: E402
+from storage.derived_index import DerivedIndex  # noqa: E402
+
+
+def reset_singletons() -> None:
+    """Забыть общие экземпляры хранилищ и сервисов: следующий вызов создаст их заново (как после перезапуска)"""
+    for registry in (JsonStorage, SqliteStorage, ShardedStorage, IdentityMap, SequenceAllocator, ArchiveStorage,
+                     DerivedIndex):
+        registry._instances.clear()
+    Broadcaster._instance = None
+    Outbox._instance = None
+
+
+@pytest.fixture(autouse=True)
+def clean_data():
+    """Каждый тест начинает с пустого каталога данных и новых экземпляров (блокировки asyncio привязаны к циклу)"""
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+    os.makedirs(DATA_DIR)
+    reset_singletons()
+    yield
+    asyncio.run(SqliteStorage.close_all())
+    reset_singletons()
+
+
+class FakeBot:
+    """Bot без сети: отправленные и исправленные сообщения записываются"""
+
+    def __init__(self):
+        self.sent = []  # (chat_id, text, reply_markup)
+        self.edited = []  # (chat_id, message_id, text)
+        self.albums = []  # (chat_id, число фото, загружены ли с диска)
+        self._next_id = 100
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self._next_id += 1
+        self.sent.append((chat_id, text, reply_markup))
+        return SimpleNamespace(message_id=self._next_id, chat_id=chat_id)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, reply_markup=None):
+        self.edited.append((chat_id, message_id, text))
+        return True
+
+    async def send_media_group(self, chat_id, media):
+        uploaded = not isinstance(media[0].media, str)
+        self.albums.append((chat_id, len(media), uploaded))
+        messages = []
+        for _ in media:
+            self._next_id += 1
+            photo = [SimpleNamespace(file_id=f'file-{self._next_id}')]
+            messages.append(SimpleNamespace(message_id=self._next_id, chat_id=chat_id, photo=photo))
+        return messages
+
+
+class FakeMessage:
+    """Сообщение, на которое отвечает обработчик или в котором нажата кнопка"""
+
+    def __init__(self, message_id=1):
+        self.message_id = message_id
+        self.replies = []  # (text, reply_markup)
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append((text, reply_markup))
+
+
+class FakeQuery:
+    """Нажатие inline-кнопки; правки сообщения записываются"""
+
+    def __init__(self, data, user_id, message):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = message
+        self.edits = []  # (text, reply_markup)
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+    async def edit_message_text(self, text, reply_markup=None):
+        self.edits.append((text, reply_markup))
+
+
+def message_update(user_id, bot=None, message=None):
+    """Update с текстовым сообщением пользователя"""
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=None,
+                           message=message or FakeMessage(), get_bot=lambda: bot)
+
+
+def callback_update(data, user_id, bot=None, message=None):
+    """Update с нажатием кнопки в сообщении message"""
+    query = FakeQuery(data, user_id, message or FakeMessage())
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=query,
+                           message=None, get_bot=lambda: bot)
+
+
+def callback_data(reply_markup):
+    """callback_data кнопок клавиатуры по строкам"""
+    return [[button.callback_data for button in row] for row in reply_markup.inline_keyboard]
+
+
+async def drain_outbox(notification_service, bot):
+    """Доставка всех готовых записей очереди уведомлений, как это делает фоновый цикл"""
+    outbox = notification_service.outbox
+    while True:
+        batch = await outbox.due()
+        if not batch:
+            return
+        for key, entry in batch.items():
+            await outbox._process(key, entry, lambda entry: notification_service.deliver(bot, entry))
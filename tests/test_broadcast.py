@@ -0,0 +1,114 @@
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import RetryAfter
+
+from services.broadcast import Broadcaster
+from services.notification_service import NotificationService
+
+pytestmark = pytest.mark.filterwarnings('ignore::telegram.warnings.PTBDeprecationWarning')
+
+TIMER_SLACK = 0.02  # Допуск на точность asyncio.sleep
+
+
+class FloodBot:
+    """Bot, который отвечает RetryAfter на первые запросы в указанные чаты"""
+
+    def __init__(self, floods=None, delay=0.3):
+        self.floods = dict(floods or {})  # Чат -> сколько раз ответить RetryAfter
+        self.delay = delay
+        self.calls = []  # (время, чат, успешно)
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if self.floods.get(chat_id):
+            self.floods[chat_id] -= 1
+            self.calls.append((time.monotonic(), chat_id, False))
+            raise RetryAfter(timedelta(seconds=self.delay))
+        self.calls.append((time.monotonic(), chat_id, True))
+        return SimpleNamespace(message_id=len(self.calls), chat_id=chat_id)
+
+
+def test_retry_after_pauses_chat_and_whole_bot_then_retries():
+    async def scenario():
+        broadcaster = Broadcaster(concurrency=1, global_rate=1000, chat_rate=1000, chat_burst=10)
+        bot = FloodBot({1: 1})
+        results = await NotificationService(broadcaster).broadcast(bot, [1, 2, 3], 'Новости')
+        assert all(results.values())
+        flooded_at = bot.calls[0][0]
+        assert bot.calls[0][1:] == (1, False)
+        # Пауза общая: после RetryAfter ни один чат не получает запрос раньше, чем через retry_after
+        assert sorted(chat_id for _, chat_id, ok in bot.calls if ok) == [1, 2, 3]
+        assert all(at >= flooded_at + bot.delay - TIMER_SLACK for at, _, ok in bot.calls if ok)
+        assert broadcaster.counters['sent'] == 3
+        assert broadcaster.counters['retries'] == 1
+        assert broadcaster.counters['failed'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_retries_are_limited():
+    async def scenario():
+        broadcaster = Broadcaster(concurrency=4, global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=2)
+        bot = FloodBot({1: 10, 2: 0}, delay=0.05)
+        results = await NotificationService(broadcaster).broadcast(bot, [1, 2], 'Новости')
+        assert results[1] is None and results[2] is not None
+        attempts = [at for at, chat_id, _ in bot.calls if chat_id == 1]
+        assert len(attempts) == 3
+        assert all(later - earlier >= bot.delay - TIMER_SLACK for earlier, later in zip(attempts, attempts[1:]))
+        assert broadcaster.counters['retries'] == 2
+        assert broadcaster.counters['failed'] == 1
+        assert 'Flood control' in broadcaster.errors[1]
+
+    asyncio.run(scenario())
+
+
+def test_chat_bucket_paces_messages_after_burst():
+    async def scenario():
+        broadcaster = Broadcaster(concurrency=8, global_rate=1000, chat_rate=20, chat_burst=2)
+        bot = FloodBot()
+        service = NotificationService(broadcaster)
+        started = time.monotonic()
+        await asyncio.gather(*(service.broadcast(bot, [1], f'Сообщение {number}') for number in range(6)))
+        times = sorted(at for at, _, _ in bot.calls)
+        # Два сообщения подряд сразу, дальше не чаще 20 в секунду
+        assert times[1] - started < 0.03
+        assert all(later - earlier >= 1 / 20 - TIMER_SLACK for earlier, later in zip(times[2:], times[3:]))
+        assert times[-1] - started >= (6 - 2) / 20 - TIMER_SLACK
+
+    asyncio.run(scenario())
+
+
+def test_global_bucket_paces_many_chats():
+    async def scenario():
+        broadcaster = Broadcaster(concurrency=8, global_rate=10, chat_rate=1000, chat_burst=10)
+        bot = FloodBot()
+        started = time.monotonic()
+        results = await NotificationService(broadcaster).broadcast(bot, list(range(15)), 'Новости')
+        assert all(results.values())
+        # Общее ведро: 10 подряд, остальные 5 — по одному в 0,1 с
+        assert max(at for at, _, _ in bot.calls) - started >= 5 / 10 - TIMER_SLACK
+
+    asyncio.run(scenario())
+
+
+def test_request_costlier_than_bucket_capacity_waits_for_full_bucket():
+    async def scenario():
+        broadcaster = Broadcaster(concurrency=8, global_rate=4, chat_rate=20, chat_burst=3)
+        bot = FloodBot()
+        started = time.monotonic()
+
+        async def album(chat_id):
+            return await bot.send_message(chat_id, 'Альбом')
+
+        # Альбомы по 10 фото дороже и ведра чата (3), и общего ведра (4)
+        results = await asyncio.wait_for(asyncio.gather(*(broadcaster.send(1, lambda: album(1), cost=10)
+                                                          for _ in range(2))), 5)
+        assert all(results)
+        assert broadcaster.counters['sent'] == 20
+        # Второй альбом ждёт, пока общее ведро наполнится снова: 4 разрешения по 4 в секунду
+        assert max(at for at, _, _ in bot.calls) - started >= 1 - TIMER_SLACK
+
+    asyncio.run(scenario())
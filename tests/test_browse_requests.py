@@ -0,0 +1,68 @@
+import asyncio
+
+from models import OrderStatus
+from services.request import RequestService
+from storage import OrderedIndex
+
+
+async def create_requests(service, count):
+    """Заявки с возрастающим временем создания (по минуте на заявку)"""
+    ids = []
+    for number in range(count):
+        request = await service.create_request(f'{7000 + number % 3}', f'Заявка {number}', [], 'ул. Мира, 1', 'Иван')
+        await service.storage.set(request.id, {**request.to_dict(), 'created_at': f'2026-01-01T10:{number:02d}:00'})
+        ids.append(request.id)
+    return ids
+
+
+def test_browse_pages_over_ordered_index_without_full_pass_per_tap(monkeypatch):
+    async def scenario():
+        service = RequestService()
+        ids = await create_requests(service, 23)
+        newest_first = ids[::-1]
+        rebuilds = []
+        rebuild = OrderedIndex._rebuild
+
+        async def counted(index, data):
+            rebuilds.append(len(data))
+            await rebuild(index, data)
+
+        monkeypatch.setattr(OrderedIndex, '_rebuild', counted)
+
+        pages = []
+        for page in range(5):
+            requests, total = await service.browse_requests(offset=page * 5, limit=5)
+            assert total == 23
+            pages += [request.id for request in requests]
+        assert pages == newest_first
+
+        requests, total = await service.browse_requests(since='2026-01-01T10:20:00', offset=0, limit=5)
+        assert ([request.id for request in requests], total) == (newest_first[:3], 3)
+        requests, total = await service.browse_requests(since='2026-01-01T10:10:00', offset=10, limit=5)
+        assert ([request.id for request in requests], total) == (newest_first[10:13], 13)
+
+        # Изменения видны следующему листанию: новая заявка первой, удалённая пропадает
+        await service.storage.delete(ids[-1])
+        fresh = await service.create_request('7001', 'Свежая', [], 'ул. Мира, 2', 'Пётр')
+        requests, total = await service.browse_requests(offset=0, limit=3)
+        assert ([request.id for request in requests], total) == ([fresh.id] + newest_first[1:3], 23)
+        # Все записи индекс прочитал один раз — при первом листании, дальше только изменения
+        assert rebuilds == [23]
+
+    asyncio.run(scenario())
+
+
+def test_filtered_browse_uses_same_order():
+    async def scenario():
+        service = RequestService()
+        ids = await create_requests(service, 12)
+        for request_id in ids[::2]:
+            await service.update_request(request_id, assigned_sc='1', status=OrderStatus.ASSIGNED_TO_SC)
+        requests, total = await service.browse_requests(sc_id='1', offset=2, limit=2)
+        assert ([request.id for request in requests], total) == (ids[::2][::-1][2:4], 6)
+        requests, total = await service.browse_requests(
+            status=OrderStatus.NEW, since='2026-01-01T10:05:00', offset=0, limit=10
+        )
+        assert ([request.id for request in requests], total) == (ids[5::2][::-1], 4)
+
+    asyncio.run(scenario())
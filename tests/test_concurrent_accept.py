@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import storage.factory
+from models import DeliveryStatus, OrderStatus
+from services.delivery import DeliveryService
+from storage import JsonStorage, SqliteStorage, record_version
+
+CONTENDERS = 300
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(storage.factory, 'STORAGE_BACKEND', request.param)
+    return {'json': JsonStorage, 'sqlite': SqliteStorage}[request.param]
+
+
+def test_concurrent_accepts_have_exactly_one_winner(backend):
+    async def scenario():
+        service = DeliveryService()
+        assert type(service.storage) is backend
+        request = await service.request_service.create_request('7001', 'Не включается', [], 'ул. Мира, 1', 'Иван')
+        task = await service.create_delivery_task(request.id, 'СЦ Центр')
+        couriers = [str(5000 + number) for number in range(CONTENDERS)]
+        results = await asyncio.gather(*(service.accept_task(task.task_id, courier) for courier in couriers))
+        winners = [(courier, result) for courier, result in zip(couriers, results) if result is not None]
+        assert len(winners) == 1
+        winner = winners[0][0]
+        task = await service.get_task(task.task_id)
+        assert (task.status, task.assigned_to) == (DeliveryStatus.ACCEPTED, winner)
+        request = await service.request_service.get_request(request.id)
+        assert (request.status, request.assigned_delivery) == (OrderStatus.DELIVERY_TO_CLIENT, winner)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_compare_and_set_with_one_version_has_exactly_one_winner(backend):
+    async def scenario():
+        tasks = DeliveryService().storage
+        assert type(tasks) is backend
+        await tasks.set('1', {'status': DeliveryStatus.PENDING})
+        version = record_version(await tasks.get('1'))
+        results = await asyncio.gather(*(
+            tasks.compare_and_set('1', version, {'status': DeliveryStatus.ACCEPTED, 'assigned_to': str(number)})
+            for number in range(CONTENDERS)
+        ))
+        assert results.count(True) == 1
+        record = await tasks.get('1')
+        assert record['assigned_to'] == str(results.index(True))
+        assert record_version(record) == version + 1
+
+    asyncio.run(scenario())
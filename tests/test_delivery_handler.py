@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import services.notification_service as notification_module
+from conftest import FakeBot, FakeMessage, callback_data, callback_update, drain_outbox
+from handlers.delivery_handler import DeliveryHandler
+from models import DeliveryStatus, OrderStatus
+from services.broadcast import Broadcaster
+
+CLIENT_ID = '7001'
+COURIERS = [501, 502]
+
+
+@pytest.fixture(autouse=True)
+def couriers(monkeypatch):
+    monkeypatch.setattr(notification_module, 'DELIVERY_IDS', COURIERS)
+    # Лимиты Telegram здесь не проверяются: без них очередь доставляется сразу
+    Broadcaster._instance = Broadcaster(global_rate=10000, chat_rate=10000, chat_burst=10000)
+
+
+async def create_task(handler, description='Не включается'):
+    """Заявка клиента и задача доставки по ней с разосланными доставщикам предложениями"""
+    request_service = handler.delivery_service.request_service
+    request = await request_service.create_request(CLIENT_ID, description, [], 'ул. Ленина, 1', 'Иван')
+    task = await handler.delivery_service.create_delivery_task(request.id, 'СЦ Центр')
+    await handler.notification_service.notify_about_delivery_task(None, task.task_id, task.to_dict())
+    return task
+
+
+def test_accept_from_offer_notifies_client_and_closes_other_offers():
+    async def scenario():
+        handler = DeliveryHandler()
+        bot = FakeBot()
+        task = await create_task(handler)
+        await drain_outbox(handler.notification_service, bot)
+        offers = {chat_id: message_id for (chat_id, _, _), message_id in zip(bot.sent, range(101, 200))}
+        assert set(offers) == set(COURIERS)
+
+        update = callback_update(f'accept_delivery_{task.task_id}', 501, bot, FakeMessage(offers[501]))
+        await handler.handle_accept_delivery(update, None)
+        assert update.callback_query.edits[0][0].startswith(f'Вы приняли задачу #{task.task_id}')
+
+        bot.sent.clear()
+        await drain_outbox(handler.notification_service, bot)
+        assert [chat_id for chat_id, _, _ in bot.sent] == [CLIENT_ID]
+        assert f'принял вашу заявку #{task.request_id}' in bot.sent[0][1]
+        # Своё сообщение правит обработчик нажатия; у второго доставщика кнопка убирается
+        assert [(chat_id, message_id) for chat_id, message_id, _ in bot.edited] == [('502', offers[502])]
+        assert 'принята другим доставщиком' in bot.edited[0][2]
+
+    asyncio.run(scenario())
+
+
+def test_accept_from_available_tasks_page_closes_own_offer_too():
+    async def scenario():
+        handler = DeliveryHandler()
+        bot = FakeBot()
+        tasks = [await create_task(handler, f'Заявка {number}') for number in range(7)]
+        await drain_outbox(handler.notification_service, bot)
+        offers = {(chat_id, text.split('\n')[0]): message_id
+                  for (chat_id, text, _), message_id in zip(bot.sent, range(101, 200))}
+
+        # Вторая страница списка: задачи 6 и 7 (по DELIVERY_TASKS_PAGE_SIZE на странице)
+        listing = FakeMessage(900)
+        update = callback_update('avail_1', 501, bot, listing)
+        await handler.handle_available_tasks_page(update, None)
+        text, reply_markup = update.callback_query.edits[-1]
+        buttons = [data for row in callback_data(reply_markup) for data in row if data.startswith('accept_delivery_')]
+        assert buttons == [f'accept_delivery_{task.task_id}' for task in tasks[5:]]
+
+        task = tasks[6]
+        update = callback_update(buttons[1], 501, bot, listing)
+        await handler.handle_accept_delivery(update, None)
+        assert update.callback_query.edits[0][0].startswith(f'Вы приняли задачу #{task.task_id}')
+        accepted = await handler.delivery_service.get_task(task.task_id)
+        assert (accepted.status, accepted.assigned_to) == (DeliveryStatus.ACCEPTED, '501')
+        request = await handler.delivery_service.request_service.get_request(task.request_id)
+        assert (request.status, request.assigned_delivery) == (OrderStatus.DELIVERY_TO_CLIENT, '501')
+
+        bot.sent.clear()
+        await drain_outbox(handler.notification_service, bot)
+        assert [chat_id for chat_id, _, _ in bot.sent] == [CLIENT_ID]
+        # Список — не сообщение с предложением, поэтому своё предложение закрывается тоже
+        heading = f'Новая задача доставки #{task.task_id}'
+        edited = {chat_id: (message_id, text) for chat_id, message_id, text in bot.edited}
+        assert edited['501'][0] == offers[(501, heading)]
+        assert edited['501'][1].startswith(f'Вы приняли задачу доставки #{task.task_id}')
+        assert edited['502'][0] == offers[(502, heading)]
+        assert 'принята другим доставщиком' in edited['502'][1]
+
+        # Принятая задача пропадает из списка
+        update = callback_update('avail_1', 502, bot, FakeMessage(901))
+        await handler.handle_available_tasks_page(update, None)
+        assert f'#{task.task_id} ·' not in update.callback_query.edits[-1][0]
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, Forbidden, NetworkError
+
+import services.outbox as outbox_module
+from services.broadcast import Broadcaster
+from services.notification_service import NotificationService
+from services.outbox import Outbox, OUTBOX_PENDING
+
+
+async def wait_until(condition, timeout=5):
+    """Ожидание условия, которое выполняет фоновый цикл очереди"""
+    async def poll():
+        while not await condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+class RejectingBot:
+    """Bot, который на отправку в указанные чаты отвечает заданной ошибкой"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.delivered = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.delivered.append(chat_id)
+        return SimpleNamespace(message_id=len(self.delivered), chat_id=chat_id)
+
+
+def test_stuck_delivery_times_out_without_blocking_other_entries(monkeypatch):
+    monkeypatch.setattr(outbox_module, 'OUTBOX_DELIVERY_TIMEOUT', 0.2)
+
+    async def scenario():
+        outbox = Outbox.get_instance()
+        stuck = await outbox.enqueue('message', [1], text='Зависнет')
+        delivered = []
+
+        async def deliver(entry):
+            if entry['text'] == 'Зависнет':
+                await asyncio.Event().wait()
+            delivered.append(entry['text'])
+            return []
+
+        runner = asyncio.create_task(outbox.run(deliver))
+        try:
+            await outbox.enqueue('message', [2], text='Дойдёт')
+
+            async def retried():
+                entry = await outbox.storage.get(stuck)
+                return delivered == ['Дойдёт'] and entry['attempts'] == 1
+
+            await wait_until(retried)
+        finally:
+            runner.cancel()
+        entry = await outbox.storage.get(stuck)
+        assert (entry['status'], entry['attempts'], entry['chat_ids']) == (OUTBOX_PENDING, 1, [1])
+        assert 'не уложилась' in entry['error']
+
+    asyncio.run(scenario())
+
+
+def test_permanent_telegram_errors_are_not_retried():
+    async def scenario():
+        service = NotificationService(Broadcaster(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=0))
+        bot = RejectingBot({1: Forbidden('Forbidden: bot was blocked by the user'),
+                            2: BadRequest('Chat not found'),
+                            3: NetworkError('Connection reset')})
+        outbox = service.outbox
+        key = await outbox.enqueue('message', [1, 2, 3, 4], text='Новости')
+        rejected_only = await outbox.enqueue('message', [1, 2], text='Новости')
+        for entry_key, entry in (await outbox.due()).items():
+            await outbox._process(entry_key, entry, lambda entry: service.deliver(bot, entry))
+        assert bot.delivered == [4]
+        # Повторяется только сетевой сбой; отказы Telegram попадают в текст ошибки
+        entry = await outbox.storage.get(key)
+        assert (entry['status'], entry['attempts'], entry['chat_ids']) == (OUTBOX_PENDING, 1, [3])
+        assert 'blocked' in entry['error'] and 'Chat not found' in entry['error']
+        # Запись, все чаты которой отклонены, сразу удаляется, а не копит попытки до мёртвой
+        assert await outbox.storage.get(rejected_only) is None
+        assert await outbox.dead() == {}
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import config
+import services.notification_service as notification_module
+from conftest import FakeBot, drain_outbox
+from models import Photo
+from services.notification_service import NotificationService
+
+ADMINS = [8001, 8002]
+
+
+def test_album_larger_than_chat_burst_is_delivered_and_does_not_block_queue(monkeypatch):
+    monkeypatch.setattr(notification_module, 'ADMIN_IDS', ADMINS)
+
+    async def scenario():
+        os.makedirs(config.PHOTOS_DIR)
+        photos = []
+        for number in range(config.BROADCAST_CHAT_BURST + 2):
+            path = os.path.join(config.PHOTOS_DIR, f'{number}.jpg')
+            with open(path, 'wb') as file:
+                file.write(b'jpeg')
+            photos.append(Photo(path=path))
+        service = NotificationService()
+        bot = FakeBot()
+        await service.notify_admins_photos(bot, photos, 'Фото к заявке #1')
+        await service.notify_admins(bot, 'Новая заявка #2')
+        # Лимиты Telegram по умолчанию: альбом дороже ёмкости ведра чата
+        await asyncio.wait_for(drain_outbox(service, bot), 10)
+        # С диска фото загружаются один раз, второй администратор получает их по file_id
+        assert sorted((chat_id, count) for chat_id, count, _ in bot.albums) == [(admin, len(photos)) for admin in ADMINS]
+        assert sorted(uploaded for _, _, uploaded in bot.albums) == [False, True]
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == ADMINS
+        assert await service.outbox.dead() == {}
+
+    asyncio.run(scenario())
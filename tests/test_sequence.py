@@ -0,0 +1,29 @@
+import asyncio
+import os
+
+import config
+from conftest import reset_singletons
+from models import OrderStatus
+from services.request import RequestService
+
+
+def test_upgrade_without_sequences_does_not_reuse_archived_ids():
+    async def scenario():
+        # Данные до появления генератора ID: заявки 1–3, файла последовательностей нет
+        service = RequestService()
+        for request_id, user_id in (('1', '100'), ('2', '100'), ('3', '200')):
+            await service.storage.set(request_id, {'user_id': user_id, 'description': 'Старая', 'status': 'Новая'})
+        await service.update_request_status('3', OrderStatus.COMPLETED)
+        # Архиватор при запуске успевает раньше первой выдачи ID
+        assert await service.archive_completed() == 1
+        assert not os.path.exists(config.SEQUENCES_JSON)
+
+        reset_singletons()
+        service = RequestService()
+        request = await service.create_request('300', 'Новая заявка', [], 'ул. Мира, 1', 'Борис')
+        assert request.id == '4'
+        archived = await service.get_request('3')
+        assert (archived.user_id, archived.status) == ('200', OrderStatus.COMPLETED)
+        assert [request.id for request in await service.get_user_requests('200')] == ['3']
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.ext import ConversationHandler
+
+from config import SET_SC_LOCATION
+from conftest import FakeBot, FakeMessage, callback_data, callback_update, message_update
+from handlers.admin_handler import AdminHandler
+from models import OrderStatus
+
+ADMIN_ID = 8001
+# Клиент у Казанского вокзала; СЦ — в центре, в Химках и в Зеленограде
+CLIENT_POINT = {'latitude': 55.7733, 'longitude': 37.6567}
+SC_POINTS = {'Химки': (55.8970, 37.4297), 'Центр': (55.7558, 37.6173), 'Зеленоград': (55.9825, 37.1814)}
+
+
+async def set_sc_location(handler, bot, sc_id, point):
+    """Координаты СЦ через список СЦ: кнопка, затем геопозиция"""
+    context = SimpleNamespace(user_data={})
+    update = callback_update(f'sc_location_{sc_id}', ADMIN_ID, bot)
+    assert await handler.handle_sc_location_request(update, context) == SET_SC_LOCATION
+    message = FakeMessage()
+    message.location = SimpleNamespace(latitude=point[0], longitude=point[1])
+    assert await handler.handle_sc_location(message_update(ADMIN_ID, bot, message), context) == ConversationHandler.END
+    assert message.replies[0][0].startswith('Координаты СЦ')
+
+
+def test_sc_coordinates_from_admin_list_drive_nearest_suggestions_and_auto_assign():
+    async def scenario():
+        handler = AdminHandler()
+        bot = FakeBot()
+        service_centers = handler.service_center_service
+        for name in SC_POINTS:
+            await service_centers.create_service_center(name, f'{name}, ул. Мира, 1')
+        request = await handler.request_service.create_request('7001', 'Разбит экран', [], CLIENT_POINT, 'Иван')
+
+        # Пока координат нет, предлагаются все СЦ без расстояний
+        update = callback_update(f'assign_sc_{request.id}', ADMIN_ID, bot)
+        await handler.handle_assign_sc(update, None)
+        assert 'assign_sc_auto_' not in str(callback_data(update.callback_query.edits[-1][1]))
+
+        listing = FakeMessage()
+        await handler.show_service_centers(message_update(ADMIN_ID, bot, listing), None)
+        text, reply_markup = listing.replies[0]
+        assert text.count('Координаты не заданы') == 3
+        buttons = [row[0] for row in callback_data(reply_markup)]
+        ids = {sc.name: sc.id for sc in (await service_centers.get_all_service_centers()).values()}
+        for name, point in SC_POINTS.items():
+            assert f'sc_location_{ids[name]}' in buttons
+            await set_sc_location(handler, bot, ids[name], point)
+
+        listing = FakeMessage()
+        await handler.show_service_centers(message_update(ADMIN_ID, bot, listing), None)
+        assert 'Координаты не заданы' not in listing.replies[0][0]
+
+        # Ближайшие к клиенту первыми, затем «Привязать к ближайшему»
+        update = callback_update(f'assign_sc_{request.id}', ADMIN_ID, bot)
+        await handler.handle_assign_sc(update, None)
+        keyboard = update.callback_query.edits[-1][1].inline_keyboard
+        assert [row[0].callback_data for row in keyboard] == [
+            f'assign_sc_confirm_{request.id}_{ids[name]}' for name in ('Центр', 'Химки', 'Зеленоград')
+        ] + [f'assign_sc_auto_{request.id}']
+        assert keyboard[0][0].text == 'Центр · 3.1 км'
+
+        update = callback_update(f'assign_sc_auto_{request.id}', ADMIN_ID, bot)
+        await handler.handle_assign_sc_auto(update, None)
+        request = await handler.request_service.get_request(request.id)
+        assert (request.assigned_sc, request.status) == (ids['Центр'], OrderStatus.ASSIGNED_TO_SC)
+
+        # Перенос СЦ меняет подбор без перезапуска
+        await set_sc_location(handler, bot, ids['Химки'], (55.7740, 37.6560))
+        nearest = await service_centers.get_nearest_service_centers(request.location, 1)
+        assert nearest[0][0].id == ids['Химки'] and nearest[0][1] < 0.2
+
+    asyncio.run(scenario())
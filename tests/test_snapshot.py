@@ -0,0 +1,31 @@
+from storage.snapshot import BUCKET_SIZE, Snapshot
+
+
+def test_insert_delete_cycles_keep_index_bounded_and_old_versions_intact():
+    snapshot = Snapshot.from_dict({'kept': {'value': 0}})
+    first = snapshot
+    for cycle in range(200):
+        keys = [f'{cycle}-{number}' for number in range(50)]
+        snapshot = snapshot.apply({key: {'value': cycle} for key in keys})
+        if cycle == 100:
+            middle = snapshot
+        snapshot = snapshot.apply({key: None for key in keys})
+        assert len(snapshot._index) <= 2 * len(snapshot) + BUCKET_SIZE + 50
+        assert len(snapshot._buckets) <= len(snapshot._index) // BUCKET_SIZE + 2
+    assert dict(snapshot) == {'kept': {'value': 0}}
+    assert snapshot.version == 400
+    # Версии, полученные раньше, видят свои записи и после перестройки линии
+    assert dict(first) == {'kept': {'value': 0}}
+    assert len(middle) == 51 and middle['100-7'] == {'value': 100}
+    assert '100-7' not in snapshot and snapshot.get('100-7') is None
+
+
+def test_rebuilt_lineage_keeps_order_and_accepts_changes():
+    snapshot = Snapshot.from_dict({f'k{number}': number for number in range(BUCKET_SIZE * 4)})
+    snapshot = snapshot.apply({f'k{number}': None for number in range(0, BUCKET_SIZE * 4, 3)})
+    snapshot = snapshot.apply({f'k{number}': None for number in range(1, BUCKET_SIZE * 4, 3)})
+    expected = [f'k{number}' for number in range(2, BUCKET_SIZE * 4, 3)]
+    assert list(snapshot) == expected
+    assert len(snapshot._index) == len(expected)
+    snapshot = snapshot.apply({'k0': 'again', 'k2': None})
+    assert list(snapshot) == expected[1:] + ['k0'] and snapshot['k0'] == 'again'
@@ -0,0 +1,75 @@
+import asyncio
+import errno
+import os
+import sqlite3
+
+import pytest
+
+import config
+from storage import JsonStorage, SqliteStorage, StorageError, migrate_json_to_sqlite
+from storage.wal import WriteAheadLog
+
+
+def fail_appends(monkeypatch, storage):
+    """Запись журнала хранилища падает, как при переполненном диске"""
+    original = WriteAheadLog.append
+
+    async def append(wal, changes):
+        if wal is storage.wal:
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        return await original(wal, changes)
+
+    monkeypatch.setattr(WriteAheadLog, 'append', append)
+
+
+def test_failed_wal_append_reaches_every_waiter_and_leaves_cache_as_on_disk(monkeypatch):
+    async def scenario():
+        path = os.path.join(config.DATA_DIR, 'items.json')
+        storage = JsonStorage.get_instance(path)
+        await storage.set('kept', {'value': 1})
+        fail_appends(monkeypatch, storage)
+        # Обе записи попадают в одну пачку групповой фиксации
+        results = await asyncio.gather(storage.set('a', {'value': 2}), storage.set('b', {'value': 3}),
+                                       return_exceptions=True)
+        assert all(isinstance(result, StorageError) for result in results)
+        data = await storage.load()
+        assert dict(data).keys() == {'kept'}
+        assert await storage.get('a') is None
+
+    asyncio.run(scenario())
+
+
+def test_failed_snapshot_save_is_raised(monkeypatch):
+    async def scenario():
+        storage = JsonStorage.get_instance(os.path.join(config.DATA_DIR, 'items.json'))
+        await storage.set('kept', {'value': 1})
+
+        def dump(data):
+            raise OSError(errno.ENOSPC, 'No space left on device')
+
+        monkeypatch.setattr(storage, '_dump_snapshot', dump)
+        with pytest.raises(StorageError):
+            await storage.save({'other': {'value': 2}})
+        assert dict(await storage.load()).keys() == {'kept'}
+
+    asyncio.run(scenario())
+
+
+def test_failed_sqlite_save_is_raised_and_fails_migration(monkeypatch):
+    async def scenario():
+        path = os.path.join(config.DATA_DIR, 'items.json')
+        await JsonStorage.get_instance(path).save({'kept': {'value': 1}})
+
+        def replace_all(storage, rows):
+            raise sqlite3.OperationalError('database or disk is full')
+
+        monkeypatch.setattr(SqliteStorage, '_replace_all', replace_all)
+        with pytest.raises(StorageError):
+            await SqliteStorage.get_instance(path).save({'other': {'value': 2}})
+        # Перенос не сообщает об успехе, если данные не записались
+        with pytest.raises(StorageError):
+            await migrate_json_to_sqlite([path])
+        monkeypatch.undo()
+        assert await SqliteStorage.get_instance(path).load() == {}
+
+    asyncio.run(scenario())
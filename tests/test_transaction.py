@@ -0,0 +1,37 @@
+import asyncio
+import os
+
+import pytest
+
+import config
+from conftest import reset_singletons
+from storage import StorageError, Transaction, recover_transactions, get_storage
+from test_storage_durability import fail_appends
+
+
+def test_transaction_keeps_journal_when_a_storage_fails_and_recovery_replays_it(monkeypatch):
+    async def scenario():
+        tasks = get_storage(config.DELIVERY_TASKS_JSON)
+        requests = get_storage(config.REQUESTS_JSON)
+        await tasks.set('1', {'status': 'Ожидает'})
+        await requests.set('1', {'status': 'Назначена в СЦ'})
+        fail_appends(monkeypatch, requests)
+        with pytest.raises(StorageError):
+            async with Transaction() as tx:
+                tx.set(tasks, '1', {'status': 'Принято'})
+                tx.set(requests, '1', {'status': 'Доставляется клиенту'})
+        assert len(os.listdir(config.TRANSACTIONS_DIR)) == 1
+        # Кэш не показывает того, чего нет на диске
+        assert (await requests.get('1'))['status'] == 'Назначена в СЦ'
+
+    asyncio.run(scenario())
+    monkeypatch.undo()
+    reset_singletons()
+
+    async def restart():
+        assert await recover_transactions() == 1
+        assert os.listdir(config.TRANSACTIONS_DIR) == []
+        assert (await get_storage(config.DELIVERY_TASKS_JSON).get('1'))['status'] == 'Принято'
+        assert (await get_storage(config.REQUESTS_JSON).get('1'))['status'] == 'Доставляется клиенту'
+
+    asyncio.run(restart())